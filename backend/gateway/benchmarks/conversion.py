@@ -0,0 +1,83 @@
+"""
+Compares the per-request conversion time of the generic path
+(`ParseDict`/`MessageToDict` + pydantic) with the compiled decoders
+and encoders for flat, nested and repeated messages.
+
+Usage: python -m benchmarks.conversion
+"""
+from typing import Any
+
+from .utils import measure, setup_grpc_tools
+
+setup_grpc_tools()
+
+from src.builder.decoder import MessageDecoder  # noqa: E402
+from src.builder.encoder import MessageEncoder  # noqa: E402
+from src.builder.loader import GrpcLoader  # noqa: E402
+
+
+def flat_payload(i: int = 1) -> dict[str, Any]:
+    return {
+        'id': i,
+        'name': f'Bike {i}',
+        'description': 'Lightweight aluminium frame, 21 speed',
+        'price': 49900,
+        'rating': 4.5,
+        'available': True,
+        # `MessageToDict` renders enums by name which the generated models
+        #   don't accept, so the current path only works for the default one
+        'status': 0,
+    }
+
+
+def image_payload() -> dict[str, Any]:
+    return {'url': 'https://cdn.example.com/image.png', 'width': 800, 'height': 600}
+
+
+PAYLOADS = {
+    'Flat': flat_payload(),
+    'Nested': {
+        'product': flat_payload(),
+        'manufacturer': {'id': 1, 'name': 'Merida', 'logo': image_payload()},
+        'cover': image_payload(),
+    },
+    'Repeated': {
+        'products': [flat_payload(i) for i in range(100)],
+        'tags': [f'tag-{i}' for i in range(20)],
+        'stock': {f'sku-{i}': i for i in range(20)},
+    },
+}
+
+
+def main() -> None:
+    loader = GrpcLoader()
+    messages = next(loader.load_grpc_tools()).messages
+    decoder = MessageDecoder()
+    encoder = MessageEncoder()
+
+    print(f"{'message':<10} {'direction':<10} {'current, us':>12} {'compiled, us':>13} {'speedup':>8}")
+
+    for name, payload in PAYLOADS.items():
+        grpc_model = loader.load_model(messages[name])
+        model = grpc_model.model.parse_obj(payload)
+        decode = decoder.compile(grpc_model.cls)
+        encode = encoder.compile_json(grpc_model.cls)
+        message = decode(model, {})
+
+        results = {
+            'request': (
+                measure(lambda: GrpcLoader.model_to_message(model, grpc_model.cls, {})),
+                measure(lambda: decode(model, {})),
+            ),
+            'response': (
+                measure(lambda: GrpcLoader.message_to_model(message, grpc_model.model).json()),
+                measure(lambda: encode(message)),
+            ),
+        }
+
+        for direction, (current, compiled) in results.items():
+            print(f'{name:<10} {direction:<10} {current:>12.2f} {compiled:>13.2f} {current / compiled:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Reports the cold (empty API description cache) and warm startup time of
+the gateway routes. Every run is a fresh interpreter, as a worker would be.
+
+Usage: python -m benchmarks.startup [runs]
+"""
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from .utils import setup_grpc_tools
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+BUILD_SCRIPT = """
+import time
+from src.builder import APIBuilder
+started = time.perf_counter()
+APIBuilder().build()
+print('startup', (time.perf_counter() - started) * 1000)
+"""
+
+
+def run_build(env: dict[str, str]) -> float:
+    output = subprocess.run(
+        [sys.executable, '-c', BUILD_SCRIPT],
+        cwd=BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    line = next(line for line in output.splitlines() if line.startswith('startup '))
+    return float(line.split()[1])
+
+
+def main(runs: int = 5) -> None:
+    setup_grpc_tools()
+    cache_dir = Path(tempfile.mkdtemp(prefix='gateway-api-cache-'))
+    env = os.environ | {'API_CACHE_DIR': str(cache_dir)}
+
+    cold, warm = [], []
+
+    for _ in range(runs):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        cold.append(run_build(env))
+        warm.append(run_build(env))
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f'cold start: {statistics.median(cold):.1f} ms (median of {runs})')
+    print(f'warm start: {statistics.median(warm):.1f} ms (median of {runs})')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,272 @@
+"""
+Throughput and latency of the whole gateway: the routes built by
+`APIBuilder.build()` from the benchmark protos, driven through ASGI by
+concurrent clients, against an in-process fake `Bench` servicer. Neither
+a socket of HTTP nor the JSON of a client is on the way, so the numbers
+are the ones of the gateway itself and of its gRPC calls. The `protobuf`
+cases are the same requests in `application/x-protobuf`, if it's enabled.
+
+The results are saved as JSON, by default under `benchmarks/results/`
+named by the commit, to compare the conversion, pooling and caching
+changes across commits.
+
+Usage: python -m benchmarks.throughput [requests] [concurrency] [output]
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from .utils import setup_grpc_tools
+
+setup_grpc_tools()
+# The benchmark protos are not to be mixed with the cached API description
+os.environ.setdefault('API_CACHE_ENABLED', '0')
+
+from google.protobuf.json_format import ParseDict  # noqa: E402
+from grpc import aio  # noqa: E402
+
+from src.builder.negotiation import PROTOBUF_MEDIA_TYPE  # noqa: E402
+from src.config import settings  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+WARMUP_REQUESTS = 200
+
+
+def flat(pb2: Any, i: int) -> Any:
+    return pb2.Flat(
+        id=i,
+        name=f'Bike {i}',
+        description='Lightweight aluminium frame, 21 speed',
+        price=49900,
+        rating=4.5,
+        available=True,
+        status=pb2.STATUS_ACTIVE,
+    )
+
+
+def create_servicer(pb2: Any, pb2_grpc: Any) -> Any:
+    image = pb2.Image(url='https://cdn.example.com/image.png', width=800, height=600)
+
+    class BenchServicer(pb2_grpc.BenchServicer):
+        async def GetFlat(self, request: Any, context: aio.ServicerContext) -> Any:
+            return flat(pb2, request.id)
+
+        async def GetNested(self, request: Any, context: aio.ServicerContext) -> Any:
+            return pb2.Nested(
+                product=flat(pb2, request.id),
+                manufacturer=pb2.Manufacturer(id=1, name='Merida', logo=image),
+                cover=image,
+            )
+
+        async def EchoRepeated(self, request: Any, context: aio.ServicerContext) -> Any:
+            return request
+
+    return BenchServicer()
+
+
+def repeated_payload(size: int = 100) -> dict[str, Any]:
+    return {
+        'products': [
+            {'id': i, 'name': f'Bike {i}', 'description': 'Lightweight aluminium frame, 21 speed',
+             'price': 49900, 'rating': 4.5, 'available': True, 'status': 1}
+            for i in range(size)
+        ],
+        'tags': [f'tag-{i}' for i in range(20)],
+        'stock': {f'sku-{i}': i for i in range(20)},
+    }
+
+
+# Name, method, path, body, media type
+CASES = [
+    ('small', 'GET', '/api/v1/bench/flat/1/', b'', 'application/json'),
+    ('nested', 'GET', '/api/v1/bench/nested/1/', b'', 'application/json'),
+    ('large repeated', 'POST', '/api/v1/bench/repeated/', json.dumps(repeated_payload()).encode(), 'application/json'),
+]
+
+
+def create_protobuf_cases(pb2: Any) -> list[tuple[str, str, str, bytes, str]]:
+    body = ParseDict(repeated_payload(), pb2.Repeated()).SerializeToString()
+
+    return [
+        ('nested protobuf', 'GET', '/api/v1/bench/nested/1/', b'', PROTOBUF_MEDIA_TYPE),
+        ('repeated protobuf', 'POST', '/api/v1/bench/repeated/', body, PROTOBUF_MEDIA_TYPE),
+    ]
+
+
+async def send_request(app: Any, method: str, path: str, body: bytes, media_type: str) -> int:
+    """
+    A single request through the ASGI interface, returns the status
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [
+            (b'host', b'bench'),
+            (b'content-type', media_type.encode()),
+            (b'accept', media_type.encode()),
+            (b'content-length', str(len(body)).encode()),
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('bench', 80),
+    }
+    status = 0
+    sent = False
+    finished = asyncio.Event()
+
+    async def receive() -> dict[str, Any]:
+        nonlocal sent
+
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        # Streaming responses listen for the disconnect of the client
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal status
+
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+            finished.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run_case(
+    app: Any,
+    method: str,
+    path: str,
+    body: bytes,
+    media_type: str,
+    requests: int,
+    concurrency: int,
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    errors = 0
+    remaining = requests
+
+    async def client() -> None:
+        nonlocal remaining, errors
+
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            status = await send_request(app, method, path, body, media_type)
+            latencies.append(time.perf_counter() - started)
+
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100)
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'rps': requests / elapsed,
+        'p50_ms': quantiles[49] * 1000,
+        'p99_ms': quantiles[98] * 1000,
+    }
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(requests: int, concurrency: int) -> dict[str, Any]:
+    # The generated modules are importable once the routes are built
+    from bench import bench_pb2, bench_pb2_grpc
+
+    server = aio.server()
+    bench_pb2_grpc.add_BenchServicer_to_server(create_servicer(bench_pb2, bench_pb2_grpc), server)
+    server.add_insecure_port('127.0.0.1:50061')
+    await server.start()
+
+    cases = CASES + (create_protobuf_cases(bench_pb2) if settings.PROTOBUF_TRANSPORT_ENABLED else [])
+    results = {}
+
+    try:
+        async with app.router.lifespan_context(app):
+            for name, method, path, body, media_type in cases:
+                await run_case(app, method, path, body, media_type, WARMUP_REQUESTS, concurrency)
+                results[name] = await run_case(app, method, path, body, media_type, requests, concurrency)
+    finally:
+        await server.stop(None)
+
+    return results
+
+
+def main(requests: int = 5000, concurrency: int = 50, output: Optional[str] = None) -> None:
+    requests, concurrency = int(requests), int(concurrency)
+    commit = get_commit()
+    cases = asyncio.run(run(requests, concurrency))
+
+    print(f"{'case':<18} {'rps':>9} {'p50, ms':>8} {'p99, ms':>8} {'errors':>7}")
+    for name, result in cases.items():
+        print(
+            f"{name:<18} {result['rps']:>9.0f} {result['p50_ms']:>8.2f} "
+            f"{result['p99_ms']:>8.2f} {result['errors']:>7}"
+        )
+
+    report = {
+        'commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'concurrency': concurrency,
+        # What the compared changes are switched by
+        'settings': {
+            name: getattr(settings, name)
+            for name in (
+                'FAST_RESPONSE_ENABLED',
+                'RESPONSE_CACHE_ENABLED',
+                'METRICS_ENABLED',
+                'PROTOBUF_TRANSPORT_ENABLED',
+                'GRPC_CHANNELS_PER_TARGET',
+                'GRPC_BALANCING_STRATEGY',
+            )
+        },
+        'cases': cases,
+    }
+
+    path = Path(output) if output else RESULTS_DIR / f"throughput-{commit or 'unknown'}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    print(f'saved to {path}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
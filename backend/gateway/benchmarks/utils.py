@@ -0,0 +1,53 @@
+import os
+import tempfile
+import timeit
+from pathlib import Path
+from typing import Any, Callable
+
+
+PROTOS_DIR = Path(__file__).resolve().parent / 'protos'
+
+
+def compile_protos(output_dir: Path, protos_dir: Path = PROTOS_DIR) -> Path:
+    """
+    Generates `_pb2` and `_pb2_grpc` modules of the benchmark protos, or of
+    the ones of `protos_dir`, the same way as `entrypoint.sh` does for the
+    real ones
+    """
+    import grpc_tools
+    from grpc_tools import protoc
+
+    include_dir = Path(grpc_tools.__file__).resolve().parent / '_proto'
+    files = [str(file) for file in protos_dir.glob('**/*.proto')]
+
+    code = protoc.main([
+        'grpc_tools.protoc',
+        f'-I{protos_dir}',
+        f'-I{include_dir}',
+        f'--python_out={output_dir}',
+        f'--grpc_python_out={output_dir}',
+        *files,
+    ])
+
+    if code != 0:
+        raise RuntimeError(f'protoc failed with code {code}')
+
+    return output_dir
+
+
+def setup_grpc_tools() -> Path:
+    """
+    Generates the benchmark protos into a temporary directory and points
+    the gateway settings to it. Must be called before importing `src`
+    """
+    output_dir = compile_protos(Path(tempfile.mkdtemp(prefix='gateway-bench-')))
+    os.environ['GRPC_TOOLS_DIR'] = str(output_dir)
+    return output_dir
+
+
+def measure(func: Callable[[], Any], number: int = 1000, repeat: int = 5) -> float:
+    """
+    Returns the best time of a single call in microseconds
+    """
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
@@ -1,5 +1,9 @@
 from .parser import GrpcParser
 from .builder import APIBuilder
+from .channels import ChannelManager
+from .errors import grpc_error_handler
+from .metrics import InstrumentedRoute, metrics
+from .negotiation import NegotiatedRoute
 
 
-__all__ = ['GrpcParser', 'APIBuilder']
+__all__ = ['GrpcParser', 'APIBuilder', 'ChannelManager', 'grpc_error_handler', 'InstrumentedRoute', 'NegotiatedRoute', 'metrics']
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    DataLoader-style scheduler: single loads arriving within `window` seconds
+    (or until `max_size` distinct keys are collected) are dispatched as one
+    batch and the results are split back to the waiting callers. A key
+    missing from the batch result raises `KeyError`
+    """
+    __slots__ = ['load_batch', 'window', 'max_size', 'pending', 'handle', 'tasks']
+
+    def __init__(
+        self,
+        load_batch: Callable[[list[K]], Awaitable[dict[K, V]]],
+        window: float,
+        max_size: int,
+    ) -> None:
+        self.load_batch = load_batch
+        self.window = window
+        self.max_size = max_size
+        self.pending: dict[K, asyncio.Future[V]] = {}
+        self.handle: Optional[asyncio.TimerHandle] = None
+        # Strong references to the running batches
+        self.tasks: set[asyncio.Task[None]] = set()
+
+    async def _run(self, pending: dict[K, asyncio.Future[V]]) -> None:
+        try:
+            results = await self.load_batch(list(pending.keys()))
+        except BaseException as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in pending.items():
+            if future.done():
+                continue
+            if key in results:
+                future.set_result(results[key])
+            else:
+                future.set_exception(KeyError(key))
+
+    def _dispatch(self) -> None:
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+        pending, self.pending = self.pending, {}
+
+        task = asyncio.ensure_future(self._run(pending))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def load(self, key: K) -> V:
+        future = self.pending.get(key)
+
+        if future is None:
+            future = self.pending[key] = asyncio.get_running_loop().create_future()
+
+            if len(self.pending) >= self.max_size:
+                self._dispatch()
+            elif self.handle is None:
+                self.handle = asyncio.get_running_loop().call_later(self.window, self._dispatch)
+
+        # The same key may be awaited by several callers, so one of them
+        #   being cancelled mustn't cancel the future for the others
+        return await asyncio.shield(future)
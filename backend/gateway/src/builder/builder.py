@@ -1,11 +1,27 @@
-from typing import Any, Callable, Sequence
+import json
+import time
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional, Sequence
 
-from grpc import aio as grpc
+from fastapi import HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.message import DecodeError, Message
+from grpc import StatusCode, aio
 
+from .batching import BatchLoader
+from .cache import ResponseCache
+from .channels import ChannelManager, ChannelPool
+from .decoder import MessageDecoder
+from .encoder import MessageEncoder
+from .errors import GRPC_HTTP_STATUSES, grpc_http_exception
 from .loader import GrpcLoader
+from .metrics import current_timing, metrics
 from .interfaces import GrpcModel, ObjectAttrs, RouteAttrs, Servicer
-from .utils import camel_to_snake_case, create_annotated_function
+from .negotiation import MSGPACK_MEDIA_TYPE, PROTOBUF_MEDIA_TYPE
+from .utils import camel_to_snake_case, create_annotated_function, find_stub_method_kinds, find_stub_method_paths
 from .parser import GrpcParser
+from .singleflight import SingleFlight
+from ..config import settings
 
 
 class APIBuilder:
@@ -14,10 +30,32 @@ class APIBuilder:
     It uses `GrpcParser` to parse existing files and after that creates
     interface instance with params for the `fastapi.APIRouter`
     """
-    __slots__ = ['parser']
+    __slots__ = ['parser', 'channels', 'cache', 'flights', 'encoder', 'decoder']
 
-    def __init__(self) -> None:
+    # Query params of the routes with `paginate=cursor` attribute, they are
+    #   mapped onto the request fields of the same names
+    pagination_params: dict[str, tuple[type[Any], Any]] = {
+        'limit': (Optional[int], Query(None, ge=1)),
+        'cursor': (Optional[str], Query(None)),
+    }
+
+    def __init__(
+        self,
+        channels: Optional[ChannelManager] = None,
+        cache: Optional[ResponseCache] = None,
+    ) -> None:
         self.parser = GrpcParser()
+        self.channels = channels or ChannelManager()
+        self.cache = cache or ResponseCache.from_settings()
+        # Coalesced calls by the method name, see `_create_coalesced_call`
+        self.flights: dict[str, SingleFlight] = {}
+        if settings.METRICS_ENABLED:
+            metrics.flights = self.flights
+        self.encoder = MessageEncoder()
+        self.decoder = MessageDecoder()
+
+        if settings.MSGPACK_TRANSPORT_ENABLED and not self.encoder.msgpack_supported:
+            raise RuntimeError('MSGPACK_TRANSPORT_ENABLED requires the `msgpack` package')
 
     def _get_path(self, attrs: ObjectAttrs) -> str:
         path = attrs.attrs.get('path', None) or (f'/{attrs.obj.__name__}/')
@@ -27,46 +65,475 @@ class APIBuilder:
         path = attrs.attrs.get('path', None) or attrs.obj.__name__.rstrip('Servicer')
         return path.rstrip('/')
 
+    def _get_method(self, servicer: Servicer, name: str) -> Optional[ObjectAttrs]:
+        return next((attrs for attrs in servicer.object_attrs
+                     if attrs.obj.__name__ == name), None)
+
     def _validate_servicer(self, servicer: Servicer) -> None:
         assert 'host' in servicer.attrs.attrs
         assert 'port' in servicer.attrs.attrs
 
+        method_kinds = find_stub_method_kinds(servicer.stub_cls)
+
         for method in servicer.object_attrs:
             self._validate_grpc_method(method)
 
+            # Client streaming can't be expressed by a single HTTP request
+            assert method_kinds[method.obj.__name__] in ('unary_unary', 'unary_stream')
+
+            if 'batch' in method.attrs:
+                assert self._get_method(servicer, method.attrs['batch']) is not None
+
     def _validate_grpc_method(self, method: ObjectAttrs) -> None:
         assert all(key in method.request.cls.DESCRIPTOR.fields_by_name
                    for key in method.params.keys())
 
-    def _create_endpoint(
+        if 'paginate' in method.attrs:
+            fields = method.request.cls.DESCRIPTOR.fields_by_name
+            assert all(key in fields for key in self.pagination_params)
+
+    def _get_param_names(self, attrs: ObjectAttrs) -> tuple[str, ...]:
+        """
+        Names of the request fields taken from the path and the query
+        """
+        names = tuple(attrs.params.keys())
+
+        if 'paginate' in attrs.attrs:
+            names += tuple(self.pagination_params.keys())
+
+        return names
+
+    def _create_renderer(self, response_model: GrpcModel) -> Callable[[Any], Any]:
+        """
+        Returns the function converting a gRPC response into the endpoint
+        result. In the fast mode it's a raw `Response` that FastAPI doesn't
+        validate again, `response_model` is used for the docs only
+        """
+        if not settings.FAST_RESPONSE_ENABLED:
+            return lambda response: GrpcLoader.message_to_model(
+                message=response,
+                model=response_model.model
+            )
+
+        encode = self.encoder.compile_json(response_model.cls)
+
+        def render(response: Any) -> Response:
+            return Response(content=encode(response), media_type='application/json')
+
+        return render
+
+    def _create_msgpack_renderer(self, response_model: GrpcModel) -> Callable[[Any], Response]:
+        """
+        MessagePack is always encoded straight from the message
+        """
+        encode = self.encoder.compile_msgpack(response_model.cls)
+
+        def render(response: Any) -> Response:
+            return Response(content=encode(response), media_type=MSGPACK_MEDIA_TYPE)
+
+        return render
+
+    def _create_protobuf_renderer(self) -> Callable[[Any], Response]:
+        def render(response: Any) -> Response:
+            return Response(content=response.SerializeToString(), media_type=PROTOBUF_MEDIA_TYPE)
+
+        return render
+
+    def _create_call(
         self,
-        stub: Any,
+        pool: ChannelPool,
+        stub_cls: type[Any],
         name: str,
-        params: dict[str, str],
-        request_model: GrpcModel,
-        response_model: GrpcModel,
+    ) -> Callable[[Message], Awaitable[Message]]:
+        async def call(message: Message) -> Message:
+            # The stub is bound to the channel picked for this call only
+            with pool.pick() as channel:
+                procedure = getattr(channel.stub(stub_cls), name)
+                return await procedure(message)
+
+        return call
+
+    def _create_coalesced_call(
+        self,
+        call: Callable[[Message], Awaitable[Message]],
+        name: str,
+    ) -> Callable[[Message], Awaitable[Message]]:
+        """
+        Identical requests in flight share a single upstream call
+        """
+        flight = self.flights[name] = SingleFlight()
+
+        async def coalesced_call(message: Message) -> Message:
+            key = message.SerializeToString(deterministic=True)
+            return await flight.run(key, lambda: call(message))
+
+        return coalesced_call
+
+    def _create_batched_call(
+        self,
+        call: Callable[[Message], Awaitable[Message]],
+        batch_call: Callable[[Message], Awaitable[Message]],
+        attrs: ObjectAttrs,
+        batch_attrs: ObjectAttrs,
+    ) -> Callable[[Message], Awaitable[Message]]:
+        """
+        Single-item requests are gathered into the batch method requests.
+        The key field is `batch_key` attribute or the only request field.
+        The batch request should have a repeated field of the key type and
+        the batch response a repeated field of the single response type
+        whose items have the key field too
+        """
+        request_fields = attrs.request.cls.DESCRIPTOR.fields
+        key = attrs.attrs.get('batch_key') or request_fields[0].name
+        key_field = attrs.request.cls.DESCRIPTOR.fields_by_name[key]
+        response_type = attrs.response.cls.DESCRIPTOR
+
+        keys_field = next(
+            field.name for field in batch_attrs.request.cls.DESCRIPTOR.fields
+            if field.label == FieldDescriptor.LABEL_REPEATED and field.type == key_field.type
+        )
+        items_field = next(
+            field.name for field in batch_attrs.response.cls.DESCRIPTOR.fields
+            if field.label == FieldDescriptor.LABEL_REPEATED
+            and field.message_type is not None
+            and field.message_type.full_name == response_type.full_name
+        )
+        batch_request_cls = batch_attrs.request.cls
+
+        async def load_batch(keys: list[Any]) -> dict[Any, Message]:
+            response = await batch_call(batch_request_cls(**{keys_field: keys}))
+            return {getattr(item, key): item for item in getattr(response, items_field)}
+
+        loader = BatchLoader(
+            load_batch,
+            window=settings.BATCH_WINDOW_MS / 1000,
+            max_size=settings.BATCH_MAX_SIZE,
+        )
+
+        async def batched_call(message: Message) -> Message:
+            # Requests with other fields set can't be expressed by the batch
+            if any(field.name != key for field, _ in message.ListFields()):
+                return await call(message)
+
+            try:
+                return await loader.load(getattr(message, key))
+            except KeyError:
+                # The service answers a missing single item with NOT_FOUND
+                raise grpc_http_exception(StatusCode.NOT_FOUND)
+
+        return batched_call
+
+    def _time_stage(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        def timed(*args: Any) -> Any:
+            timing = current_timing.get()
+            if timing is None:
+                return func(*args)
+
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                timing.route.observe(stage, time.perf_counter() - started)
+
+        return timed
+
+    def _time_call(self, call: Callable[[Message], Awaitable[Message]]) -> Callable[[Message], Awaitable[Message]]:
+        """
+        Times the call as the endpoint waits for it and counts its status
+        codes, so a shared coalesced or batched call counts for every request
+        """
+        async def timed_call(message: Message) -> Message:
+            timing = current_timing.get()
+            if timing is None:
+                return await call(message)
+
+            started = time.perf_counter()
+            try:
+                response = await call(message)
+            except aio.AioRpcError as error:
+                timing.route.count_status(error.code().name)
+                raise
+            finally:
+                timing.route.observe('call', time.perf_counter() - started)
+
+            timing.route.count_status('OK')
+            return response
+
+        return timed_call
+
+    def _time_endpoint(self, endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Marks the bounds of the endpoint, what happens out of them in
+        the route handler is the FastAPI validation and serialization
+        """
+        async def timed_endpoint(**kwargs) -> Any:
+            timing = current_timing.get()
+            if timing is None:
+                return await endpoint(**kwargs)
+
+            timing.entered = time.perf_counter()
+            try:
+                return await endpoint(**kwargs)
+            finally:
+                timing.left = time.perf_counter()
+
+        return timed_endpoint
+
+    def _get_cache_ttl(self, attrs: ObjectAttrs) -> Optional[int]:
+        """
+        Only idempotent routes having `cache=<ttl>` attribute are cached
+        """
+        if not settings.RESPONSE_CACHE_ENABLED or attrs.attrs.get('method') != 'GET':
+            return None
+
+        ttl = attrs.attrs.get('cache', None)
+        return int(ttl) if ttl else None
+
+    def _create_endpoint(
+        self,
+        pool: ChannelPool,
+        stub_cls: type[Any],
+        attrs: ObjectAttrs,
+        batch_attrs: Optional[ObjectAttrs] = None,
     ) -> Callable[..., Any]:
-        procedure = getattr(stub, name)
+        name = attrs.obj.__name__
+        param_names = self._get_param_names(attrs)
+        decode = self.decoder.compile(attrs.request.cls)
+        call = self._create_call(pool, stub_cls, name)
 
-        async def endpoint(**kwargs) -> Any:
-            request = kwargs.get('request')
-            response = await procedure(
-                GrpcLoader.model_to_message(
-                    model=request,
-                    message=request_model.cls,
-                    fields={k: kwargs.get(k) for k in params.keys()}
-                )
+        if batch_attrs is not None:
+            call = self._create_batched_call(
+                call=call,
+                batch_call=self._create_call(pool, stub_cls, batch_attrs.obj.__name__),
+                attrs=attrs,
+                batch_attrs=batch_attrs,
             )
-            return GrpcLoader.message_to_model(
-                message=response,
-                model=response_model.model
+
+        if attrs.attrs.get('coalesce') == 'true':
+            call = self._create_coalesced_call(call, name=f'{stub_cls.__name__}.{name}')
+
+        # The uninstrumented routes don't pay even for the checks
+        instrumented = settings.METRICS_ENABLED
+        if instrumented:
+            decode = self._time_stage('decode', decode)
+            call = self._time_call(call)
+
+        cache_ttl = self._get_cache_ttl(attrs)
+        msgpack_enabled = settings.MSGPACK_TRANSPORT_ENABLED
+        msgpack_endpoint = None
+        protobuf_enabled = settings.PROTOBUF_TRANSPORT_ENABLED
+        protobuf_response_endpoint = None
+
+        if cache_ttl is None:
+            def create(render: Callable[[Any], Any]) -> Callable[..., Any]:
+                if instrumented:
+                    render = self._time_stage('encode', render)
+
+                async def endpoint(**kwargs) -> Any:
+                    request = kwargs.get('request')
+                    message = decode(request, {k: kwargs.get(k) for k in param_names})
+                    return render(await call(message))
+
+                return endpoint
+
+            endpoint = create(self._create_renderer(attrs.response))
+            if msgpack_enabled:
+                msgpack_endpoint = create(self._create_msgpack_renderer(attrs.response))
+            if protobuf_enabled:
+                protobuf_response_endpoint = create(self._create_protobuf_renderer())
+        else:
+            # Cached values are the serialized responses, so the cached
+            #   routes are always in the fast mode
+            def create(encode: Callable[[Message], bytes], media_type: str) -> Callable[..., Any]:
+                if instrumented:
+                    encode = self._time_stage('encode', encode)
+                # Every media type is cached apart
+                suffix = '' if media_type == 'application/json' else f'.{media_type}'
+                key_prefix = f'{stub_cls.__module__}.{stub_cls.__name__}/{name}{suffix}:'.encode()
+
+                async def load(message: Message) -> bytes:
+                    return encode(await call(message))
+
+                async def endpoint(**kwargs) -> Any:
+                    request = kwargs.get('request')
+                    message = decode(request, {k: kwargs.get(k) for k in param_names})
+                    key = key_prefix + message.SerializeToString(deterministic=True)
+                    content = await self.cache.get_or_load(key, cache_ttl, lambda: load(message))
+                    return Response(content=content, media_type=media_type)
+
+                return endpoint
+
+            endpoint = create(self.encoder.compile_json(attrs.response.cls), 'application/json')
+            if msgpack_enabled:
+                msgpack_endpoint = create(self.encoder.compile_msgpack(attrs.response.cls), MSGPACK_MEDIA_TYPE)
+            if protobuf_enabled:
+                protobuf_response_endpoint = create(attrs.response.cls.SerializeToString, PROTOBUF_MEDIA_TYPE)
+
+        if instrumented:
+            endpoint = self._time_endpoint(endpoint)
+
+        endpoint = self._annotate_endpoint(endpoint, attrs)
+
+        # Picked by `NegotiatedRoute`, the MessagePack and the protobuf
+        #   response ones are called by the handler of the JSON one, so
+        #   they take the same arguments
+        if msgpack_endpoint is not None:
+            endpoint.msgpack_endpoint = self._time_endpoint(msgpack_endpoint) if instrumented else msgpack_endpoint
+        if protobuf_response_endpoint is not None:
+            endpoint.protobuf_response_endpoint = (
+                self._time_endpoint(protobuf_response_endpoint) if instrumented else protobuf_response_endpoint
             )
+            endpoint.protobuf_endpoint = self._create_protobuf_endpoint(pool, stub_cls, attrs)
+
+        return endpoint
+
+    def _create_protobuf_endpoint(
+        self,
+        pool: ChannelPool,
+        stub_cls: type[Any],
+        attrs: ObjectAttrs,
+    ) -> Callable[[Request], Awaitable[Response]]:
+        """
+        The endpoint of the `application/x-protobuf` requests, the body is
+        the serialized request and the response is the serialized reply of
+        the method passed through. The body is only parsed to answer the
+        malformed ones with 400. The path and the query params are
+        serialized on their own and appended to the body, so they override
+        its fields the way `MergeFromString` does. The calls go straight to
+        the service, past the cache, batching and coalescing
+        """
+        method = find_stub_method_paths(stub_cls)[attrs.obj.__name__]
+        param_names = self._get_param_names(attrs)
+        request_cls = attrs.request.cls
+        decode = self.decoder.compile(request_cls)
+
+        async def call(content: bytes) -> bytes:
+            with pool.pick() as channel:
+                return await channel.raw(method)(content)
+
+        if settings.METRICS_ENABLED:
+            call = self._time_call(call)
+
+        async def endpoint(request: Request) -> Response:
+            path_params, query_params = request.path_params, request.query_params
+            fields = {k: path_params[k] if k in path_params else query_params.get(k) for k in param_names}
+
+            try:
+                params = decode(None, fields).SerializeToString() if param_names else b''
+            except (TypeError, ValueError) as error:
+                # Not validated by FastAPI, e.g. a non-numeric id
+                raise HTTPException(status_code=422, detail=str(error))
+
+            body = await request.body()
+            try:
+                request_cls.FromString(body)
+            except DecodeError as error:
+                raise HTTPException(status_code=400, detail=f'Invalid {request_cls.DESCRIPTOR.full_name}: {error}')
+
+            content = await call(body + params)
+            return Response(content=content, media_type=PROTOBUF_MEDIA_TYPE)
+
+        return endpoint
+
+    def _create_stream_endpoint(
+        self,
+        pool: ChannelPool,
+        stub_cls: type[Any],
+        attrs: ObjectAttrs,
+    ) -> Callable[..., Any]:
+        """
+        Server-streaming methods are exposed as NDJSON or, with `stream=array`
+        attribute, as a JSON array. Messages are encoded one by one as they
+        arrive, the next one is read only when the previous one is sent.
+
+        The first message is read before the response is started, so the
+        call failing to start is answered with the status of its error.
+        Once the status is sent, an error of the call is written as the last
+        record of the stream (the last item of the array) instead:
+
+            {"error": {"code": "UNAVAILABLE", "status": 503, "detail": "..."}}
+        """
+        name = attrs.obj.__name__
+        param_names = self._get_param_names(attrs)
+        decode = self.decoder.compile(attrs.request.cls)
+        encode = self.encoder.compile_json(attrs.response.cls)
+        as_array = attrs.attrs.get('stream') == 'array'
+        media_type = 'application/json' if as_array else 'application/x-ndjson'
+        separator = b',' if as_array else b'\n'
+        # The prefix of the first record
+        opening = b'[' if as_array else b''
+
+        # Only the setup of a stream is timed, its body is sent after
+        #   the route handler has returned
+        if settings.METRICS_ENABLED:
+            decode = self._time_stage('decode', decode)
+
+        def encode_error(error: aio.AioRpcError) -> bytes:
+            code = error.code()
+            return json.dumps({'error': {
+                'code': code.name,
+                'status': GRPC_HTTP_STATUSES.get(code, 500),
+                'detail': error.details(),
+            }}).encode()
+
+        async def stream(message: Message) -> AsyncGenerator[bytes, None]:
+            with pool.pick() as channel:
+                call = getattr(channel.stub(stub_cls), name)(message)
+
+                try:
+                    # Raised to the endpoint, nothing is sent yet
+                    response = await call.read()
+
+                    prefix = opening
+                    try:
+                        while response is not aio.EOF:
+                            yield prefix + encode(response)
+                            prefix = separator
+                            response = await call.read()
+                    except aio.AioRpcError as error:
+                        yield prefix + encode_error(error)
+                        prefix = separator
+
+                    if as_array:
+                        yield b'[]' if prefix == opening else b']'
+                    elif prefix:
+                        yield separator
+                finally:
+                    # The client has disconnected or the stream has failed,
+                    #   no-op if the call is already finished
+                    call.cancel()
+
+        async def prepend(first: bytes, chunks: AsyncGenerator[bytes, None]) -> AsyncGenerator[bytes, None]:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+
+        async def endpoint(**kwargs) -> Any:
+            request = kwargs.get('request')
+            message = decode(request, {k: kwargs.get(k) for k in param_names})
+            chunks = stream(message)
+
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                # An empty NDJSON stream
+                return Response(content=b'', media_type=media_type)
+
+            return StreamingResponse(prepend(first, chunks), media_type=media_type)
+
+        if settings.METRICS_ENABLED:
+            endpoint = self._time_endpoint(endpoint)
+
+        return self._annotate_endpoint(endpoint, attrs)
+
+    def _annotate_endpoint(self, endpoint: Callable[..., Any], attrs: ObjectAttrs) -> Callable[..., Any]:
+        params = attrs.params
 
         # Exclude params keys from the model to ensure the key exists
         # either as a path variable or in the body
         _request_model = GrpcLoader.exclude_model_fields(
-            model=request_model.model,
-            fields=params.keys()
+            model=attrs.request.model,
+            fields=self._get_param_names(attrs)
         )
 
         # Add 'request' param to the endpoint function as a body
@@ -76,10 +543,18 @@ class APIBuilder:
             # not '|=' operator cause there shouldn't be side effect
             params = params | {'request': _request_model}
 
+        defaults = {}
+
+        # Params with defaults go last to keep the signature valid
+        if 'paginate' in attrs.attrs:
+            params = params | {k: t for k, (t, _) in self.pagination_params.items()}
+            defaults = {k: d for k, (_, d) in self.pagination_params.items()}
+
         return create_annotated_function(
             endpoint,
             params,
-            name=camel_to_snake_case(name)
+            name=camel_to_snake_case(attrs.obj.__name__),
+            defaults=defaults,
         )
 
     def _build_service_route(self, servicer: Servicer) -> list[RouteAttrs]:
@@ -87,21 +562,32 @@ class APIBuilder:
         service_path = self._get_service_path(servicer_attrs)
 
         host, port = servicer_attrs.attrs['host'], servicer_attrs.attrs['port']
+        pool = self.channels.pool(f'{host}:{port}')
 
-        channel = grpc.insecure_channel(f'{host}:{port}')
-        stub = servicer.stub_cls(channel)
-
+        method_kinds = find_stub_method_kinds(servicer.stub_cls)
         routes = []
 
         for attrs in servicer.object_attrs:
+            # Methods without HTTP method are internal, e.g. batch ones
+            if 'method' not in attrs.attrs:
+                continue
+
             path = service_path + self._get_path(attrs)
-            endpoint = self._create_endpoint(
-                stub=stub,
-                name=attrs.obj.__name__,
-                params=attrs.params,
-                request_model=attrs.request,
-                response_model=attrs.response,
-            )
+
+            if method_kinds[attrs.obj.__name__] == 'unary_stream':
+                endpoint = self._create_stream_endpoint(
+                    pool=pool,
+                    stub_cls=servicer.stub_cls,
+                    attrs=attrs,
+                )
+            else:
+                endpoint = self._create_endpoint(
+                    pool=pool,
+                    stub_cls=servicer.stub_cls,
+                    attrs=attrs,
+                    batch_attrs=self._get_method(servicer, attrs.attrs['batch'])
+                        if 'batch' in attrs.attrs else None,
+                )
 
             routes.append(RouteAttrs(
                 path=path,
@@ -0,0 +1,109 @@
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Protocol
+
+from .singleflight import SingleFlight
+from .utils import import_string
+from ..config import settings
+
+
+class CacheBackend(Protocol):
+    """
+    The interface of the shared cache tier, e.g. Redis or Memcached client
+    wrapper. It's enabled by `RESPONSE_CACHE_BACKEND` import path
+    """
+
+    async def get(self, key: bytes) -> Optional[bytes]:
+        ...
+
+    async def set(self, key: bytes, value: bytes, ttl: float) -> None:
+        ...
+
+
+class LRUCache:
+    """
+    The in-process cache tier bounded by the total size of the stored values.
+    Least recently used values are evicted first
+    """
+    __slots__ = ['max_size', 'size', 'items']
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.items: OrderedDict[bytes, tuple[float, bytes]] = OrderedDict()
+
+    def _pop(self, key: bytes) -> None:
+        _, value = self.items.pop(key)
+        self.size -= len(key) + len(value)
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        item = self.items.get(key)
+
+        if item is None:
+            return None
+
+        expires, value = item
+
+        if expires < time.monotonic():
+            self._pop(key)
+            return None
+
+        self.items.move_to_end(key)
+        return value
+
+    def set(self, key: bytes, value: bytes, ttl: float) -> None:
+        if key in self.items:
+            self._pop(key)
+
+        item_size = len(key) + len(value)
+
+        if item_size > self.max_size:
+            return
+
+        self.items[key] = (time.monotonic() + ttl, value)
+        self.size += item_size
+
+        while self.size > self.max_size:
+            self._pop(next(iter(self.items)))
+
+
+class ResponseCache:
+    """
+    The cache of serialized responses. Concurrent misses of the same key
+    are coalesced, so only one of them goes to the upstream
+    """
+    __slots__ = ['local', 'shared', 'flights']
+
+    def __init__(
+        self,
+        max_size: int = settings.RESPONSE_CACHE_MAX_SIZE,
+        shared: Optional[CacheBackend] = None,
+    ) -> None:
+        self.local = LRUCache(max_size)
+        self.shared = shared
+        self.flights = SingleFlight()
+
+    @classmethod
+    def from_settings(cls) -> 'ResponseCache':
+        backend = settings.RESPONSE_CACHE_BACKEND
+        return cls(shared=import_string(backend)() if backend else None)
+
+    async def _load(self, key: bytes, ttl: float, load: Callable[[], Awaitable[bytes]]) -> bytes:
+        value = await self.shared.get(key) if self.shared is not None else None
+
+        if value is None:
+            value = await load()
+
+            if self.shared is not None:
+                await self.shared.set(key, value, ttl)
+
+        self.local.set(key, value, ttl)
+        return value
+
+    async def get_or_load(self, key: bytes, ttl: float, load: Callable[[], Awaitable[bytes]]) -> bytes:
+        value = self.local.get(key)
+
+        if value is not None:
+            return value
+
+        return await self.flights.run(key, lambda: self._load(key, ttl, load))
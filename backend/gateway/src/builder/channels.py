@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+from typing import Any, Optional
+
+import grpc
+from grpc import aio
+
+from ..config import settings
+
+
+class PooledChannel:
+    """
+    The single channel of the pool. Stubs are bound to it lazily and
+    the number of calls in flight is tracked for load balancing:
+
+        with pool.pick() as channel:
+            response = await channel.stub(stub_cls).Method(request)
+
+    or, passing the serialized messages through:
+
+        with pool.pick() as channel:
+            content = await channel.raw('/package.Service/Method')(content)
+    """
+    __slots__ = ['channel', 'in_flight', 'stubs', 'raw_calls']
+
+    def __init__(self, channel: aio.Channel) -> None:
+        self.channel = channel
+        self.in_flight = 0
+        self.stubs: dict[type[Any], Any] = {}
+        self.raw_calls: dict[str, aio.UnaryUnaryMultiCallable] = {}
+
+    def __enter__(self) -> 'PooledChannel':
+        self.in_flight += 1
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.in_flight -= 1
+
+    def stub(self, stub_cls: type[Any]) -> Any:
+        stub = self.stubs.get(stub_cls)
+
+        if stub is None:
+            stub = self.stubs[stub_cls] = stub_cls(self.channel)
+
+        return stub
+
+    def raw(self, method: str) -> aio.UnaryUnaryMultiCallable:
+        """
+        The unary call without the serializers, it takes and returns bytes
+        """
+        call = self.raw_calls.get(method)
+
+        if call is None:
+            call = self.raw_calls[method] = self.channel.unary_unary(method)
+
+        return call
+
+    def is_healthy(self) -> bool:
+        state = self.channel.get_state(try_to_connect=True)
+        return state not in (grpc.ChannelConnectivity.TRANSIENT_FAILURE,
+                             grpc.ChannelConnectivity.SHUTDOWN)
+
+
+class ChannelPool:
+    """
+    The set of channels to one `host:port` target. Each channel has its own
+    subchannels (HTTP/2 connections), so the calls are spread over several
+    connections instead of being pinned to a single one
+    """
+    __slots__ = ['target', 'size', 'strategy', 'options', 'channels', 'counter']
+
+    strategies = ('round_robin', 'least_loaded')
+
+    def __init__(
+        self,
+        target: str,
+        size: int,
+        strategy: str,
+        options: list[tuple[str, Any]],
+    ) -> None:
+        assert strategy in self.strategies
+
+        self.target = target
+        self.size = size
+        self.strategy = strategy
+        self.options = options
+        self.channels: list[PooledChannel] = []
+        self.counter = itertools.count()
+
+    def _open(self) -> None:
+        # Channels are opened on the first call to be bound to the running loop
+        self.channels = [PooledChannel(aio.insecure_channel(self.target, options=self.options))
+                         for _ in range(self.size)]
+
+    def _pick_round_robin(self) -> PooledChannel:
+        start = next(self.counter)
+
+        for i in range(self.size):
+            channel = self.channels[(start + i) % self.size]
+            if channel.is_healthy():
+                return channel
+
+        # Every channel is failing, the call will report the actual error
+        return self.channels[start % self.size]
+
+    def _pick_least_loaded(self) -> PooledChannel:
+        healthy = [channel for channel in self.channels if channel.is_healthy()]
+        return min(healthy or self.channels, key=lambda channel: channel.in_flight)
+
+    def pick(self) -> PooledChannel:
+        if not self.channels:
+            self._open()
+
+        if self.strategy == 'least_loaded':
+            return self._pick_least_loaded()
+        return self._pick_round_robin()
+
+    async def close(self, grace: Optional[float] = None) -> None:
+        channels, self.channels = self.channels, []
+        await asyncio.gather(*(c.channel.close(grace) for c in channels))
+
+
+class ChannelManager:
+    """
+    The registry of channel pools shared by all generated routes.
+    It's closed with the application lifespan
+    """
+    __slots__ = ['pools', 'size', 'strategy', 'options', 'grace']
+
+    def __init__(
+        self,
+        size: int = settings.GRPC_CHANNELS_PER_TARGET,
+        strategy: str = settings.GRPC_BALANCING_STRATEGY,
+        grace: Optional[float] = settings.GRPC_CLOSE_GRACE,
+    ) -> None:
+        self.pools: dict[str, ChannelPool] = {}
+        self.size = size
+        self.strategy = strategy
+        self.grace = grace
+        self.options = [
+            ('grpc.keepalive_time_ms', settings.GRPC_KEEPALIVE_TIME_MS),
+            ('grpc.keepalive_timeout_ms', settings.GRPC_KEEPALIVE_TIMEOUT_MS),
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.http2.max_pings_without_data', 0),
+            # Balance each channel over all the addresses the target is
+            #   resolved to, e.g. the replicas of the service
+            ('grpc.lb_policy_name', settings.GRPC_LB_POLICY),
+            # Don't share subchannels between the channels of the pool,
+            #   otherwise they would use the same connection
+            ('grpc.use_local_subchannel_pool', 1),
+        ]
+
+    def pool(self, target: str) -> ChannelPool:
+        if target not in self.pools:
+            self.pools[target] = ChannelPool(
+                target=target,
+                size=self.size,
+                strategy=self.strategy,
+                options=self.options,
+            )
+
+        return self.pools[target]
+
+    async def close(self) -> None:
+        await asyncio.gather(*(pool.close(self.grace) for pool in self.pools.values()))
@@ -0,0 +1,149 @@
+from typing import Any, Callable, Optional
+
+from google.protobuf import message_factory
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from google.protobuf.json_format import ParseDict
+from google.protobuf.message import Message
+from google.protobuf.struct_pb2 import Struct, Value, ListValue
+from google.protobuf.timestamp_pb2 import Timestamp
+from google.protobuf.duration_pb2 import Duration
+
+from .types import DecoderType
+
+
+def _to_timestamp(value: Any) -> Timestamp:
+    message = Timestamp()
+    message.FromDatetime(value)
+    return message
+
+
+def _to_duration(value: Any) -> Duration:
+    message = Duration()
+    message.FromTimedelta(value)
+    return message
+
+
+class MessageDecoder:
+    """
+    The compiler of request constructors. Each constructor is built once per
+    message type and fills the message from the validated pydantic body and
+    the path/query params by direct keyword assignment, so descriptors aren't
+    resolved by reflection on every request as `ParseDict` does.
+    """
+    __slots__ = ['converters', 'decoders']
+
+    well_known_types: dict[str, Callable[[Any], Message]] = {
+        'google.protobuf.Timestamp': _to_timestamp,
+        'google.protobuf.Duration': _to_duration,
+        'google.protobuf.Struct': lambda v: ParseDict(v, Struct()),
+        'google.protobuf.Value': lambda v: ParseDict(v, Value()),
+        'google.protobuf.ListValue': lambda v: ParseDict(v, ListValue()),
+    }
+
+    # Path and query params may come as strings if they are annotated so
+    param_casts: dict[int, Callable[[Any], Any]] = {
+        FieldDescriptor.CPPTYPE_INT32: int,
+        FieldDescriptor.CPPTYPE_INT64: int,
+        FieldDescriptor.CPPTYPE_UINT32: int,
+        FieldDescriptor.CPPTYPE_UINT64: int,
+        FieldDescriptor.CPPTYPE_DOUBLE: float,
+        FieldDescriptor.CPPTYPE_FLOAT: float,
+        FieldDescriptor.CPPTYPE_STRING: str,
+    }
+
+    def __init__(self) -> None:
+        self.converters: dict[str, Callable[[Any], Message]] = {}
+        self.decoders: dict[str, DecoderType] = {}
+
+    def _compile_value(self, field: FieldDescriptor) -> Optional[Callable[[Any], Any]]:
+        """
+        Returns a converter of a single field value or `None` if the value
+        can be assigned as is
+        """
+        if field.type == FieldDescriptor.TYPE_MESSAGE:
+            return self._compile_converter(field.message_type)
+        if field.type == FieldDescriptor.TYPE_ENUM:
+            return int
+        return None
+
+    def _compile_field(self, field: FieldDescriptor) -> Optional[Callable[[Any], Any]]:
+        if field.message_type is not None and field.message_type.GetOptions().map_entry:
+            value_converter = self._compile_value(field.message_type.fields_by_name['value'])
+
+            if value_converter is None:
+                return None
+            return lambda v: {k: value_converter(i) for k, i in v.items()}
+
+        value_converter = self._compile_value(field)
+
+        if value_converter is not None and field.label == FieldDescriptor.LABEL_REPEATED:
+            return lambda v: [value_converter(i) for i in v]
+
+        return value_converter
+
+    def _compile_kwargs(self, descriptor: Descriptor) -> Callable[[Any], dict[str, Any]]:
+        """
+        Returns the function collecting message keyword arguments from
+        the pydantic model of the same structure
+        """
+        fields = [(field.name, self._compile_field(field)) for field in descriptor.fields]
+
+        def collect(model: Any) -> dict[str, Any]:
+            kwargs = {}
+            for name, converter in fields:
+                value = getattr(model, name, None)
+                if value is not None:
+                    kwargs[name] = value if converter is None else converter(value)
+            return kwargs
+
+        return collect
+
+    def _compile_converter(self, descriptor: Descriptor) -> Callable[[Any], Message]:
+        full_name = descriptor.full_name
+
+        if full_name in self.converters:
+            return self.converters[full_name]
+
+        if full_name in self.well_known_types:
+            self.converters[full_name] = self.well_known_types[full_name]
+            return self.converters[full_name]
+
+        cls = message_factory.GetMessageClass(descriptor)
+        collect: Optional[Callable[[Any], dict[str, Any]]] = None
+
+        def convert(model: Any) -> Message:
+            if isinstance(model, Message):
+                return model
+            return cls(**collect(model))
+
+        # The converter is registered before compiling the fields to support
+        #   recursive messages
+        self.converters[full_name] = convert
+        collect = self._compile_kwargs(descriptor)
+
+        return convert
+
+    def compile(self, cls: type[Message]) -> DecoderType:
+        """
+        Returns the request constructor taking the body model (may be `None`
+        if the body is empty) and the dict of params
+        """
+        full_name = cls.DESCRIPTOR.full_name
+
+        if full_name in self.decoders:
+            return self.decoders[full_name]
+
+        collect = self._compile_kwargs(cls.DESCRIPTOR)
+        casts = {field.name: self.param_casts.get(field.cpp_type, lambda v: v)
+                 for field in cls.DESCRIPTOR.fields}
+
+        def decode(model: Any, fields: dict[str, Any]) -> Message:
+            kwargs = collect(model) if model is not None else {}
+
+            for name, value in fields.items():
+                if value is not None:
+                    kwargs[name] = casts[name](value)
+            return cls(**kwargs)
+
+        self.decoders[full_name] = decode
+        return decode
@@ -0,0 +1,159 @@
+import base64
+import json
+from operator import attrgetter
+from typing import Any, Callable, Optional
+
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.message import Message
+
+from .types import EncoderType
+
+try:
+    import msgpack
+except ImportError:  # only needed with `MSGPACK_TRANSPORT_ENABLED`
+    msgpack = None
+
+
+# The same options as `starlette.responses.JSONResponse` uses
+json_encoder = json.JSONEncoder(
+    ensure_ascii=False,
+    allow_nan=False,
+    indent=None,
+    separators=(',', ':'),
+)
+
+
+def _tuple_getter(names: list[str]) -> Callable[[Message], tuple[Any, ...]]:
+    """
+    `attrgetter` returns a single value instead of a tuple for one name
+    """
+    if len(names) == 1:
+        getter = attrgetter(names[0])
+        return lambda message: (getter(message),)
+    return attrgetter(*names)
+
+
+def _encode_bytes(value: bytes) -> str:
+    return base64.b64encode(value).decode()
+
+
+class MessageEncoder:
+    """
+    The compiler of protobuf messages into JSON-compatible encoders.
+    Encoders are built once per message type and read the message fields
+    directly, so the output has the shape of the serialized pydantic model
+    (proto field names, default values included) without `MessageToDict`
+    and model validation in between.
+    """
+    __slots__ = ['encoders']
+
+    well_known_types: dict[str, EncoderType] = {
+        'google.protobuf.Timestamp': lambda m: m.ToDatetime().isoformat(),
+        'google.protobuf.Duration': lambda m: m.ToTimedelta().total_seconds(),
+        'google.protobuf.Struct': MessageToDict,
+        'google.protobuf.Value': MessageToDict,
+        'google.protobuf.ListValue': MessageToDict,
+    }
+
+    def __init__(self) -> None:
+        self.encoders: dict[str, EncoderType] = {}
+
+    @property
+    def msgpack_supported(self) -> bool:
+        return msgpack is not None
+
+    def _compile_value(self, field: FieldDescriptor) -> Optional[Callable[[Any], Any]]:
+        """
+        Returns an encoder of a single field value or `None` if the value
+        can be used as is
+        """
+        if field.type == FieldDescriptor.TYPE_MESSAGE:
+            return self.compile(field.message_type)
+        if field.type == FieldDescriptor.TYPE_BYTES:
+            return _encode_bytes
+        return None
+
+    def _compile_field(self, field: FieldDescriptor) -> EncoderType:
+        name = field.name
+        getter = attrgetter(name)
+
+        if field.message_type is not None and field.message_type.GetOptions().map_entry:
+            value_encoder = self._compile_value(field.message_type.fields_by_name['value'])
+
+            if value_encoder is None:
+                return lambda m: dict(getter(m))
+            return lambda m: {k: value_encoder(v) for k, v in getter(m).items()}
+
+        value_encoder = self._compile_value(field)
+
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            if value_encoder is None:
+                return lambda m: list(getter(m))
+            return lambda m: [value_encoder(v) for v in getter(m)]
+
+        if field.type == FieldDescriptor.TYPE_MESSAGE:
+            # Unset messages are encoded as `null` instead of the default
+            # instance, otherwise recursive messages would never terminate
+            return lambda m: value_encoder(getter(m)) if m.HasField(name) else None
+
+        return lambda m: value_encoder(getter(m))
+
+    def compile(self, descriptor: Descriptor) -> EncoderType:
+        full_name = descriptor.full_name
+
+        if full_name in self.encoders:
+            return self.encoders[full_name]
+
+        if full_name in self.well_known_types:
+            self.encoders[full_name] = self.well_known_types[full_name]
+            return self.encoders[full_name]
+
+        # Plain scalars are read all at once by a single `attrgetter`
+        scalar_names: list[str] = []
+        fields: list[tuple[str, EncoderType]] = []
+
+        def encode(message: Message) -> dict[str, Any]:
+            result = dict(zip(scalar_names, scalar_getter(message)))
+            for name, field_encoder in fields:
+                result[name] = field_encoder(message)
+            return result
+
+        # The encoder is registered before compiling the fields to support
+        #   recursive messages
+        self.encoders[full_name] = encode
+
+        for field in descriptor.fields:
+            if (field.label != FieldDescriptor.LABEL_REPEATED
+                    and field.type not in (FieldDescriptor.TYPE_MESSAGE, FieldDescriptor.TYPE_BYTES)):
+                scalar_names.append(field.name)
+            else:
+                fields.append((field.name, self._compile_field(field)))
+
+        scalar_getter = _tuple_getter(scalar_names) if scalar_names else lambda m: ()
+
+        return encode
+
+    def compile_json(self, cls: type[Message]) -> Callable[[Message], bytes]:
+        encode = self.compile(cls.DESCRIPTOR)
+
+        def encode_json(message: Message) -> bytes:
+            return json_encoder.encode(encode(message)).encode('utf-8')
+
+        return encode_json
+
+    def compile_msgpack(self, cls: type[Message]) -> Callable[[Message], bytes]:
+        """
+        The same shape as `compile_json` packed into MessagePack, requires
+        the `msgpack` package
+        """
+        if msgpack is None:
+            raise RuntimeError('MessagePack encoding requires the `msgpack` package')
+
+        encode = self.compile(cls.DESCRIPTOR)
+        packer = msgpack.Packer(use_bin_type=True)
+
+        def encode_msgpack(message: Message) -> bytes:
+            return packer.pack(encode(message))
+
+        return encode_msgpack
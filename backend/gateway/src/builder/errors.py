@@ -0,0 +1,40 @@
+"""
+The HTTP statuses of the failed gRPC calls. The errors of the calls are
+left to propagate out of the endpoints, so the metrics count their codes,
+and are answered by `grpc_error_handler` the app installs. The errors the
+gateway raises on its own for the services, e.g. a key missing from a
+batch, are made by `grpc_http_exception` from the same mapping
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.exception_handlers import http_exception_handler
+from grpc import StatusCode, aio
+
+
+GRPC_HTTP_STATUSES = {
+    StatusCode.CANCELLED: 499,
+    StatusCode.UNKNOWN: 500,
+    StatusCode.INVALID_ARGUMENT: 400,
+    StatusCode.DEADLINE_EXCEEDED: 504,
+    StatusCode.NOT_FOUND: 404,
+    StatusCode.ALREADY_EXISTS: 409,
+    StatusCode.PERMISSION_DENIED: 403,
+    StatusCode.RESOURCE_EXHAUSTED: 429,
+    StatusCode.FAILED_PRECONDITION: 400,
+    StatusCode.ABORTED: 409,
+    StatusCode.OUT_OF_RANGE: 400,
+    StatusCode.UNIMPLEMENTED: 501,
+    StatusCode.INTERNAL: 500,
+    StatusCode.UNAVAILABLE: 503,
+    StatusCode.DATA_LOSS: 500,
+    StatusCode.UNAUTHENTICATED: 401,
+}
+
+
+def grpc_http_exception(code: StatusCode, details: Optional[str] = None) -> HTTPException:
+    return HTTPException(status_code=GRPC_HTTP_STATUSES.get(code, 500), detail=details or code.name)
+
+
+async def grpc_error_handler(request: Request, error: aio.AioRpcError) -> Response:
+    return await http_exception_handler(request, grpc_http_exception(error.code(), error.details()))
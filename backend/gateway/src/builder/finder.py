@@ -0,0 +1,50 @@
+import sys
+from importlib.abc import MetaPathFinder
+from importlib.machinery import ModuleSpec, PathFinder
+from pathlib import Path
+from typing import Optional, Sequence
+
+
+class GrpcToolsFinder(MetaPathFinder):
+    """
+    The import finder of generated gRPC modules. It resolves the top-level
+    packages located in the proto root, so the root is registered once
+    instead of being pushed to `sys.path` for every imported module.
+    Submodules are found by the import system through the package `__path__`
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.packages: set[str] = set()
+        self.invalidate_caches()
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Optional[Sequence[str]],
+        target: Optional[object] = None,
+    ) -> Optional[ModuleSpec]:
+        if path is not None or fullname not in self.packages:
+            return None
+
+        return PathFinder.find_spec(fullname, [str(self.root)])
+
+    def invalidate_caches(self) -> None:
+        self.packages = {path.stem for path in self.root.iterdir()
+                         if path.is_dir() or path.suffix == '.py'}
+
+
+def register_finder(root: Path) -> GrpcToolsFinder:
+    """
+    Registers the finder of the proto root if it's not registered yet
+    """
+    root = root.resolve()
+
+    for finder in sys.meta_path:
+        if isinstance(finder, GrpcToolsFinder) and finder.root == root:
+            return finder
+
+    finder = GrpcToolsFinder(root)
+    # Modules of the proto root take precedence as they did on `sys.path`
+    sys.meta_path.insert(0, finder)
+    return finder
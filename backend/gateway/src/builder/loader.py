@@ -1,14 +1,16 @@
 import re
-import copy
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Any, Generator, Iterable, TypeVar
 
-from protobuf_to_pydantic import msg_to_pydantic_model
+from protobuf_to_pydantic.gen_model import M2P
+from google.protobuf.descriptor import Descriptor
 from google.protobuf.json_format import MessageToDict, ParseDict
 from google.protobuf.message import Message
 from pydantic import BaseModel
 
-from .utils import import_classes
+from .utils import LazyModuleClasses
 from .interfaces import GrpcTools, GrpcModel
 from .types import ModuleClassesType
 from ..config import settings
@@ -17,36 +19,70 @@ from ..config import settings
 APIModelType = TypeVar('APIModelType', bound=BaseModel)
 
 
+class _SharedModelsM2P(M2P):
+    """
+    `M2P` caches the models of the nested messages per converted message,
+    so a message nested in several ones would get a model for each of them.
+    FastAPI can't name the models of the same name and module apart in
+    the schema, so the models are shared by the full names of the messages
+    """
+
+    def __init__(self, msg: type[Message], models: dict[str, type[BaseModel]]) -> None:
+        # Set before the conversion the base `__init__` runs
+        self._shared_models = models
+        super().__init__(msg)
+
+    def _parse_msg_to_pydantic_model(self, *, descriptor: Descriptor, class_name: str = '') -> type[BaseModel]:
+        model = self._shared_models.get(descriptor.full_name)
+
+        if model is None:
+            model = super()._parse_msg_to_pydantic_model(descriptor=descriptor, class_name=class_name)
+            self._shared_models[descriptor.full_name] = model
+
+        return model
+
+
 class GrpcLoader:
     """
     The loader of generated modules: containing servicers and stubs, messages
     and models. It's also responsible for the generation of models.
     """
-    __slots__ = ['models_cache']
+    __slots__ = ['models_cache', 'pydantic_models']
 
     grpc_tools_regex = re.compile(r'_(pb2(_grpc)?)')
     grpc_tools_args = {'pb2': 'messages',
                        'pb2_grpc': 'services'}
 
     def __init__(self) -> None:
-        self.models_cache: dict[str, type[APIModelType]] = {}
+        self.models_cache: dict[str, GrpcModel] = {}
+        # The models of the messages and of the nested ones by the full names
+        self.pydantic_models: dict[str, type[BaseModel]] = {}
 
     def _import_classes_by_tool(self, tool: str, **kwargs) -> tuple[str, ModuleClassesType]:
         arg_name = self.grpc_tools_args[tool]
-        return arg_name, import_classes(**kwargs)
+        return arg_name, LazyModuleClasses(**kwargs)
+
+    def _preload(self, tools: Iterable[GrpcTools]) -> None:
+        """
+        Imports the modules concurrently instead of on the first access
+        """
+        classes = [getattr(tool, arg_name) for tool in tools
+                   for arg_name in self.grpc_tools_args.values()]
+
+        with ThreadPoolExecutor(max_workers=settings.GRPC_TOOLS_PRELOAD_WORKERS) as executor:
+            list(executor.map(lambda c: c.classes, classes))
+
+    def find_grpc_files(self) -> list[Path]:
+        return [file for file in settings.GRPC_TOOLS_DIR.glob(f'**/*.py')
+                if re.search(self.grpc_tools_regex, str(file)) is not None]
 
     def load_grpc_tools(self) -> Generator[GrpcTools, None, None]:
-        grpc_files = list(settings.GRPC_TOOLS_DIR.glob(f'**/*.py'))
+        grpc_files = self.find_grpc_files()
         grouped_grpc_files = defaultdict(dict)
 
         # Group by parent directory
         for file in grpc_files:
-            tool = re.search(self.grpc_tools_regex, str(file))
-
-            if tool is None:
-                continue
-
-            tool = tool.group(1)
+            tool = re.search(self.grpc_tools_regex, str(file)).group(1)
             parent = file.parent.name
 
             # Parse file path
@@ -61,20 +97,28 @@ class GrpcLoader:
                 'path': path,
             }
 
+        grpc_tools = []
+
         for tools in grouped_grpc_files.values():
             tools_args = [self._import_classes_by_tool(k, **v)
                             for k, v in tools.items()]
-            yield GrpcTools(**dict(tools_args))
+            grpc_tools.append(GrpcTools(**dict(tools_args)))
+
+        # Modules are imported on demand unless the preload is enabled
+        if settings.GRPC_TOOLS_PRELOAD:
+            self._preload(grpc_tools)
+
+        yield from grpc_tools
 
     def load_model(self, cls: type[Any]) -> GrpcModel:
-        name = cls.__name__
+        name = cls.DESCRIPTOR.full_name
 
         if name in self.models_cache:
             return self.models_cache[name]
 
         self.models_cache[name] = GrpcModel(
             cls=cls,
-            model=msg_to_pydantic_model(cls)
+            model=_SharedModelsM2P(cls, self.pydantic_models).model
         )
 
         return self.models_cache[name]
@@ -90,7 +134,14 @@ class GrpcLoader:
 
     @staticmethod
     def exclude_model_fields(model: type[APIModelType], fields: Iterable[str]) -> type[APIModelType]:
-        new_model = copy.deepcopy(model)
+        fields = list(fields)
+
+        if not fields:
+            return model
+
+        # `copy.deepcopy` returns the class itself, so a subclass is created
+        #   to not remove the fields from the model shared by several methods
+        new_model = type(f'{model.__name__}Body', (model,), {})
 
         for field in fields:
             if type(new_model.__fields_set__) == set:
@@ -0,0 +1,184 @@
+"""
+Instrumentation of the generated routes, served in the Prometheus text
+format by `/metrics`. A request is split into the stages
+
+    validate   FastAPI parsing and validation of the params and the body
+    decode     the request fields into the gRPC message
+    call       the gRPC call, including the batching and the coalescing
+    encode     the gRPC response into JSON or the response model
+    serialize  FastAPI serialization of the endpoint result
+    total      the whole route handler
+
+The route handler of `InstrumentedRoute` puts a `RequestTiming` into
+the context, the endpoint built by `APIBuilder` marks its own bounds and
+stages in it. Nothing of this is installed when `METRICS_ENABLED` is off
+"""
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Iterable, Optional
+
+from fastapi import Request, Response
+
+from .negotiation import NegotiatedRoute
+from .singleflight import SingleFlight
+
+
+# Upper bounds of the histogram buckets, seconds
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+STAGES = ('validate', 'decode', 'call', 'encode', 'serialize', 'total')
+
+
+class Histogram:
+    __slots__ = ['buckets', 'counts', 'sum', 'count']
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        # Not cumulative, the last one is `+Inf`
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ['method', 'path', 'stages', 'in_flight', 'statuses']
+
+    def __init__(self, method: str, path: str) -> None:
+        self.method = method
+        self.path = path
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.in_flight = 0
+        # gRPC status code names by count
+        self.statuses: dict[str, int] = {}
+
+    def observe(self, stage: str, value: float) -> None:
+        self.stages[stage].observe(value)
+
+    def count_status(self, code: str) -> None:
+        self.statuses[code] = self.statuses.get(code, 0) + 1
+
+
+class RequestTiming:
+    __slots__ = ['route', 'started', 'entered', 'left']
+
+    def __init__(self, route: RouteMetrics) -> None:
+        self.route = route
+        self.started = time.perf_counter()
+        # Bounds of the endpoint, unset if FastAPI has rejected the request
+        self.entered: Optional[float] = None
+        self.left: Optional[float] = None
+
+
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar('current_timing', default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels: str) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class Metrics:
+    """
+    The registry of the route metrics and the coalesced calls
+    """
+    __slots__ = ['routes', 'flights']
+
+    def __init__(self) -> None:
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+        self.flights: dict[str, SingleFlight] = {}
+
+    def route(self, method: str, path: str) -> RouteMetrics:
+        route = self.routes.get((method, path))
+
+        if route is None:
+            route = self.routes[(method, path)] = RouteMetrics(method, path)
+
+        return route
+
+    def _render_histograms(self, routes: Iterable[RouteMetrics]) -> Iterable[str]:
+        yield '# HELP gateway_stage_seconds Time spent in a stage of a request'
+        yield '# TYPE gateway_stage_seconds histogram'
+
+        for route in routes:
+            for stage, histogram in route.stages.items():
+                labels = {'method': route.method, 'route': route.path, 'stage': stage}
+                cumulative = 0
+
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    yield f'gateway_stage_seconds_bucket{_labels(**labels, le=repr(bound))} {cumulative}'
+
+                yield f'gateway_stage_seconds_bucket{_labels(**labels, le="+Inf")} {histogram.count}'
+                yield f'gateway_stage_seconds_sum{_labels(**labels)} {histogram.sum!r}'
+                yield f'gateway_stage_seconds_count{_labels(**labels)} {histogram.count}'
+
+    def render(self) -> str:
+        routes = list(self.routes.values())
+        lines = list(self._render_histograms(routes))
+
+        lines.append('# HELP gateway_requests_in_flight Requests being handled')
+        lines.append('# TYPE gateway_requests_in_flight gauge')
+        for route in routes:
+            lines.append(f'gateway_requests_in_flight{_labels(method=route.method, route=route.path)} {route.in_flight}')
+
+        lines.append('# HELP gateway_grpc_responses_total gRPC calls by the status code')
+        lines.append('# TYPE gateway_grpc_responses_total counter')
+        for route in routes:
+            for code, count in route.statuses.items():
+                labels = _labels(method=route.method, route=route.path, code=code)
+                lines.append(f'gateway_grpc_responses_total{labels} {count}')
+
+        lines.append('# HELP gateway_coalesced_calls_total Coalesced calls started or joined')
+        lines.append('# TYPE gateway_coalesced_calls_total counter')
+        for name, flight in self.flights.items():
+            lines.append(f'gateway_coalesced_calls_total{_labels(call=name, result="started")} {flight.started}')
+            lines.append(f'gateway_coalesced_calls_total{_labels(call=name, result="shared")} {flight.shared}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class InstrumentedRoute(NegotiatedRoute):
+    """
+    Times the whole handler and keeps the in-flight gauge of the route.
+    What happens before the endpoint is entered is the validation and what
+    happens after it has returned is the serialization
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        route = metrics.route(','.join(sorted(self.methods)), self.path_format)
+
+        async def instrumented_handler(request: Request) -> Response:
+            timing = RequestTiming(route)
+            token = current_timing.set(timing)
+            route.in_flight += 1
+
+            try:
+                return await handler(request)
+            finally:
+                finished = time.perf_counter()
+                route.in_flight -= 1
+                current_timing.reset(token)
+
+                route.observe('total', finished - timing.started)
+                if timing.entered is not None:
+                    route.observe('validate', timing.entered - timing.started)
+                if timing.left is not None:
+                    route.observe('serialize', finished - timing.left)
+
+        return instrumented_handler
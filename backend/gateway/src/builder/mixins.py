@@ -4,6 +4,9 @@ class CleanMixin:
     def clean_method(self, value: str) -> str:
         return value.upper()
 
+    def clean_coalesce(self, value: str) -> str:
+        return value.lower()
+
     def clean_path(self, value: str) -> str:
         if not value.startswith('/'):
             return '/' + value
@@ -25,3 +28,21 @@ class ValidateMixin:
                 return False
 
         return True
+
+    def validate_cache(self, value: str) -> bool:
+        return value.isdigit()
+
+    def validate_coalesce(self, value: str) -> bool:
+        return value.lower() in ['true', 'false']
+
+    def validate_stream(self, value: str) -> bool:
+        return value in ['ndjson', 'array']
+
+    def validate_batch(self, value: str) -> bool:
+        return value.isidentifier()
+
+    def validate_batch_key(self, value: str) -> bool:
+        return value.isidentifier()
+
+    def validate_paginate(self, value: str) -> bool:
+        return value == 'cursor'
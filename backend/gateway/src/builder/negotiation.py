@@ -0,0 +1,79 @@
+"""
+Content negotiation of the generated routes, the content type decides how
+the body is read and the accepted types how the response is written. JSON
+is the default, the alternatives are endpoints `APIBuilder` attaches to
+the JSON one:
+
+    protobuf_endpoint           `application/x-protobuf` in the content
+                                type, the serialized messages are passed
+                                through as they are
+    protobuf_response_endpoint  `application/x-protobuf` in the accepted
+                                types, the JSON endpoint with the response
+                                serialized instead
+    msgpack_endpoint            `application/msgpack` in the accepted
+                                types, the JSON endpoint with the response
+                                packed instead
+
+Routes without them, e.g. the streaming ones, are left as they are
+"""
+import copy
+from typing import Any, Callable, Coroutine, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+
+PROTOBUF_MEDIA_TYPE = 'application/x-protobuf'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+
+def _accepts_protobuf(accept: str) -> bool:
+    return not accept or any(media_type in accept for media_type in (PROTOBUF_MEDIA_TYPE, 'application/*', '*/*'))
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Dispatches a request to the endpoint of its media types. The headers
+    are only looked for the types, the quality values are not weighed
+    """
+
+    def _create_response_handler(
+        self,
+        endpoint: Optional[Callable[..., Any]],
+    ) -> Optional[Callable[[Request], Coroutine[Any, Any, Response]]]:
+        """
+        The same validation and body parsing, another endpoint called
+        """
+        if endpoint is None:
+            return None
+
+        route = copy.copy(self)
+        route.dependant = copy.copy(self.dependant)
+        route.dependant.call = endpoint
+        return APIRoute.get_route_handler(route)
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        protobuf_endpoint = getattr(self.endpoint, 'protobuf_endpoint', None)
+        protobuf_handler = self._create_response_handler(getattr(self.endpoint, 'protobuf_response_endpoint', None))
+        msgpack_handler = self._create_response_handler(getattr(self.endpoint, 'msgpack_endpoint', None))
+
+        if protobuf_endpoint is None and protobuf_handler is None and msgpack_handler is None:
+            return handler
+
+        async def negotiated_handler(request: Request) -> Response:
+            headers = request.headers
+            accept = headers.get('accept', '')
+
+            if protobuf_endpoint is not None and PROTOBUF_MEDIA_TYPE in headers.get('content-type', ''):
+                # The reply is passed through serialized, it can't be another type
+                if not _accepts_protobuf(accept):
+                    raise HTTPException(status_code=406, detail=f'{PROTOBUF_MEDIA_TYPE} requests are answered in kind')
+                return await protobuf_endpoint(request)
+            if protobuf_handler is not None and PROTOBUF_MEDIA_TYPE in accept:
+                return await protobuf_handler(request)
+            if msgpack_handler is not None and MSGPACK_MEDIA_TYPE in accept:
+                return await msgpack_handler(request)
+            return await handler(request)
+
+        return negotiated_handler
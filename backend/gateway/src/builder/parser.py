@@ -1,10 +1,13 @@
 import re
+import time
 from typing import Any, Callable, Sequence, TypeVar
 
 from .loader import GrpcLoader
+from .storage import DescriptionStorage
 from .utils import find_methods
 from .mixins import ValidateMixin, CleanMixin
 from .interfaces import ObjectAttrs, Servicer, GrpcTools, GrpcModel
+from ..config import settings
 
 
 AttrsType = TypeVar('AttrsType', bound=dict[str, str])
@@ -17,12 +20,14 @@ class GrpcParser(ValidateMixin, CleanMixin):
     __slots__ = []
 
     api_regex = re.compile(r'^\s*\[REST\].*')
-    api_attr_regex = re.compile(r'(\w+)\s*=\s*([\w/{}\.]+)')
+    # Hosts may be the names of compose services, e.g. `ms-product`
+    api_attr_regex = re.compile(r'(\w+)\s*=\s*([\w/{}\.\-]+)')
     api_params_regex = re.compile(r'(\w+)\s*:\s*([\w/{}]+)')
 
     def __init__(self) -> None:
         self.api: list[Servicer] = []
         self.loader = GrpcLoader()
+        self.storage = DescriptionStorage()
 
     def _is_service_servicer(self, name: str) -> bool:
         return name.endswith('Servicer')
@@ -147,11 +152,32 @@ class GrpcParser(ValidateMixin, CleanMixin):
                 object_attrs=api_attrs[1:],
             ))
 
+    def _load_from_storage(self) -> bool:
+        key = self.storage.key(self.loader.find_grpc_files())
+        api = self.storage.load(key)
+
+        if api is None:
+            for grpc_tool in self.loader.load_grpc_tools():
+                self._parse(grpc_tool)
+
+            self.storage.dump(key, self.api)
+            return False
+
+        self.api += api
+        return True
+
     def parse(self) -> Sequence[Servicer]:
-        grpc_tools = self.loader.load_grpc_tools()
+        started = time.perf_counter()
+
+        if settings.API_CACHE_ENABLED:
+            cached = self._load_from_storage()
+        else:
+            cached = False
+            for grpc_tool in self.loader.load_grpc_tools():
+                self._parse(grpc_tool)
 
-        for grpc_tool in grpc_tools:
-            self._parse(grpc_tool)
+        print(f"API description is {'loaded from cache' if cached else 'parsed'} "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
 
         print(self.api)
         return self.api
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single one: the first
+    caller starts the call and everyone arriving before it's finished shares
+    its result or error.
+
+    `started` counts the calls that were actually run and `shared` counts
+    the ones that joined a call in flight instead
+    """
+    __slots__ = ['calls', 'started', 'shared']
+
+    def __init__(self) -> None:
+        self.calls: dict[Hashable, asyncio.Future[Any]] = {}
+        self.started = 0
+        self.shared = 0
+
+    def _done(self, key: Hashable, task: asyncio.Future[Any]) -> None:
+        del self.calls[key]
+
+        # Mark the error as retrieved in case all the callers have gone
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        task = self.calls.get(key)
+
+        if task is None:
+            # The call is run as a separate task, so a cancelled caller
+            #   (e.g. a disconnected client) doesn't cancel it for the others
+            task = self.calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.started += 1
+        else:
+            self.shared += 1
+
+        return await asyncio.shield(task)
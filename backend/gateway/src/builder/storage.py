@@ -0,0 +1,146 @@
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Iterable, Optional
+
+import protobuf_to_pydantic
+from protobuf_to_pydantic import pydantic_model_to_py_code
+
+from .interfaces import GrpcModel, ObjectAttrs, Servicer
+from .utils import import_module
+from ..config import settings
+
+
+class DescriptionStorage:
+    """
+    The on-disk cache of the parsed API description. The artifact is keyed
+    by the hash of the generated gRPC modules and contains the servicers
+    description (`api.json`) and the source code of the pydantic models
+    (`models.py`), so a warm start neither scans docstrings nor generates
+    the models again.
+    """
+    __slots__ = ['directory']
+
+    # Bump it on any change of the artifact format
+    version = '2'
+
+    def __init__(self, directory: Path = settings.API_CACHE_DIR) -> None:
+        self.directory = directory
+
+    def key(self, files: Iterable[Path]) -> str:
+        digest = hashlib.sha256(f'{self.version}:{protobuf_to_pydantic.__version__}'.encode())
+
+        for file in sorted(files):
+            digest.update(str(file.relative_to(settings.GRPC_TOOLS_DIR)).encode())
+            digest.update(file.read_bytes())
+
+        return digest.hexdigest()
+
+    def _dump_model(self, model: GrpcModel) -> dict[str, str]:
+        return {
+            'module': model.cls.__module__,
+            'name': model.cls.__name__,
+            'model': model.model.__name__,
+        }
+
+    def _dump_attrs(self, attrs: ObjectAttrs) -> dict[str, Any]:
+        data = {
+            'name': attrs.obj.__name__,
+            'attrs': attrs.attrs,
+            'params': attrs.params,
+        }
+
+        if attrs.request is not None:
+            data['request'] = self._dump_model(attrs.request)
+            data['response'] = self._dump_model(attrs.response)
+
+        return data
+
+    def _dump_servicer(self, servicer: Servicer) -> dict[str, Any]:
+        return {
+            'module': servicer.cls.__module__,
+            'stub': servicer.stub_cls.__name__,
+            'attrs': self._dump_attrs(servicer.attrs),
+            'methods': [self._dump_attrs(attrs) for attrs in servicer.object_attrs],
+        }
+
+    def dump(self, key: str, api: Iterable[Servicer]) -> None:
+        api = list(api)
+        models = {attrs.request.model.__name__: attrs.request.model
+                  for servicer in api for attrs in servicer.object_attrs}
+        models |= {attrs.response.model.__name__: attrs.response.model
+                   for servicer in api for attrs in servicer.object_attrs}
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Write into a temporary directory and rename it, so concurrently
+        #   starting workers never see a partially written artifact
+        tmp = Path(tempfile.mkdtemp(dir=self.directory))
+        (tmp / 'api.json').write_text(json.dumps([self._dump_servicer(s) for s in api]))
+        (tmp / 'models.py').write_text(pydantic_model_to_py_code(*models.values()))
+
+        try:
+            os.replace(tmp, self.directory / key)
+        except OSError:
+            # Another worker has already stored the same artifact
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        # Artifacts of outdated sources are useless
+        for path in self.directory.iterdir():
+            if path.name != key and path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _import_models(self, key: str) -> ModuleType:
+        spec = importlib.util.spec_from_file_location(
+            f'_api_models_{key[:16]}',
+            self.directory / key / 'models.py',
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def load(self, key: str) -> Optional[list[Servicer]]:
+        path = self.directory / key / 'api.json'
+
+        if not path.exists():
+            return None
+
+        data = json.loads(path.read_text())
+        models = self._import_models(key)
+
+        def load_model(data: dict[str, str]) -> GrpcModel:
+            module = importlib.import_module(data['module'])
+            return GrpcModel(
+                cls=getattr(module, data['name']),
+                model=getattr(models, data['model']),
+            )
+
+        def load_attrs(obj: Any, data: dict[str, Any]) -> ObjectAttrs:
+            return ObjectAttrs(
+                obj=obj,
+                attrs=data['attrs'],
+                params=data['params'],
+                request=load_model(data['request']) if 'request' in data else None,
+                response=load_model(data['response']) if 'response' in data else None,
+            )
+
+        api = []
+
+        for servicer in data:
+            module = import_module(servicer['module'], str(settings.GRPC_TOOLS_DIR))
+            cls = getattr(module, servicer['attrs']['name'])
+
+            api.append(Servicer(
+                cls=cls,
+                stub_cls=getattr(module, servicer['stub']),
+                attrs=load_attrs(cls, servicer['attrs']),
+                object_attrs=[load_attrs(getattr(cls, method['name']), method)
+                              for method in servicer['methods']],
+            ))
+
+        return api
@@ -1,4 +1,8 @@
-from typing import Any, TypeVar
+from typing import Any, Callable, TypeVar
+
+from google.protobuf.message import Message
 
 
 ModuleClassesType = TypeVar('ModuleClassesType', bound=dict[str, type[Any]])
+EncoderType = Callable[[Message], Any]
+DecoderType = Callable[[Any, dict[str, Any]], Message]
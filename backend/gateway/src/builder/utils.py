@@ -1,10 +1,12 @@
 import importlib
 import inspect
-import sys
 import re
+from collections.abc import Mapping
+from pathlib import Path
 from types import FunctionType, ModuleType
-from typing import Any, Callable, Optional, TypeVar, Union
+from typing import Any, Callable, Iterator, Optional, TypeVar, Union
 
+from .finder import register_finder
 from .types import ModuleClassesType
 
 
@@ -12,7 +14,7 @@ _FuncType = TypeVar("_FuncType", bound=Callable[..., Any])
 
 
 def import_module(module_name: str, file: str) -> ModuleType:
-    sys.path.insert(0, file) 
+    register_finder(Path(file))
     return importlib.import_module(module_name)
 
 
@@ -21,6 +23,41 @@ def import_classes(module_name: str, path: str) -> ModuleClassesType:
     return {k: v for k, v in inspect.getmembers(module, inspect.isclass)}
 
 
+def import_string(path: str) -> Any:
+    """
+    Imports an object by the dotted path, e.g. `package.module.Class`
+    """
+    module_name, name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), name)
+
+
+class LazyModuleClasses(Mapping):
+    """
+    The classes of a module that is imported on the first access
+    """
+    __slots__ = ['module_name', 'path', '_classes']
+
+    def __init__(self, module_name: str, path: str) -> None:
+        self.module_name = module_name
+        self.path = path
+        self._classes: Optional[ModuleClassesType] = None
+
+    @property
+    def classes(self) -> ModuleClassesType:
+        if self._classes is None:
+            self._classes = import_classes(self.module_name, self.path)
+        return self._classes
+
+    def __getitem__(self, key: str) -> type[Any]:
+        return self.classes[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.classes)
+
+    def __len__(self) -> int:
+        return len(self.classes)
+
+
 def find_methods(cls: object) -> list[Callable[..., Any]]:
     return [getattr(cls, method) for method in dir(cls)
             if callable(getattr(cls, method)) and not method.startswith('__')]
@@ -30,16 +67,56 @@ def find_class(name: str, module: ModuleType) -> Optional[type[Any]]:
     return getattr(module, name, None)
 
 
+def find_stub_method_kinds(stub_cls: type[Any]) -> dict[str, str]:
+    """
+    Returns the kinds of stub methods by their names, e.g.
+    `{'GetProduct': 'unary_unary', 'ExportProducts': 'unary_stream'}`.
+    The stub is created with a stand-in channel recording the multi-callables
+    it asks for
+    """
+    kinds: dict[str, str] = {}
+
+    class Channel:
+        def __getattr__(self, kind: str) -> Callable[..., None]:
+            def create_callable(method: str, *args, **kwargs) -> None:
+                kinds[method.rsplit('/', 1)[-1]] = kind
+            return create_callable
+
+    stub_cls(Channel())
+    return kinds
+
+
+def find_stub_method_paths(stub_cls: type[Any]) -> dict[str, str]:
+    """
+    Returns the full paths of stub methods by their names, e.g.
+    `{'GetProduct': '/product.Catalog/GetProduct'}`, the same way as
+    `find_stub_method_kinds`
+    """
+    paths: dict[str, str] = {}
+
+    class Channel:
+        def __getattr__(self, kind: str) -> Callable[..., None]:
+            def create_callable(method: str, *args, **kwargs) -> None:
+                paths[method.rsplit('/', 1)[-1]] = method
+            return create_callable
+
+    stub_cls(Channel())
+    return paths
+
+
 def create_annotated_function(
     f: _FuncType,
     f_types: dict[str, Union[str, type[Any]]],
-    name: Optional[str]
+    name: Optional[str],
+    defaults: Optional[dict[str, Any]] = None,
 ) -> _FuncType:
+    defaults = defaults or {}
     parameters = [
         inspect.Parameter(
             name=p,
             kind=inspect.Parameter.POSITIONAL_OR_KEYWORD,
-            annotation=t
+            annotation=t,
+            default=defaults.get(p, inspect.Parameter.empty),
         ) for p, t in f_types.items()]
 
     s = inspect.signature(f)
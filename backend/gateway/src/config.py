@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 from pydantic import BaseSettings, validator
 
@@ -18,8 +18,46 @@ class Settings(BaseSettings):
 
     BASE_DIR: Path = Path(__file__).resolve().parent
     GRPC_TOOLS_DIR: Path
+    # Import all generated modules concurrently at startup instead of
+    #   importing them on demand
+    GRPC_TOOLS_PRELOAD: bool = False
+    GRPC_TOOLS_PRELOAD_WORKERS: int = 4
 
-    @validator('GRPC_TOOLS_DIR')
+    # The cache of the parsed API description, see `builder.storage`
+    API_CACHE_ENABLED: bool = True
+    API_CACHE_DIR: Path = Path('.api_cache')
+
+    # Encode gRPC responses straight into JSON, bypassing the pydantic models
+    FAST_RESPONSE_ENABLED: bool = True
+
+    # Caching of the routes with `cache=<ttl>` attribute
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_SIZE: int = 64 * 1024 * 1024
+    # Import path of the shared tier class, see `builder.cache.CacheBackend`
+    RESPONSE_CACHE_BACKEND: Optional[str] = None
+
+    # Gathering of single-item requests into `batch=<method>` calls
+    BATCH_WINDOW_MS: float = 2.0
+    BATCH_MAX_SIZE: int = 100
+
+    # Alternative media types of the generated routes, see `builder.negotiation`.
+    #   MessagePack needs the `msgpack` package, the gateway fails to start without it
+    PROTOBUF_TRANSPORT_ENABLED: bool = True
+    MSGPACK_TRANSPORT_ENABLED: bool = True
+
+    # Per-stage timings of the routes and gRPC status counts served by
+    #   `/metrics`, see `builder.metrics`
+    METRICS_ENABLED: bool = False
+
+    # gRPC channels to the services
+    GRPC_CHANNELS_PER_TARGET: int = 4
+    GRPC_BALANCING_STRATEGY: str = 'round_robin'  # or 'least_loaded'
+    GRPC_LB_POLICY: str = 'round_robin'
+    GRPC_KEEPALIVE_TIME_MS: int = 30_000
+    GRPC_KEEPALIVE_TIMEOUT_MS: int = 10_000
+    GRPC_CLOSE_GRACE: Optional[float] = 5.0
+
+    @validator('GRPC_TOOLS_DIR', 'API_CACHE_DIR')
     def post_process_grpc_tools_dir(cls, value: str, values: dict[str, Any]):
         value = Path(value)
         if not value.is_absolute():
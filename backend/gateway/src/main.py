@@ -1,19 +1,40 @@
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from grpc import aio
 
+from .builder import ChannelManager, grpc_error_handler, metrics
 from .config import settings
 from .router import get_router
 
 
 def create_app() -> FastAPI:
+    channels = ChannelManager()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+        yield
+        await channels.close()
+
     app = FastAPI(
         title=settings.PROJECT_TITLE,
         description=settings.PROJECT_DESCRIPTION,
         version=settings.PROJECT_VERSION,
+        lifespan=lifespan,
     )
 
-    router = get_router()
+    router = get_router(channels)
     app.include_router(router)
+    # The failed calls of the generated routes
+    app.add_exception_handler(aio.AioRpcError, grpc_error_handler)
+
+    if settings.METRICS_ENABLED:
+        @app.get('/metrics', include_in_schema=False)
+        async def get_metrics() -> PlainTextResponse:
+            return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
 
     return app
 
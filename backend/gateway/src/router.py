@@ -1,12 +1,16 @@
 from fastapi import APIRouter
 
-from .builder import APIBuilder
+from .builder import APIBuilder, ChannelManager, InstrumentedRoute, NegotiatedRoute
+from .config import settings
 
 
-def get_router() -> APIRouter:
-    router = APIRouter(prefix='/api/v1')
+def get_router(channels: ChannelManager) -> APIRouter:
+    router = APIRouter(
+        prefix='/api/v1',
+        route_class=InstrumentedRoute if settings.METRICS_ENABLED else NegotiatedRoute,
+    )
 
-    builder = APIBuilder()
+    builder = APIBuilder(channels)
     routes = builder.build()
 
     print(routes)
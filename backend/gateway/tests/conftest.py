@@ -0,0 +1,161 @@
+"""
+The tests build the gateway from the protos of the services and of
+`tests/protos`, generated into a temporary directory the same way as
+`entrypoint.sh` does. The ones of the services are looked up in `proto/`
+as mounted in the container, or in `../proto` of the repository:
+
+    python -m pytest tests
+
+The routes of `fake.proto` are driven through ASGI against the in-process
+`FakeServicer`. The app and its response cache are shared by the tests,
+so the ones of the cached routes request ids of their own. Coroutine tests
+are run in a single loop, the one the channels of the app are bound to
+"""
+import asyncio
+import inspect
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, AsyncGenerator, Generator, Optional
+
+import httpx
+import pytest
+from grpc import StatusCode, aio
+
+from benchmarks.utils import compile_protos
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROTOS_DIR = next((path for path in (BASE_DIR / 'proto', BASE_DIR.parent / 'proto') if path.is_dir()))
+TEST_PROTOS_DIR = Path(__file__).resolve().parent / 'protos'
+
+GRPC_TOOLS_DIR = Path(tempfile.mkdtemp(prefix='gateway-tests-'))
+compile_protos(GRPC_TOOLS_DIR, PROTOS_DIR)
+compile_protos(GRPC_TOOLS_DIR, TEST_PROTOS_DIR)
+
+# The settings are read on import, the cached API description is not to be
+#   mixed with the generated protos
+os.environ['GRPC_TOOLS_DIR'] = str(GRPC_TOOLS_DIR)
+os.environ['API_CACHE_ENABLED'] = '0'
+
+from src.builder.utils import import_module  # noqa: E402
+from src.main import app  # noqa: E402
+
+fake_pb2 = import_module('fake.fake_pb2', str(GRPC_TOOLS_DIR))
+fake_pb2_grpc = import_module('fake.fake_pb2_grpc', str(GRPC_TOOLS_DIR))
+
+# The host and the port of `Fake` service in `fake.proto`
+FAKE_TARGET = '127.0.0.1:50071'
+# Items of the ids from it on don't exist
+MISSING_ID = 1000
+
+loop = asyncio.new_event_loop()
+asyncio.set_event_loop(loop)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem: pytest.Function) -> Any:
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+
+    arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    loop.run_until_complete(pyfuncitem.obj(**arguments))
+    return True
+
+
+class FakeServicer(fake_pb2_grpc.FakeServicer):
+    """
+    Records the calls, every one of them is delayed by `delay` seconds
+    and fails with `error` if it's set. The streams of `ListItems` are
+    the items up to the requested id, failed after `fail_after` items
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls: list[tuple[str, Any]] = []
+        self.delay = 0.0
+        self.error: Optional[StatusCode] = None
+        self.fail_after: Optional[int] = None
+
+    async def _call(self, name: str, request: Any, context: aio.ServicerContext) -> None:
+        self.calls.append((name, request))
+
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            await context.abort(self.error, f'{name} has failed')
+
+    def called(self, name: str) -> list[Any]:
+        return [request for call, request in self.calls if call == name]
+
+    async def _get_item(self, name: str, request: Any, context: aio.ServicerContext) -> Any:
+        await self._call(name, request, context)
+
+        if request.id >= MISSING_ID:
+            await context.abort(StatusCode.NOT_FOUND, f'Item {request.id} is not found')
+
+        return fake_pb2.Item(id=request.id, name=f'Item {request.id}')
+
+    async def GetItem(self, request: Any, context: aio.ServicerContext) -> Any:
+        return await self._get_item('GetItem', request, context)
+
+    async def GetCachedItem(self, request: Any, context: aio.ServicerContext) -> Any:
+        return await self._get_item('GetCachedItem', request, context)
+
+    async def GetCoalescedItem(self, request: Any, context: aio.ServicerContext) -> Any:
+        return await self._get_item('GetCoalescedItem', request, context)
+
+    async def GetItems(self, request: Any, context: aio.ServicerContext) -> Any:
+        await self._call('GetItems', request, context)
+        return fake_pb2.ItemsReply(items=[
+            fake_pb2.Item(id=id, name=f'Item {id}') for id in request.ids if id < MISSING_ID
+        ])
+
+    async def EchoItem(self, request: Any, context: aio.ServicerContext) -> Any:
+        await self._call('EchoItem', request, context)
+        return request
+
+    async def _list_items(self, name: str, request: Any, context: aio.ServicerContext) -> AsyncGenerator[Any, None]:
+        await self._call(name, request, context)
+
+        for id in range(1, request.id + 1):
+            if self.fail_after is not None and id > self.fail_after:
+                await context.abort(StatusCode.UNAVAILABLE, f'{name} has failed')
+            yield fake_pb2.Item(id=id, name=f'Item {id}')
+
+    async def ListItems(self, request: Any, context: aio.ServicerContext) -> AsyncGenerator[Any, None]:
+        async for item in self._list_items('ListItems', request, context):
+            yield item
+
+    async def ListItemsArray(self, request: Any, context: aio.ServicerContext) -> AsyncGenerator[Any, None]:
+        async for item in self._list_items('ListItemsArray', request, context):
+            yield item
+
+
+@pytest.fixture(scope='session')
+def server() -> Generator[FakeServicer, None, None]:
+    servicer = FakeServicer()
+    server = aio.server()
+    fake_pb2_grpc.add_FakeServicer_to_server(servicer, server)
+    server.add_insecure_port(FAKE_TARGET)
+    loop.run_until_complete(server.start())
+    # The channels of the app are closed at its shutdown
+    lifespan = app.router.lifespan_context(app)
+    loop.run_until_complete(lifespan.__aenter__())
+
+    yield servicer
+
+    loop.run_until_complete(lifespan.__aexit__(None, None, None))
+    loop.run_until_complete(server.stop(None))
+
+
+@pytest.fixture
+def servicer(server: FakeServicer) -> FakeServicer:
+    server.reset()
+    return server
+
+
+@pytest.fixture
+def client(servicer: FakeServicer) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://gateway')
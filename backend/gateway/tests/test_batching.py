@@ -0,0 +1,95 @@
+import asyncio
+from typing import Any
+
+import httpx
+
+from conftest import MISSING_ID, FakeServicer
+from src.builder.batching import BatchLoader
+from src.config import settings
+
+
+def create_loader(window: float = 0.01, max_size: int = 100) -> tuple[BatchLoader[int, str], list[list[int]]]:
+    batches: list[list[int]] = []
+
+    async def load_batch(keys: list[int]) -> dict[int, str]:
+        batches.append(keys)
+        return {key: f'value {key}' for key in keys if key < MISSING_ID}
+
+    return BatchLoader(load_batch, window=window, max_size=max_size), batches
+
+
+async def test_loads_within_window_are_batched() -> None:
+    loader, batches = create_loader()
+
+    results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1))
+
+    assert results == ['value 1', 'value 2', 'value 1']
+    assert batches == [[1, 2]]
+
+    # The next loads are the next batch
+    assert await loader.load(3) == 'value 3'
+    assert batches == [[1, 2], [3]]
+
+
+async def test_batches_are_split_by_max_size() -> None:
+    loader, batches = create_loader(window=60, max_size=2)
+
+    results = await asyncio.gather(*(loader.load(key) for key in range(4)))
+
+    assert results == [f'value {key}' for key in range(4)]
+    assert batches == [[0, 1], [2, 3]]
+
+
+async def test_missing_key_fails_its_load_only() -> None:
+    loader, batches = create_loader()
+
+    results = await asyncio.gather(loader.load(1), loader.load(MISSING_ID), return_exceptions=True)
+
+    assert results[0] == 'value 1'
+    assert isinstance(results[1], KeyError)
+    assert batches == [[1, MISSING_ID]]
+
+
+async def test_batch_error_fails_every_load() -> None:
+    async def load_batch(keys: list[int]) -> dict[int, Any]:
+        raise RuntimeError('failed')
+
+    loader = BatchLoader(load_batch, window=0.01, max_size=100)
+
+    results = await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_batched_route_gathers_requests(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    responses = await asyncio.gather(*(client.get(f'/api/v1/fake/items/{id}/') for id in (1, 2, 3, 2)))
+
+    assert [r.json()['id'] for r in responses] == [1, 2, 3, 2]
+    assert [list(r.ids) for r in servicer.called('GetItems')] == [[1, 2, 3]]
+    assert servicer.called('GetItem') == []
+
+
+async def test_batched_route_splits_by_max_size(
+    client: httpx.AsyncClient,
+    servicer: FakeServicer,
+) -> None:
+    ids = range(1, settings.BATCH_MAX_SIZE + 2)
+
+    responses = await asyncio.gather(*(client.get(f'/api/v1/fake/items/{id}/') for id in ids))
+
+    assert [r.status_code for r in responses] == [200] * len(ids)
+    assert [len(r.ids) for r in servicer.called('GetItems')] == [settings.BATCH_MAX_SIZE, 1]
+
+
+async def test_batched_route_answers_missing_item_with_404(
+    client: httpx.AsyncClient,
+    servicer: FakeServicer,
+) -> None:
+    found, missing = await asyncio.gather(
+        client.get('/api/v1/fake/items/1/'),
+        client.get(f'/api/v1/fake/items/{MISSING_ID}/'),
+    )
+
+    assert found.status_code == 200
+    assert missing.status_code == 404
+    assert [list(r.ids) for r in servicer.called('GetItems')] == [[1, MISSING_ID]]
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from conftest import FakeServicer
+from src.builder import cache
+from src.builder.cache import LRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> SimpleNamespace:
+    # Only the cache reads the clock, the loop keeps the real one
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_lru_cache_expires_values(clock: SimpleNamespace) -> None:
+    lru = LRUCache(max_size=1024)
+    lru.set(b'key', b'value', ttl=60)
+
+    clock.now += 59
+    assert lru.get(b'key') == b'value'
+
+    clock.now += 2
+    assert lru.get(b'key') is None
+    assert lru.size == 0
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    # Three items of 4 bytes each fit
+    lru = LRUCache(max_size=12)
+
+    for key in (b'a', b'b', b'c'):
+        lru.set(key, b'123', ttl=60)
+    lru.get(b'a')
+    lru.set(b'd', b'123', ttl=60)
+
+    assert list(lru.items) == [b'c', b'a', b'd']
+    assert lru.size == 12
+
+    # Larger than the whole cache, not stored at all
+    lru.set(b'e', b'123456789abcdef', ttl=60)
+    assert lru.get(b'e') is None
+    assert list(lru.items) == [b'c', b'a', b'd']
+
+
+async def test_cached_route_calls_once_per_ttl(
+    client: httpx.AsyncClient,
+    servicer: FakeServicer,
+    clock: SimpleNamespace,
+) -> None:
+    first = await client.get('/api/v1/fake/cached/1/')
+    second = await client.get('/api/v1/fake/cached/1/')
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() == {'id': 1, 'name': 'Item 1', 'tags': []}
+    assert len(servicer.called('GetCachedItem')) == 1
+
+    # The route is cached for 60 seconds
+    clock.now += 61
+    await client.get('/api/v1/fake/cached/1/')
+
+    assert len(servicer.called('GetCachedItem')) == 2
+
+
+async def test_cached_route_coalesces_misses(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    servicer.delay = 0.05
+
+    responses = await asyncio.gather(*(client.get('/api/v1/fake/cached/2/') for _ in range(5)))
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert [r.json()['id'] for r in responses] == [2] * 5
+    assert [r.id for r in servicer.called('GetCachedItem')] == [2]
+
+
+async def test_cached_route_keys_by_request(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    await client.get('/api/v1/fake/cached/3/')
+    await client.get('/api/v1/fake/cached/4/')
+    await client.get('/api/v1/fake/cached/3/', headers={'Accept': 'application/msgpack'})
+
+    # Every media type is cached apart
+    assert [r.id for r in servicer.called('GetCachedItem')] == [3, 4, 3]
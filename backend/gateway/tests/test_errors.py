@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+from grpc import StatusCode
+
+from conftest import MISSING_ID, FakeServicer, fake_pb2
+from src.builder.negotiation import PROTOBUF_MEDIA_TYPE
+
+
+async def test_status_codes_are_mapped(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    statuses = {}
+
+    for code in (StatusCode.INVALID_ARGUMENT, StatusCode.NOT_FOUND, StatusCode.UNAVAILABLE, StatusCode.INTERNAL):
+        servicer.error = code
+        response = await client.post('/api/v1/fake/items/', json={'id': 1})
+        statuses[code] = response.status_code
+
+    assert statuses == {
+        StatusCode.INVALID_ARGUMENT: 400,
+        StatusCode.NOT_FOUND: 404,
+        StatusCode.UNAVAILABLE: 503,
+        StatusCode.INTERNAL: 500,
+    }
+    assert response.json() == {'detail': 'EchoItem has failed'}
+
+
+async def test_not_found_of_every_call_is_404(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    path = f'/api/v1/fake/coalesced/{MISSING_ID}/'
+
+    # The error of the coalesced call is shared, the cached, the passed
+    #   through and the batched requests fail the same way
+    responses = await asyncio.gather(*(client.get(path) for _ in range(3)))
+    cached = await client.get(f'/api/v1/fake/cached/{MISSING_ID}/')
+    protobuf = await client.request('GET', path, headers={'Content-Type': PROTOBUF_MEDIA_TYPE})
+    batched = await client.get(f'/api/v1/fake/items/{MISSING_ID}/')
+
+    assert [r.status_code for r in responses] == [404] * 3
+    assert responses[0].json() == {'detail': f'Item {MISSING_ID} is not found'}
+    # The coalesced call and the passed through one
+    assert len(servicer.called('GetCoalescedItem')) == 2
+    assert (cached.status_code, protobuf.status_code, batched.status_code) == (404, 404, 404)
+
+
+async def test_failed_calls_are_not_cached(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    servicer.error = StatusCode.UNAVAILABLE
+    failed = await client.get('/api/v1/fake/cached/10/')
+    servicer.error = None
+    response = await client.get('/api/v1/fake/cached/10/')
+
+    assert (failed.status_code, response.status_code) == (503, 200)
+    assert fake_pb2.Item(**response.json()) == fake_pb2.Item(id=10, name='Item 10')
@@ -0,0 +1,70 @@
+import httpx
+import msgpack
+
+from conftest import FakeServicer, fake_pb2
+from src.builder.negotiation import MSGPACK_MEDIA_TYPE, PROTOBUF_MEDIA_TYPE
+
+
+ITEM = {'id': 1, 'name': 'Item 1', 'tags': ['road', 'carbon']}
+
+
+async def test_json_is_default(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    response = await client.post('/api/v1/fake/items/', json=ITEM)
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/json'
+    assert response.json() == ITEM
+
+
+async def test_accept_picks_response_type(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    protobuf = await client.post('/api/v1/fake/items/', json=ITEM, headers={'Accept': PROTOBUF_MEDIA_TYPE})
+    packed = await client.post('/api/v1/fake/items/', json=ITEM, headers={'Accept': MSGPACK_MEDIA_TYPE})
+
+    assert protobuf.headers['content-type'] == PROTOBUF_MEDIA_TYPE
+    assert fake_pb2.Item.FromString(protobuf.content) == fake_pb2.Item(**ITEM)
+    assert packed.headers['content-type'] == MSGPACK_MEDIA_TYPE
+    assert msgpack.unpackb(packed.content) == ITEM
+
+
+async def test_protobuf_request_is_passed_through(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    body = fake_pb2.Item(**ITEM).SerializeToString()
+
+    response = await client.post('/api/v1/fake/items/', content=body, headers={'Content-Type': PROTOBUF_MEDIA_TYPE})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == PROTOBUF_MEDIA_TYPE
+    assert response.content == body
+    assert servicer.called('EchoItem') == [fake_pb2.Item(**ITEM)]
+
+
+async def test_protobuf_request_params_override_body(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    body = fake_pb2.ItemRequest(id=2).SerializeToString()
+
+    response = await client.request(
+        'GET', '/api/v1/fake/items/1/', content=body, headers={'Content-Type': PROTOBUF_MEDIA_TYPE},
+    )
+
+    assert fake_pb2.Item.FromString(response.content).id == 1
+    # Past the batching
+    assert servicer.called('GetItem') == [fake_pb2.ItemRequest(id=1)]
+
+
+async def test_malformed_protobuf_request_is_rejected(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    headers = {'Content-Type': PROTOBUF_MEDIA_TYPE}
+
+    response = await client.post('/api/v1/fake/items/', content=b'\xff\xff', headers=headers)
+
+    assert response.status_code == 400
+    assert servicer.calls == []
+
+
+async def test_protobuf_request_is_answered_in_kind(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    body = fake_pb2.Item(**ITEM).SerializeToString()
+    headers = {'Content-Type': PROTOBUF_MEDIA_TYPE}
+
+    rejected = await client.post('/api/v1/fake/items/', content=body, headers=headers | {'Accept': 'application/json'})
+    wildcard = await client.post('/api/v1/fake/items/', content=body, headers=headers | {'Accept': '*/*'})
+
+    assert rejected.status_code == 406
+    assert wildcard.status_code == 200
+    assert wildcard.headers['content-type'] == PROTOBUF_MEDIA_TYPE
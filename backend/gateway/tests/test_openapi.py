@@ -0,0 +1,12 @@
+from src.main import app
+
+
+def test_schema_of_shared_messages() -> None:
+    schema = app.openapi()
+
+    # `ProductItem` is nested in `Product` and in `ProductItemsPage`, and
+    #   `Product` in the replies of the lists
+    assert {'Product', 'ProductItem', 'ProductsPage', 'ProductItemsPage'} <= schema['components']['schemas'].keys()
+    assert schema['paths']['/api/v1/catalog/products/{id}/']['get']['responses']['200']['content'] == {
+        'application/json': {'schema': {'$ref': '#/components/schemas/Product'}},
+    }
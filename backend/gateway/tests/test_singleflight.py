@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import FakeServicer
+from src.builder.singleflight import SingleFlight
+
+
+async def test_concurrent_calls_share_error() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def fail() -> None:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError('failed')
+
+    results = await asyncio.gather(*(flight.run('key', fail) for _ in range(3)), return_exceptions=True)
+
+    assert calls == 1
+    assert (flight.started, flight.shared) == (1, 2)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert results[0] is results[1] is results[2]
+
+    # The failed call isn't remembered
+    with pytest.raises(ValueError):
+        await flight.run('key', fail)
+    assert calls == 2
+
+
+async def test_cancelled_caller_does_not_cancel_call() -> None:
+    flight = SingleFlight()
+
+    async def load() -> str:
+        await asyncio.sleep(0.01)
+        return 'value'
+
+    first = asyncio.ensure_future(flight.run('key', load))
+    second = asyncio.ensure_future(flight.run('key', load))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == 'value'
+
+
+async def test_coalesced_route_shares_call(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    servicer.delay = 0.05
+
+    responses = await asyncio.gather(
+        *(client.get('/api/v1/fake/coalesced/1/') for _ in range(4)),
+        client.get('/api/v1/fake/coalesced/2/'),
+    )
+
+    assert [r.json()['id'] for r in responses] == [1, 1, 1, 1, 2]
+    assert sorted(r.id for r in servicer.called('GetCoalescedItem')) == [1, 2]
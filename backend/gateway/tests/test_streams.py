@@ -0,0 +1,56 @@
+import json
+
+import httpx
+from grpc import StatusCode
+
+from conftest import FakeServicer
+
+
+def item(id: int) -> dict[str, object]:
+    return {'id': id, 'name': f'Item {id}', 'tags': []}
+
+
+async def test_stream_is_written_by_records(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    ndjson = await client.get('/api/v1/fake/streams/2/')
+    array = await client.get('/api/v1/fake/streams/2/array/')
+
+    assert ndjson.headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in ndjson.text.splitlines()] == [item(1), item(2)]
+    assert ndjson.text.endswith('\n')
+    assert array.json() == [item(1), item(2)]
+
+
+async def test_empty_stream(client: httpx.AsyncClient, servicer: FakeServicer) -> None:
+    ndjson = await client.get('/api/v1/fake/streams/0/')
+    array = await client.get('/api/v1/fake/streams/0/array/')
+
+    assert (ndjson.status_code, ndjson.content) == (200, b'')
+    assert (array.status_code, array.json()) == (200, [])
+
+
+async def test_stream_failed_to_start_is_answered_with_status(
+    client: httpx.AsyncClient,
+    servicer: FakeServicer,
+) -> None:
+    servicer.error = StatusCode.NOT_FOUND
+
+    ndjson = await client.get('/api/v1/fake/streams/2/')
+    array = await client.get('/api/v1/fake/streams/2/array/')
+
+    assert (ndjson.status_code, array.status_code) == (404, 404)
+    assert ndjson.json() == {'detail': 'ListItems has failed'}
+
+
+async def test_stream_failed_midway_ends_with_error_record(
+    client: httpx.AsyncClient,
+    servicer: FakeServicer,
+) -> None:
+    servicer.fail_after = 1
+    error = {'error': {'code': 'UNAVAILABLE', 'status': 503, 'detail': 'ListItems has failed'}}
+
+    ndjson = await client.get('/api/v1/fake/streams/2/')
+    array = await client.get('/api/v1/fake/streams/2/array/')
+
+    assert ndjson.status_code == 200
+    assert [json.loads(line) for line in ndjson.text.splitlines()] == [item(1), error]
+    assert array.json() == [item(1), {'error': error['error'] | {'detail': 'ListItemsArray has failed'}}]
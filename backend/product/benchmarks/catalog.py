@@ -0,0 +1,290 @@
+"""
+Latency and throughput of the main RPC shapes over a seeded catalog, see
+`src.commands.seed_catalog`. The service runs in-process with its metrics
+interceptor, so every shape is reported with the SQL statements per RPC,
+the waits for the pool and the concurrency slots, and the saturation of
+the pool of the primary sampled during the run. The clients share the loop
+with the service, which is what the numbers include.
+
+The results are saved as JSON, by default under `benchmarks/results/`
+named by the commit, to compare them across commits.
+
+Usage: python -m benchmarks.catalog [concurrency] [seconds] [output]
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+# Query counts and pool waits are taken from the interceptors
+os.environ.setdefault('METRICS_ENABLED', '1')
+
+import grpc  # noqa: E402
+from grpc import aio  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from src.config import settings  # noqa: E402
+from src.db.session import engine, get_session  # noqa: E402
+from src.facets import facet_cache  # noqa: E402
+from src.interceptors import MetricsInterceptor, service_metrics  # noqa: E402
+from src.models import Category, Product, ProductItem, ProductOption, ProductOptionValue  # noqa: E402
+from src.proto import pb2, pb2_grpc  # noqa: E402
+from src.reference import reference_cache  # noqa: E402
+from src.services import CatalogService  # noqa: E402
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+SAMPLE_SIZE = 1000
+WARMUP_SECONDS = 1.0
+POOL_SAMPLE_INTERVAL = 0.01
+
+
+class Samples:
+    """
+    Random ids of the seeded catalog the requests are made of
+    """
+    __slots__ = ['product_ids', 'parent_ids', 'value_ids', 'skus']
+
+    def __init__(self) -> None:
+        self.product_ids: list[int] = []
+        # Categories having children
+        self.parent_ids: list[int] = []
+        # Value ids of every option by the category of the option
+        self.value_ids: dict[int, list[list[int]]] = {}
+        self.skus: list[str] = []
+
+    async def load(self) -> None:
+        async with get_session(readonly=True) as session:
+            self.product_ids = list((await session.scalars(
+                select(Product.id).order_by(func.random()).limit(SAMPLE_SIZE)
+            )).all())
+            self.parent_ids = list((await session.scalars(
+                select(Category.id).where(Category.right - Category.left > 1)
+            )).all())
+            self.skus = list((await session.scalars(
+                select(ProductItem.sku).where(ProductItem.quantity > 0).order_by(func.random()).limit(SAMPLE_SIZE)
+            )).all())
+
+            values: dict[int, dict[int, list[int]]] = {}
+            rows = await session.execute(
+                select(ProductOption.category_id, ProductOption.id, ProductOptionValue.id)
+                .join(ProductOptionValue, ProductOptionValue.option_id == ProductOption.id)
+            )
+            for category_id, option_id, value_id in rows:
+                values.setdefault(category_id, {}).setdefault(option_id, []).append(value_id)
+
+        self.value_ids = {category_id: list(options.values()) for category_id, options in values.items()}
+
+        if not (self.product_ids and self.parent_ids and self.value_ids and self.skus):
+            sys.exit('The catalog is empty, seed it with `python -m src.commands.seed_catalog`')
+
+
+def create_shapes(stub: Any, samples: Samples) -> dict[str, tuple[tuple[str, ...], Callable[[], Awaitable[Any]]]]:
+    """
+    The request of every shape and the RPC methods it calls
+    """
+    async def listing() -> None:
+        await stub.ListProducts(pb2.ListProductsRequest(limit=20))
+
+    async def detail() -> None:
+        await stub.GetProduct(pb2.ProductRequest(id=random.choice(samples.product_ids)))
+
+    async def category_subtree() -> None:
+        await stub.ListCategoryProducts(
+            pb2.CategoryProductsRequest(category_id=random.choice(samples.parent_ids), limit=20)
+        )
+
+    async def facet_filter() -> None:
+        category_id = random.choice(list(samples.value_ids))
+        options = samples.value_ids[category_id]
+        value_ids = [random.choice(values) for values in random.sample(options, min(2, len(options)))]
+        await stub.FilterProducts(pb2.FilterProductsRequest(category_id=category_id, value_ids=value_ids, limit=20))
+
+    async def reservation() -> None:
+        line = pb2.StockLine(sku=random.choice(samples.skus), quantity=1)
+        reserved = await stub.ReserveStock(pb2.ReserveStockRequest(lines=[line]))
+        await stub.ReleaseReservation(pb2.ReservationRequest(id=reserved.id))
+
+    method = '/product.Catalog/{}'.format
+
+    return {
+        'listing': ((method('ListProducts'),), listing),
+        'detail': ((method('GetProduct'),), detail),
+        'category subtree': ((method('ListCategoryProducts'),), category_subtree),
+        'facet filter': ((method('FilterProducts'),), facet_filter),
+        'reservation': ((method('ReserveStock'), method('ReleaseReservation')), reservation),
+    }
+
+
+def snapshot(methods: tuple[str, ...]) -> dict[str, float]:
+    """
+    Totals of the interceptor metrics of the methods
+    """
+    totals = {'rpcs': 0.0, 'queries': 0.0, 'pool_wait': 0.0, 'queue': 0.0}
+
+    for name in methods:
+        metrics = service_metrics.method(name)
+        totals['rpcs'] += metrics.queries.count
+        totals['queries'] += metrics.queries.sum
+        totals['pool_wait'] += metrics.stages['pool_wait'].sum
+        totals['queue'] += metrics.stages['queue'].sum
+
+    return totals
+
+
+async def run_clients(request: Callable[[], Awaitable[Any]], concurrency: int, seconds: float) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client() -> None:
+        nonlocal errors
+
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                await request()
+            except grpc.RpcError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def sample_pool(samples: list[int], stopped: asyncio.Event) -> None:
+    while not stopped.is_set():
+        samples.append(engine.pool.checkedout())
+        await asyncio.sleep(POOL_SAMPLE_INTERVAL)
+
+
+async def run_shape(
+    methods: tuple[str, ...],
+    request: Callable[[], Awaitable[Any]],
+    concurrency: int,
+    seconds: float,
+) -> dict[str, Any]:
+    await run_clients(request, concurrency, WARMUP_SECONDS)
+
+    before = snapshot(methods)
+    pool_samples: list[int] = []
+    stopped = asyncio.Event()
+    sampler = asyncio.create_task(sample_pool(pool_samples, stopped))
+
+    try:
+        latencies, errors = await run_clients(request, concurrency, seconds)
+    finally:
+        stopped.set()
+        await sampler
+
+    after = snapshot(methods)
+    rpcs = max(after['rpcs'] - before['rpcs'], 1)
+    capacity = settings.DATABASE_POOL_SIZE + settings.DATABASE_MAX_OVERFLOW
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / seconds,
+        'p50_ms': quantiles[49] * 1000,
+        'p99_ms': quantiles[98] * 1000,
+        'queries_per_rpc': (after['queries'] - before['queries']) / rpcs,
+        'pool_wait_ms': (after['pool_wait'] - before['pool_wait']) / rpcs * 1000,
+        'queue_ms': (after['queue'] - before['queue']) / rpcs * 1000,
+        'pool_max_checked_out': max(pool_samples, default=0),
+        'pool_saturated_share': sum(n >= capacity for n in pool_samples) / max(len(pool_samples), 1),
+    }
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(concurrency: int, seconds: float) -> dict[str, Any]:
+    samples = Samples()
+    await samples.load()
+    await reference_cache.refresh()
+    await facet_cache.rebuild()
+
+    server = aio.server(interceptors=[MetricsInterceptor()])
+    pb2_grpc.add_CatalogServicer_to_server(CatalogService(), server)
+    port = server.add_insecure_port('127.0.0.1:0')
+    await server.start()
+
+    results = {}
+
+    try:
+        async with aio.insecure_channel(f'127.0.0.1:{port}') as channel:
+            shapes = create_shapes(pb2_grpc.CatalogStub(channel), samples)
+
+            for name, (methods, request) in shapes.items():
+                results[name] = await run_shape(methods, request, concurrency, seconds)
+    finally:
+        await server.stop(None)
+        await engine.dispose()
+
+    return results
+
+
+def main(concurrency: int = 20, seconds: float = 10.0, output: Optional[str] = None) -> None:
+    concurrency, seconds = int(concurrency), float(seconds)
+    commit = get_commit()
+    shapes = asyncio.run(run(concurrency, seconds))
+
+    print(
+        f"{'shape':<18} {'rps':>7} {'p50, ms':>8} {'p99, ms':>8} {'queries':>8} "
+        f"{'pool wait, ms':>14} {'pool max':>9} {'saturated':>10} {'errors':>7}"
+    )
+    for name, result in shapes.items():
+        print(
+            f"{name:<18} {result['rps']:>7.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+            f"{result['queries_per_rpc']:>8.1f} {result['pool_wait_ms']:>14.2f} "
+            f"{result['pool_max_checked_out']:>9} {result['pool_saturated_share']:>10.0%} {result['errors']:>7}"
+        )
+
+    report = {
+        'commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'concurrency': concurrency,
+        'seconds': seconds,
+        'settings': {
+            name: getattr(settings, name)
+            for name in (
+                'DATABASE_POOL_SIZE',
+                'DATABASE_MAX_OVERFLOW',
+                'DATABASE_COMPILED_CACHE_SIZE',
+                'DATABASE_PREPARED_STATEMENT_CACHE_SIZE',
+                'GRPC_RPC_CONCURRENCY',
+            )
+        },
+        'shapes': shapes,
+    }
+
+    path = Path(output) if output else RESULTS_DIR / f"catalog-{commit or 'unknown'}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    print(f'saved to {path}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
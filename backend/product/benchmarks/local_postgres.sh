@@ -0,0 +1,42 @@
+#!/bin/sh
+# Runs the catalog benchmark against a throwaway Postgres cluster created
+#   in a temporary directory and removed on exit. Needs the Postgres server
+#   binaries (`initdb`, `pg_ctl`) only, no Docker. Run from the service root:
+#
+#   sh benchmarks/local_postgres.sh [seed_catalog sizes...]
+#
+# PGBIN is the directory of the binaries, PGPORT the port of the cluster,
+#   BENCH_ARGS the arguments of `benchmarks.catalog`
+
+set -e
+
+PGBIN="${PGBIN:-$(pg_config --bindir 2>/dev/null || dirname "$(command -v initdb)")}"
+PGPORT="${PGPORT:-55432}"
+DATA_DIR="$(mktemp -d -t product-bench-XXXXXX)"
+
+cleanup() {
+    "$PGBIN/pg_ctl" -D "$DATA_DIR/data" -m fast stop >/dev/null 2>&1 || true
+    rm -rf "$DATA_DIR"
+}
+trap cleanup EXIT INT TERM
+
+"$PGBIN/initdb" -D "$DATA_DIR/data" -U bench -A trust >/dev/null
+"$PGBIN/pg_ctl" -D "$DATA_DIR/data" -l "$DATA_DIR/postgres.log" -w \
+    -o "-p $PGPORT -k $DATA_DIR -c listen_addresses=127.0.0.1" start >/dev/null
+"$PGBIN/createdb" -h 127.0.0.1 -p "$PGPORT" -U bench bench
+
+export DATABASE_URL="postgresql+asyncpg://bench@127.0.0.1:$PGPORT/bench"
+
+# The same as `entrypoint.sh` does in the container
+export GRPC_TOOLS_DIR="$DATA_DIR/grpc_tools"
+mkdir -p "$GRPC_TOOLS_DIR"
+python -m grpc_tools.protoc \
+    -I../proto/product \
+    --python_out="$GRPC_TOOLS_DIR" \
+    --pyi_out="$GRPC_TOOLS_DIR" \
+    --grpc_python_out="$GRPC_TOOLS_DIR" \
+    ../proto/product/product.proto
+
+python -m benchmarks.schema
+python -m src.commands.seed_catalog "$@"
+python -m benchmarks.catalog $BENCH_ARGS
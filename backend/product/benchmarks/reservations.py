@@ -0,0 +1,90 @@
+"""
+Throughput of the stock reservations contending for a few hot items.
+Every worker reserves a random line of the hot SKUs and releases it at once,
+so the stock never runs out and each reservation locks the hot rows.
+Runs against `DATABASE_URL` on the fixture rows it creates and deletes.
+
+Usage: python -m benchmarks.reservations [workers] [seconds] [hot SKUs]
+"""
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import delete
+from sqlalchemy.exc import DBAPIError
+
+from src import reservations, tree
+from src.db.session import engine, get_session
+from src.models import Category, Manufacturer, Product, ProductItem, StockReservationItem
+
+
+SKU_PREFIX = 'BENCH'
+
+
+async def create_fixture(hot: int) -> tuple[int, list[str]]:
+    skus = [f'{SKU_PREFIX}{i:04}' for i in range(hot)]
+
+    async with get_session() as session:
+        category = await tree.insert_category(session, 'Reservation benchmark')
+        manufacturer = Manufacturer(name='Reservation benchmark')
+        product = Product(name='Reservation benchmark', category_id=category.id, manufacturer=manufacturer)
+        session.add(product)
+        session.add_all(ProductItem(sku=sku, product=product, price=1, quantity=10 ** 9) for sku in skus)
+
+    return category.id, skus
+
+
+async def delete_fixture(category_id: int, skus: list[str]) -> None:
+    async with get_session() as session:
+        # Left by the failed releases, the reservations themselves expire
+        await session.execute(delete(StockReservationItem).where(StockReservationItem.sku.in_(skus)))
+        product_ids = (await session.scalars(
+            delete(ProductItem).where(ProductItem.sku.in_(skus)).returning(ProductItem.product_id)
+        )).all()
+        manufacturer_ids = (await session.scalars(
+            delete(Product).where(Product.id.in_(set(product_ids))).returning(Product.manufacturer_id)
+        )).all()
+        await session.execute(delete(Manufacturer).where(Manufacturer.id.in_(set(manufacturer_ids))))
+        await session.execute(delete(Category).where(Category.id == category_id))
+
+
+async def worker(skus: list[str], deadline: float, latencies: list[float], failures: list[int]) -> None:
+    while time.perf_counter() < deadline:
+        lines = [(sku, random.randint(1, 3)) for sku in random.sample(skus, random.randint(1, len(skus)))]
+        started = time.perf_counter()
+
+        try:
+            reservation = await reservations.reserve(lines)
+            await reservations.release(reservation.id)
+        except DBAPIError:
+            # The retries are exhausted
+            failures.append(1)
+            continue
+
+        latencies.append(time.perf_counter() - started)
+
+
+async def main(workers: int = 50, seconds: float = 10.0, hot: int = 3) -> None:
+    category_id, skus = await create_fixture(hot)
+    latencies: list[float] = []
+    failures: list[int] = []
+
+    try:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(worker(skus, deadline, latencies, failures) for _ in range(workers)))
+    finally:
+        await delete_fixture(category_id, skus)
+        await engine.dispose()
+
+    print(f'{workers} workers, {hot} hot SKUs, {seconds:.0f} s')
+    print(f'throughput: {len(latencies) / seconds:.0f} reserve + release/s')
+    if latencies:
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f'latency: p50 {quantiles[49] * 1000:.1f} ms, p99 {quantiles[98] * 1000:.1f} ms')
+    print(f'failed after retries: {len(failures)}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(*(cast(arg) for cast, arg in zip((int, float, int), sys.argv[1:]))))
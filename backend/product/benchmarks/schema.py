@@ -0,0 +1,26 @@
+"""
+Creates the tables of the models in an empty database, for the throwaway
+databases of the benchmarks, see `local_postgres.sh`. The real ones are
+migrated.
+
+Usage: python -m benchmarks.schema
+"""
+import asyncio
+
+from sqlalchemy import text
+
+from src.db import Base
+from src.db.session import engine
+
+
+async def main() -> None:
+    async with engine.begin() as connection:
+        # The trigram operator class of the product search index
+        await connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        await connection.run_sync(Base.metadata.create_all)
+
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
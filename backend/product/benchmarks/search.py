@@ -0,0 +1,127 @@
+"""
+Latency of the product search over a synthetic catalog. The catalog is
+imported once by `imports` under the ids from `ID_BASE` and is kept for
+the next runs, so run it against a disposable database.
+
+Usage: python -m benchmarks.search [products] [queries]
+"""
+import asyncio
+import random
+import statistics
+import sys
+import time
+from typing import Any, Iterator
+
+from sqlalchemy import func, select, text
+
+from src import imports, tree
+from src.db.session import engine, get_session
+from src.models import Category, Product
+from src.search import search_products
+
+
+ID_BASE = 100_000_000
+CATEGORY_NAME = 'Search benchmark'
+
+ADJECTIVES = ['carbon', 'alloy', 'steel', 'light', 'aero', 'gravel', 'trail', 'urban', 'electric', 'classic']
+NOUNS = ['bike', 'frame', 'wheel', 'saddle', 'helmet', 'pedal', 'chain', 'fork', 'brake', 'tire']
+
+
+def _words(rng: random.Random, size: int) -> list[str]:
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def _misspell(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def generate(count: int, category_id: int, rng: random.Random) -> dict[str, Iterator[dict[str, Any]]]:
+    brands = _words(rng, 50)
+    vocabulary = _words(rng, 5000)
+
+    def products() -> Iterator[dict[str, Any]]:
+        for i in range(count):
+            yield {
+                'id': ID_BASE + i,
+                'name': f'{rng.choice(brands)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(vocabulary)}',
+                'description': ' '.join(rng.choices(vocabulary, k=30)),
+                'manufacturer_id': ID_BASE + i % len(brands),
+                'category_id': category_id,
+            }
+
+    def items() -> Iterator[dict[str, Any]]:
+        for i in range(count):
+            yield {'sku': f'S{i:09}', 'product_id': ID_BASE + i, 'price': rng.randint(1, 10000), 'quantity': 1}
+
+    return {
+        'manufacturers': iter({'id': ID_BASE + i, 'name': brand[:30]} for i, brand in enumerate(brands)),
+        'products': products(),
+        'items': items(),
+    }
+
+
+async def seed(count: int) -> int:
+    async with get_session() as session:
+        category_id = await session.scalar(select(Category.id).where(Category.name == CATEGORY_NAME))
+
+        if category_id is not None:
+            return category_id
+
+        category_id = (await tree.insert_category(session, CATEGORY_NAME)).id
+
+    for kind, records in generate(count, category_id, random.Random(0)).items():
+        started = time.perf_counter()
+        async with get_session() as session:
+            total = await imports.import_records(session, kind, records)
+        print(f'{kind}: {total} rows in {time.perf_counter() - started:.1f} s')
+
+    # The planner statistics of the new rows
+    async with get_session() as session:
+        await session.execute(text('ANALYZE products'))
+        await session.execute(text('ANALYZE product_items'))
+
+    return category_id
+
+
+async def measure(queries: list[tuple[str, dict[str, Any]]]) -> list[float]:
+    latencies = []
+
+    for query, filters in queries:
+        started = time.perf_counter()
+        async with get_session() as session:
+            await search_products(session, query, 20, **filters)
+        latencies.append(time.perf_counter() - started)
+
+    return latencies
+
+
+async def main(count: int = 1_000_000, runs: int = 200) -> None:
+    category_id = await seed(count)
+    rng = random.Random(1)
+
+    async with get_session() as session:
+        names = (await session.scalars(
+            select(Product.name).where(Product.category_id == category_id).order_by(func.random()).limit(runs)
+        )).all()
+
+    words = [name.split()[-1] for name in names]
+    cases = {
+        'word': [(word, {}) for word in words],
+        'misspelled': [(_misspell(word, rng), {}) for word in words],
+        'two words': [(' '.join(name.split()[1:3]), {}) for name in names],
+        'price range': [(word, {'min_price': 1000, 'max_price': 3000}) for word in words],
+    }
+
+    try:
+        for case, queries in cases.items():
+            latencies = await measure(queries)
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(f'{case}: p50 {quantiles[49] * 1000:.1f} ms, p99 {quantiles[98] * 1000:.1f} ms')
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(*map(int, sys.argv[1:])))
@@ -0,0 +1,47 @@
+"""
+Imports the catalog tables from CSV (with the header) or NDJSON files,
+see `imports`:
+
+    python -m src.commands.import_catalog products products.csv items items.ndjson
+
+The files are imported in the order of the foreign keys regardless of
+the order of the arguments, each one in its own transaction. Kinds:
+manufacturers, categories, options, option_values, products, images,
+items, item_options
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from .. import imports
+from ..db.session import engine, get_session
+
+
+async def main(args: list[str]) -> None:
+    if not args or len(args) % 2 or any(kind not in imports.import_specs for kind in args[::2]):
+        sys.exit(__doc__)
+
+    files = dict(zip(args[::2], map(Path, args[1::2])))
+    kinds = [kind for kind in imports.import_specs if kind in files]
+
+    for kind in kinds:
+        started = time.perf_counter()
+        imported = 0
+
+        def on_chunk(size: int) -> None:
+            nonlocal imported
+            imported += size
+            print(f'{kind}: {imported} rows', end='\r', flush=True)
+
+        async with get_session() as session:
+            total = await imports.import_file(session, kind, files[kind], on_chunk)
+
+        elapsed = time.perf_counter() - started
+        print(f'{kind}: {total} rows in {elapsed:.1f} s ({total / max(elapsed, 1e-9):.0f} rows/s)')
+
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,40 @@
+"""
+Recomputes the search documents of all the products, in batches by id,
+each one in its own transaction:
+
+    python -m src.commands.rebuild_search [batch size]
+"""
+import asyncio
+import sys
+
+from sqlalchemy import func, select, update
+
+from ..db.session import engine, get_session
+from ..models import Product, product_document
+
+
+async def main(batch: int = 10000) -> None:
+    products = Product.__table__
+
+    async with get_session() as session:
+        last_id = await session.scalar(select(func.max(products.c.id))) or 0
+
+    for start in range(0, last_id, batch):
+        async with get_session() as session:
+            await session.execute(
+                update(products)
+                .where(products.c.id > start, products.c.id <= start + batch)
+                .values(search_vector=product_document(
+                    products.c.name, products.c.description, products.c.manufacturer_id,
+                ))
+            )
+
+        print(f'{min(start + batch, last_id)} / {last_id}', end='\r', flush=True)
+
+    await engine.dispose()
+
+    print(f'Search documents of the products up to {last_id} are rebuilt')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(*map(int, sys.argv[1:])))
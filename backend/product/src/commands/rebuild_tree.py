@@ -0,0 +1,25 @@
+"""
+Regenerates the nested set intervals of the categories from `parent_id`:
+
+    python -m src.commands.rebuild_tree
+"""
+import asyncio
+
+from .. import tree
+from ..db.session import engine, get_session
+
+
+async def main() -> None:
+    async with get_session() as session:
+        renumbered, total = await tree.rebuild_tree(session)
+
+    await engine.dispose()
+
+    print(f'{renumbered} categories are renumbered')
+
+    if renumbered != total:
+        print(f'{total - renumbered} categories are unreachable from the roots, check `parent_id` for cycles')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
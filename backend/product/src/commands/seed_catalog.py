@@ -0,0 +1,185 @@
+"""
+Seeds a synthetic catalog through the bulk import, see `imports`:
+
+    python -m src.commands.seed_catalog [products] [depth] [fanout] [items per product]
+        [options per root] [values per option]
+
+The category tree has `fanout` roots and `fanout` children of every category
+down to `depth` levels, the products are spread over its leaves. Every root
+has its own options, and every item has a value of each option of its root.
+The ids start from 1 and the rows of the same ids are overwritten, so it's
+meant for a throwaway database. The catalog is the same for the same sizes
+"""
+import asyncio
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from .. import imports
+from ..db.session import engine, get_session
+
+
+WORDS = [
+    'carbon', 'alloy', 'steel', 'light', 'aero', 'gravel', 'trail', 'urban', 'electric', 'classic',
+    'bike', 'frame', 'wheel', 'saddle', 'helmet', 'pedal', 'chain', 'fork', 'brake', 'tire',
+]
+
+
+@dataclass(frozen=True)
+class CatalogSize:
+    products: int = 100_000
+    depth: int = 3
+    fanout: int = 5
+    items_per_product: int = 3
+    options_per_root: int = 4
+    values_per_option: int = 6
+
+    @property
+    def manufacturers(self) -> int:
+        return max(self.products // 1000, 10)
+
+
+class CatalogGenerator:
+    """
+    Records of the import kinds, in the order of the foreign keys
+    """
+    __slots__ = ['size', 'rng', 'roots', 'leaves', 'option_ids', 'value_ids']
+
+    def __init__(self, size: CatalogSize, seed: int = 0) -> None:
+        self.size = size
+        self.rng = random.Random(seed)
+        # The root of every category and the leaves, filled by `categories`
+        self.roots: dict[int, int] = {}
+        self.leaves: list[int] = []
+        # Filled by `options` and `option_values`
+        self.option_ids: dict[int, list[int]] = {}
+        self.value_ids: dict[int, list[int]] = {}
+
+    def _category_id(self, product_id: int) -> int:
+        return self.leaves[product_id % len(self.leaves)]
+
+    def manufacturers(self) -> Iterator[dict[str, Any]]:
+        for i in range(1, self.size.manufacturers + 1):
+            yield {'id': i, 'name': f'Manufacturer {i}', 'description': f'Synthetic manufacturer {i}'}
+
+    def categories(self) -> Iterator[dict[str, Any]]:
+        """
+        Breadth first, so the parents come before their children
+        """
+        level: list[Optional[int]] = [None]
+        next_id = 1
+
+        for _ in range(self.size.depth):
+            children: list[Optional[int]] = []
+
+            for parent_id in level:
+                for _ in range(self.size.fanout):
+                    self.roots[next_id] = self.roots[parent_id] if parent_id is not None else next_id
+                    yield {'id': next_id, 'name': f'Category {next_id}', 'parent_id': parent_id}
+                    children.append(next_id)
+                    next_id += 1
+
+            level = children
+
+        self.leaves = level
+
+    def options(self) -> Iterator[dict[str, Any]]:
+        option_id = 1
+
+        for root_id in sorted(set(self.roots.values())):
+            self.option_ids[root_id] = []
+
+            for i in range(self.size.options_per_root):
+                yield {'id': option_id, 'name': f'Option {i + 1}', 'category_id': root_id}
+                self.option_ids[root_id].append(option_id)
+                option_id += 1
+
+    def option_values(self) -> Iterator[dict[str, Any]]:
+        value_id = 1
+
+        for option_ids in self.option_ids.values():
+            for option_id in option_ids:
+                self.value_ids[option_id] = []
+
+                for i in range(self.size.values_per_option):
+                    yield {'id': value_id, 'option_id': option_id, 'value': f'Value {i + 1}'}
+                    self.value_ids[option_id].append(value_id)
+                    value_id += 1
+
+    def products(self) -> Iterator[dict[str, Any]]:
+        rng = self.rng
+
+        for i in range(1, self.size.products + 1):
+            yield {
+                'id': i,
+                'name': ' '.join(rng.choices(WORDS, k=3)) + f' {i}',
+                'description': ' '.join(rng.choices(WORDS, k=20)),
+                'manufacturer_id': rng.randint(1, self.size.manufacturers),
+                'category_id': self._category_id(i),
+            }
+
+    def images(self) -> Iterator[dict[str, Any]]:
+        for i in range(1, self.size.products + 1):
+            yield {'id': i, 'product_id': i, 'image': f'products/{i}.png'}
+
+    def _skus(self) -> Iterator[tuple[str, int]]:
+        for i in range(1, self.size.products + 1):
+            for j in range(self.size.items_per_product):
+                yield f'S{(i - 1) * self.size.items_per_product + j:011}', i
+
+    def items(self) -> Iterator[dict[str, Any]]:
+        rng = self.rng
+
+        for sku, product_id in self._skus():
+            yield {
+                'sku': sku,
+                'product_id': product_id,
+                'price': rng.randint(100, 500_000),
+                'quantity': rng.randint(0, 100),
+            }
+
+    def item_options(self) -> Iterator[dict[str, Any]]:
+        rng = self.rng
+
+        for sku, product_id in self._skus():
+            for option_id in self.option_ids[self.roots[self._category_id(product_id)]]:
+                yield {'sku': sku, 'option_id': option_id, 'value_id': rng.choice(self.value_ids[option_id])}
+
+    def records(self) -> Iterator[tuple[str, Iterator[dict[str, Any]]]]:
+        """
+        Lazily, the later kinds depend on the state left by the earlier ones
+        """
+        yield 'manufacturers', self.manufacturers()
+        yield 'categories', self.categories()
+        yield 'options', self.options()
+        yield 'option_values', self.option_values()
+        yield 'products', self.products()
+        yield 'images', self.images()
+        yield 'items', self.items()
+        yield 'item_options', self.item_options()
+
+
+async def seed(size: CatalogSize) -> None:
+    for kind, records in CatalogGenerator(size).records():
+        started = time.perf_counter()
+
+        async with get_session() as session:
+            total = await imports.import_records(session, kind, records)
+
+        print(f'{kind}: {total} rows in {time.perf_counter() - started:.1f} s')
+
+
+async def main(args: list[str]) -> None:
+    try:
+        size = CatalogSize(*map(int, args))
+    except (TypeError, ValueError):
+        sys.exit(__doc__)
+
+    await seed(size)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1:]))
@@ -1,9 +1,103 @@
-from pydantic import BaseSettings, PostgresDsn
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseSettings, PostgresDsn, validator
 
 
 class Settings(BaseSettings):
+    BASE_DIR: Path = Path(__file__).resolve().parent
+
     DATABASE_URL: PostgresDsn
 
+    # Connection pool of the engine, per process
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30.0
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+    # Milliseconds, 0 for no limit
+    DATABASE_STATEMENT_TIMEOUT: int = 0
+    # Compiled statements per engine and prepared statements per
+    #   connection, LRU. The hot queries are a few dozens, see `queries`
+    DATABASE_COMPILED_CACHE_SIZE: int = 500
+    DATABASE_PREPARED_STATEMENT_CACHE_SIZE: int = 200
+
+    # Read-only sessions are served by the replicas, see `db.routing`.
+    #   A JSON list in the environment
+    DATABASE_REPLICA_URLS: list[PostgresDsn] = []
+    # The pool of each replica engine
+    DATABASE_REPLICA_POOL_SIZE: int = 20
+    DATABASE_REPLICA_MAX_OVERFLOW: int = 10
+    DATABASE_REPLICA_STATEMENT_TIMEOUT: int = 5000
+    # Seconds, the replicas lagging more are skipped
+    DATABASE_REPLICA_MAX_LAG: float = 5.0
+    DATABASE_REPLICA_CHECK_INTERVAL: float = 1.0
+
+    # Seconds between the version checks of the reference tables,
+    #   see `reference`
+    REFERENCE_CACHE_REFRESH_INTERVAL: float = 5.0
+
+    # The facet index, see `facets`
+    FACET_INDEX_REFRESH_INTERVAL: float = 2.0
+    FACET_INDEX_REBUILD_INTERVAL: float = 3600.0
+    # Changes are re-read for this many seconds, so the ones of
+    #   the transactions committed late are not missed
+    FACET_CHANGES_OVERLAP: float = 10.0
+    FACET_CHANGES_RETENTION: float = 3600.0
+    # More changed items than this rebuild the index instead of patching it
+    FACET_PATCH_MAX_ITEMS: int = 10000
+
+    PRODUCTS_PAGE_SIZE: int = 20
+    PRODUCTS_MAX_PAGE_SIZE: int = 100
+
+    # Stock reservations, see `reservations`
+    RESERVATION_TTL: float = 900.0
+    # The longest one a client may ask for, the longer ones are cut to it
+    RESERVATION_MAX_TTL: float = 3600.0
+    RESERVATION_RELEASE_INTERVAL: float = 10.0
+    RESERVATION_RELEASE_BATCH: int = 500
+    # Attempts of a transaction failed by a serialization failure or
+    #   a deadlock, the delay doubles after each one
+    RESERVATION_ATTEMPTS: int = 5
+    RESERVATION_RETRY_DELAY: float = 0.01
+
+    # Text search configuration of the product documents, see `search`
+    SEARCH_TEXT_CONFIG: str = 'english'
+    SEARCH_PAGE_SIZE: int = 20
+    SEARCH_MAX_PAGE_SIZE: int = 100
+
+    # Rows per `COPY` of the bulk import, see `imports`
+    IMPORT_CHUNK_SIZE: int = 50000
+
+    # Per-method metrics of the RPCs served in the Prometheus text format
+    #   on `METRICS_PORT`, see `interceptors`
+    METRICS_ENABLED: bool = False
+    METRICS_HOST: str = '0.0.0.0'
+    METRICS_PORT: int = 9100
+    # Seconds, the RPCs and the statements slower than these are logged,
+    #   the share of them given by the rate
+    SLOW_RPC_THRESHOLD: float = 0.5
+    SLOW_QUERY_THRESHOLD: float = 0.1
+    SLOW_LOG_SAMPLE_RATE: float = 1.0
+
+    GRPC_HOST: str = '[::]'
+    GRPC_PORT: int = 8080
+    GRPC_TOOLS_DIR: Path = Path('grpc_tools')
+    # The limit of the whole server, RPCs above it are rejected
+    #   with RESOURCE_EXHAUSTED
+    GRPC_MAX_CONCURRENT_RPCS: int = 1000
+    # The limit of each RPC method, calls above it wait for a slot
+    GRPC_RPC_CONCURRENCY: int = 50
+    # Seconds the running RPCs are given to finish on shutdown
+    GRPC_SHUTDOWN_GRACE: float = 10.0
+
+    @validator('GRPC_TOOLS_DIR')
+    def post_process_grpc_tools_dir(cls, value: str, values: dict[str, Any]):
+        value = Path(value)
+        if not value.is_absolute():
+            return values['BASE_DIR'].parent / value
+        return value
+
 
 def get_settings() -> Settings:
     return Settings()
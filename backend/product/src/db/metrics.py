@@ -0,0 +1,54 @@
+"""
+Hit counters of the statement caches: the compiled SQL of the engines and
+the server-side prepared statements of the asyncpg connections
+"""
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, ExecutionContext
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class StatementCacheStats:
+    __slots__ = ['compiled_hits', 'compiled_misses', 'prepared_hits', 'prepared_misses']
+
+    def __init__(self) -> None:
+        self.compiled_hits = 0
+        self.compiled_misses = 0
+        self.prepared_hits = 0
+        self.prepared_misses = 0
+
+    def watch(self, engine: AsyncEngine) -> None:
+        event.listen(engine.sync_engine, 'before_cursor_execute', self._count)
+
+    def _count(
+        self,
+        connection: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Optional[ExecutionContext],
+        executemany: bool,
+    ) -> None:
+        if context is not None:
+            if context.cache_hit is CacheStats.CACHE_HIT:
+                self.compiled_hits += 1
+            elif context.cache_hit is CacheStats.CACHE_MISS:
+                self.compiled_misses += 1
+
+        # The cache of the SQLAlchemy adapter of the asyncpg connection,
+        #   keyed by the SQL, `None` if it's disabled
+        cache = getattr(getattr(cursor, '_adapt_connection', None), '_prepared_statement_cache', None)
+
+        if cache is not None:
+            if statement in cache:
+                self.prepared_hits += 1
+            else:
+                self.prepared_misses += 1
+
+    def as_dict(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+statement_cache_stats = StatementCacheStats()
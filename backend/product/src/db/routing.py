@@ -0,0 +1,136 @@
+"""
+Routing of the read-only sessions to the replicas. The replicas are polled
+in the background for the WAL position they have replayed and their lag.
+A read goes to a replica that
+
+    - answered the last poll,
+    - lags less than `DATABASE_REPLICA_MAX_LAG` seconds,
+    - has replayed the last write the client has seen,
+
+the replicas are taken in turns, and to the primary if none qualifies.
+The last condition gives the read-your-writes consistency to the client
+that writes: the RPCs writing return the position of their commit in
+`x-commit-lsn` trailing metadata, the client sends it back in the metadata
+of its reads, which fall back to the primary until a poll sees a replica
+caught up with it. The reads of the other clients are left on the replicas.
+The positions are kept by the RPC in `current_consistency`, see
+`ConsistencyInterceptor`.
+"""
+import asyncio
+import itertools
+import logging
+from contextvars import ContextVar
+from typing import Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_lsn(lsn: str) -> int:
+    """
+    `pg_lsn` as `16/B374D848` to a comparable number
+    """
+    high, low = lsn.split('/')
+    return int(high, 16) << 32 | int(low, 16)
+
+
+def format_lsn(lsn: int) -> str:
+    return f'{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}'
+
+
+class Consistency:
+    __slots__ = ['required', 'written']
+
+    def __init__(self, required: int = 0) -> None:
+        # The latest write the client has seen
+        self.required = required
+        # The latest write of the RPC
+        self.written = 0
+
+    def track_write(self, lsn: str) -> None:
+        self.written = max(self.written, parse_lsn(lsn))
+
+
+# Unset out of the RPCs, e.g. in the background tasks and the commands
+current_consistency: ContextVar[Optional[Consistency]] = ContextVar('current_consistency', default=None)
+
+
+# The lag is 0 when everything received is replayed, otherwise it's
+#   the age of the last replayed transaction
+_replica_state_query = text("""
+    SELECT
+        pg_last_wal_replay_lsn()::text,
+        CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+        END
+""")
+
+
+class ReplicaState:
+    __slots__ = ['engine', 'replayed_lsn', 'lag', 'available']
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+        self.replayed_lsn = 0
+        self.lag = 0.0
+        # Not used until the first successful poll
+        self.available = False
+
+
+class ReplicaRouter:
+    __slots__ = ['primary', 'replicas', 'interval', 'max_lag', '_turns']
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine],
+        interval: float = settings.DATABASE_REPLICA_CHECK_INTERVAL,
+        max_lag: float = settings.DATABASE_REPLICA_MAX_LAG,
+    ) -> None:
+        self.primary = primary
+        self.replicas = [ReplicaState(replica) for replica in replicas]
+        self.interval = interval
+        self.max_lag = max_lag
+        self._turns = itertools.cycle(self.replicas)
+
+    def get_reader(self, required_lsn: int = 0) -> AsyncEngine:
+        for _ in range(len(self.replicas)):
+            replica = next(self._turns)
+
+            if replica.available and replica.lag <= self.max_lag and replica.replayed_lsn >= required_lsn:
+                return replica.engine
+
+        return self.primary
+
+    async def _poll(self, replica: ReplicaState) -> None:
+        try:
+            async with replica.engine.connect() as connection:
+                lsn, lag = (await connection.execute(_replica_state_query)).one()
+        except Exception:
+            if replica.available:
+                logger.exception('Replica %s is unavailable', replica.engine.url.host)
+            replica.available = False
+            return
+
+        if lsn is None:
+            # Not in recovery, so it's not a replica of the primary
+            replica.available = False
+            return
+
+        replica.replayed_lsn = parse_lsn(lsn)
+        replica.lag = float(lag or 0)
+        replica.available = True
+
+    async def poll(self) -> None:
+        await asyncio.gather(*(self._poll(replica) for replica in self.replicas))
+
+    async def run(self) -> None:
+        while True:
+            await self.poll()
+            await asyncio.sleep(self.interval)
@@ -1,16 +1,62 @@
+import time
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event, text
+from sqlalchemy.orm import ORMExecuteState, Session, UOWTransaction, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 
+from .metrics import statement_cache_stats
+from .routing import ReplicaRouter, current_consistency
 from ..config import settings
+from ..interceptors import record_pool_wait, watch_queries
 
 
-engine = create_async_engine(
-    settings.DATABASE_URL
+def _create_engine(url: str, pool_size: int, max_overflow: int, statement_timeout: int) -> AsyncEngine:
+    server_settings = {}
+    if statement_timeout:
+        server_settings['statement_timeout'] = str(statement_timeout)
+
+    engine = create_async_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        query_cache_size=settings.DATABASE_COMPILED_CACHE_SIZE,
+        connect_args={
+            'server_settings': server_settings,
+            'prepared_statement_cache_size': settings.DATABASE_PREPARED_STATEMENT_CACHE_SIZE,
+        },
+    )
+    statement_cache_stats.watch(engine)
+    if settings.METRICS_ENABLED:
+        watch_queries(engine)
+
+    return engine
+
+
+# The primary, all the writes and the reads needing the latest state
+engine = _create_engine(
+    settings.DATABASE_URL,
+    settings.DATABASE_POOL_SIZE,
+    settings.DATABASE_MAX_OVERFLOW,
+    settings.DATABASE_STATEMENT_TIMEOUT,
 )
 
+replica_engines = [
+    _create_engine(
+        url,
+        settings.DATABASE_REPLICA_POOL_SIZE,
+        settings.DATABASE_REPLICA_MAX_OVERFLOW,
+        settings.DATABASE_REPLICA_STATEMENT_TIMEOUT,
+    )
+    for url in settings.DATABASE_REPLICA_URLS
+]
+
+router = ReplicaRouter(engine, replica_engines)
+
 async_session = sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -20,11 +66,53 @@ async_session = sessionmaker(
 )
 
 
+# Sessions remember whether they have written, so the position of
+#   the write is returned to the client for its replica reads, see `routing`
+
+@event.listens_for(Session, 'do_orm_execute')
+def mark_dml_write(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info['wrote'] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def mark_flush_write(session: Session, flush_context: UOWTransaction) -> None:
+    session.info['wrote'] = True
+
+
 @asynccontextmanager
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session() as session:
+async def get_session(readonly: bool = False, track: bool = True) -> AsyncGenerator[AsyncSession, None]:
+    """
+    `readonly` sessions are served by a replica if one is fresh enough for
+    the client, the others by the primary. Their writes are tracked for
+    the client of the RPC unless `track` is off, e.g. for the maintenance
+    ones no client is waiting for
+    """
+    consistency = current_consistency.get()
+
+    if readonly:
+        session = async_session(bind=router.get_reader(consistency.required if consistency else 0))
+    else:
+        session = async_session()
+
+    # The session is closed and the connection is returned to the pool
+    #   by the outer context manager
+    async with session:
         async with session.begin():
-            try:
-                yield session
-            finally:
-                await session.close()
+            if settings.METRICS_ENABLED:
+                # The connection is taken at once to tell the wait for
+                #   the pool from the time of the first query
+                started = time.perf_counter()
+                await session.connection()
+                record_pool_wait(time.perf_counter() - started)
+
+            yield session
+
+        if track and consistency is not None and session.info.get('wrote') and router.replicas:
+            consistency.track_write(await session.scalar(text('SELECT pg_current_wal_lsn()::text')))
+
+
+async def dispose_engines() -> None:
+    await engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
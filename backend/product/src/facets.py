@@ -0,0 +1,326 @@
+"""
+Faceted filtering of product items by option values.
+
+The index maps each item (SKU) to a bit position and keeps a bitmap
+(a Python `int`) of the items for every option value and every category,
+so a filter is a few big-integer `&`/`|` operations instead of a self-join
+per selected option:
+
+    result = facet_cache.index.search(reference_cache.snapshot, category_id, value_ids)
+
+The index is built once and then patched by the SKUs from the change log
+(`ProductItemChange`). It's immutable, a patch produces a new index.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db.session import get_session
+from .models import Product, ProductItem, ProductItemChange, ProductItemOptionValue
+from .reference import ReferenceSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    # Python < 3.10
+    def popcount(bitmap: int) -> int:
+        return bin(bitmap).count('1')
+
+
+def _positions(bitmap: int) -> Iterator[int]:
+    """
+    Positions of the set bits, lowest first
+    """
+    bits = bin(bitmap)[:1:-1]
+    position = bits.find('1')
+
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+def _bitmap(positions: Iterable[int], size: int) -> int:
+    data = bytearray((size + 7) // 8)
+
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+
+    return int.from_bytes(data, 'little')
+
+
+def _set_bit(bitmaps: dict[int, int], key: int, position: int) -> None:
+    bitmaps[key] = bitmaps.get(key, 0) | (1 << position)
+
+
+def _clear_bit(bitmaps: dict[int, int], key: int, position: int) -> None:
+    bitmap = bitmaps.get(key, 0) & ~(1 << position)
+
+    if bitmap:
+        bitmaps[key] = bitmap
+    else:
+        bitmaps.pop(key, None)
+
+
+@dataclass(frozen=True)
+class FacetResult:
+    # Matching products in the ascending order
+    product_ids: list[int]
+    # The number of matching items per option value
+    counts: dict[int, int]
+
+
+@dataclass(frozen=True)
+class IndexedItem:
+    sku: str
+    product_id: int
+    category_id: int
+    value_ids: tuple[int, ...]
+
+
+class FacetIndex:
+    """
+    Positions of the removed items are left empty, they are reclaimed
+    by the next rebuild
+    """
+    __slots__ = ['items', 'positions', 'value_items', 'category_items', 'synced_at']
+
+    def __init__(
+        self,
+        items: list[Optional[IndexedItem]],
+        positions: dict[str, int],
+        value_items: dict[int, int],
+        category_items: dict[int, int],
+        synced_at: datetime,
+    ) -> None:
+        self.items = items
+        self.positions = positions
+        self.value_items = value_items
+        self.category_items = category_items
+        # The database time the index reflects the changes up to
+        self.synced_at = synced_at
+
+    @classmethod
+    def build(cls, items: Iterable[IndexedItem], synced_at: datetime) -> 'FacetIndex':
+        items = list(items)
+        category_positions: dict[int, list[int]] = {}
+        value_positions: dict[int, list[int]] = {}
+
+        # Setting the bits one by one would copy the growing integers,
+        #   so each bitmap is assembled at once
+        for position, item in enumerate(items):
+            category_positions.setdefault(item.category_id, []).append(position)
+            for value_id in item.value_ids:
+                value_positions.setdefault(value_id, []).append(position)
+
+        return cls(
+            items=items,
+            positions={item.sku: position for position, item in enumerate(items)},
+            value_items={k: _bitmap(v, len(items)) for k, v in value_positions.items()},
+            category_items={k: _bitmap(v, len(items)) for k, v in category_positions.items()},
+            synced_at=synced_at,
+        )
+
+    def _add(self, item: IndexedItem) -> None:
+        position = len(self.items)
+        self.items.append(item)
+        self.positions[item.sku] = position
+
+        _set_bit(self.category_items, item.category_id, position)
+        for value_id in item.value_ids:
+            _set_bit(self.value_items, value_id, position)
+
+    def _remove(self, sku: str) -> None:
+        position = self.positions.pop(sku, None)
+
+        if position is None:
+            return
+
+        item, self.items[position] = self.items[position], None
+
+        _clear_bit(self.category_items, item.category_id, position)
+        for value_id in item.value_ids:
+            _clear_bit(self.value_items, value_id, position)
+
+    def patch(self, skus: Iterable[str], items: Iterable[IndexedItem], synced_at: datetime) -> 'FacetIndex':
+        """
+        Returns the copy of the index with the current state of `skus`,
+        the ones missing from `items` are removed
+        """
+        skus = list(skus)
+
+        if not skus:
+            # Nothing is changed, the containers are never mutated after
+            #   the patch, so they can be shared
+            return FacetIndex(self.items, self.positions, self.value_items, self.category_items, synced_at)
+
+        index = FacetIndex(
+            items=list(self.items),
+            positions=dict(self.positions),
+            value_items=dict(self.value_items),
+            category_items=dict(self.category_items),
+            synced_at=synced_at,
+        )
+
+        for sku in skus:
+            index._remove(sku)
+        for item in items:
+            index._add(item)
+
+        return index
+
+    def search(
+        self,
+        snapshot: ReferenceSnapshot,
+        category_id: int,
+        value_ids: Sequence[int],
+    ) -> FacetResult:
+        """
+        Items of the category subtree having the values. The values of
+        one option are alternatives, the options are combined.
+        The counts are computed for the values of the category options
+        as if the value was selected in addition to the selected values
+        of the other options (disjunctive faceting)
+        """
+        base = 0
+        for id in snapshot.subtree_ids(category_id):
+            base |= self.category_items.get(id, 0)
+
+        selected: dict[int, int] = {}
+        for value_id in value_ids:
+            value = snapshot.values.get(value_id)
+            if value is None:
+                raise ValueError(f'Option value {value_id} does not exist')
+            selected[value.option_id] = selected.get(value.option_id, 0) | self.value_items.get(value_id, 0)
+
+        matched = base
+        for bitmap in selected.values():
+            matched &= bitmap
+
+        counts: dict[int, int] = {}
+
+        for option in snapshot.options_of(category_id):
+            others = base
+            for option_id, bitmap in selected.items():
+                if option_id != option.id:
+                    others &= bitmap
+
+            for value in snapshot.values_of(option.id):
+                count = popcount(others & self.value_items.get(value.id, 0))
+                if count:
+                    counts[value.id] = count
+
+        product_ids = sorted({self.items[position].product_id for position in _positions(matched)})
+
+        return FacetResult(product_ids=product_ids, counts=counts)
+
+
+class FacetIndexCache:
+    """
+    Holds the current index, `run()` patches it by the logged changes
+    every `interval` seconds and rebuilds it every `rebuild_interval`
+    """
+    __slots__ = ['interval', 'rebuild_interval', 'rebuilt_at', '_index']
+
+    def __init__(
+        self,
+        interval: float = settings.FACET_INDEX_REFRESH_INTERVAL,
+        rebuild_interval: float = settings.FACET_INDEX_REBUILD_INTERVAL,
+    ) -> None:
+        self.interval = interval
+        self.rebuild_interval = rebuild_interval
+        self.rebuilt_at = 0.0
+        self._index: Optional[FacetIndex] = None
+
+    @property
+    def index(self) -> FacetIndex:
+        assert self._index is not None, 'The facet index is not built'
+        return self._index
+
+    async def _load_items(self, session: AsyncSession, skus: Optional[Sequence[str]] = None) -> list[IndexedItem]:
+        items = select(ProductItem.sku, ProductItem.product_id, Product.category_id).join(ProductItem.product)
+        values = select(ProductItemOptionValue.sku, ProductItemOptionValue.value_id)
+
+        if skus is not None:
+            items = items.where(ProductItem.sku.in_(skus))
+            values = values.where(ProductItemOptionValue.sku.in_(skus))
+
+        item_values: dict[str, list[int]] = {}
+        for sku, value_id in await session.execute(values):
+            item_values.setdefault(sku, []).append(value_id)
+
+        return [IndexedItem(sku, product_id, category_id, tuple(item_values.get(sku, ())))
+                for sku, product_id, category_id in await session.execute(items)]
+
+    async def rebuild(self) -> None:
+        async with get_session() as session:
+            synced_at = await session.scalar(select(func.now()))
+            items = await self._load_items(session)
+
+        self._index = FacetIndex.build(items, synced_at)
+        self.rebuilt_at = time.monotonic()
+
+    async def refresh(self) -> int:
+        """
+        Applies the logged changes, returns the number of changed items
+        """
+        index = self.index
+        retention = timedelta(seconds=settings.FACET_CHANGES_RETENTION)
+
+        # The clean-up of the log is of no client
+        async with get_session(track=False) as session:
+            synced_at = await session.scalar(select(func.now()))
+
+            if synced_at - index.synced_at > retention:
+                # The log may have been cleaned up past the index state
+                stale = True
+            else:
+                since = index.synced_at - timedelta(seconds=settings.FACET_CHANGES_OVERLAP)
+                skus = (await session.scalars(
+                    select(ProductItemChange.sku)
+                    .where(ProductItemChange.changed_at > since)
+                    .distinct()
+                    .limit(settings.FACET_PATCH_MAX_ITEMS + 1)
+                )).all()
+                # After a bulk import loading the items by SKU is slower
+                #   than the full rebuild
+                stale = len(skus) > settings.FACET_PATCH_MAX_ITEMS
+                items = await self._load_items(session, skus) if skus and not stale else []
+
+            await session.execute(
+                delete(ProductItemChange)
+                .where(ProductItemChange.changed_at < synced_at - retention)
+            )
+
+        if stale:
+            await self.rebuild()
+            return len(self.index.positions)
+
+        self._index = index.patch(skus, items, synced_at)
+        return len(skus)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+
+            try:
+                if time.monotonic() - self.rebuilt_at > self.rebuild_interval:
+                    await self.rebuild()
+                else:
+                    await self.refresh()
+            except Exception:
+                # The previous index is served until the next successful refresh
+                logger.exception('Facet index refresh failed')
+
+
+facet_cache = FacetIndexCache()
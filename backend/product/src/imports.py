@@ -0,0 +1,264 @@
+"""
+Bulk import of the catalog tables from CSV or NDJSON files. A file is read
+in chunks, every chunk is copied by `COPY` into a temporary staging table
+and merged into the real one by a single statement
+
+    INSERT INTO products (...) SELECT DISTINCT ON (id) ... FROM import_products
+    ON CONFLICT (id) DO UPDATE SET ...
+
+so the memory is bounded by the chunk size and the rows never pass through
+the ORM. Within a chunk the last row of a key wins. The categories refer
+to their parents, which may come in a later chunk, so all their chunks are
+staged before a single merge. The derived state is
+updated in the same transaction: the category intervals are renumbered,
+the sequences are moved past the imported ids, the search documents are
+computed and the changed SKUs are logged for the facet index.
+"""
+import csv
+import itertools
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy import Table, column, func, insert, literal, select, table, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import tree
+from .config import settings
+from .models import (
+    Category, Manufacturer, Product, ProductImage, ProductItem, ProductItemChange,
+    ProductItemOptionValue, ProductOption, ProductOptionValue, product_document,
+)
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    table: Table
+    # Columns read from the file, the other ones get `defaults`
+    columns: tuple[str, ...]
+    key: tuple[str, ...]
+    defaults: tuple[tuple[str, Any], ...] = ()
+    # The rows refer to the rows of the same table, the foreign key is
+    #   checked by every merge, so the chunks are merged all at once
+    self_referencing: bool = False
+
+    @property
+    def stage_name(self) -> str:
+        return f'import_{self.table.name}'
+
+
+# In the order of the foreign keys. The intervals of the categories are
+#   filled by the rebuild of the tree
+import_specs = {
+    'manufacturers': ImportSpec(Manufacturer.__table__, ('id', 'name', 'description', 'image'), ('id',)),
+    'categories': ImportSpec(
+        Category.__table__, ('id', 'name', 'image', 'parent_id'), ('id',),
+        defaults=(('left', 0), ('right', 0), ('depth', 0)),
+        self_referencing=True,
+    ),
+    'options': ImportSpec(ProductOption.__table__, ('id', 'name', 'category_id'), ('id',)),
+    'option_values': ImportSpec(ProductOptionValue.__table__, ('id', 'option_id', 'value'), ('id',)),
+    'products': ImportSpec(
+        Product.__table__, ('id', 'name', 'description', 'manufacturer_id', 'category_id'), ('id',),
+    ),
+    'images': ImportSpec(ProductImage.__table__, ('id', 'product_id', 'image'), ('id',)),
+    'items': ImportSpec(ProductItem.__table__, ('sku', 'product_id', 'price', 'quantity'), ('sku',)),
+    'item_options': ImportSpec(
+        ProductItemOptionValue.__table__, ('sku', 'option_id', 'value_id'), ('sku', 'option_id'),
+    ),
+}
+
+
+def _get_converters(spec: ImportSpec) -> list[Callable[[Any], Any]]:
+    """
+    CSV values are strings, `COPY` needs the values of the column types.
+    Empty values of the nullable columns are `NULL`
+    """
+    converters = []
+
+    for name in spec.columns:
+        column_ = spec.table.c[name]
+        # `TypeDecorator`s don't know it, their implementations do
+        python_type = getattr(column_.type, 'impl_instance', column_.type).python_type
+
+        def convert(value: Any, python_type: type = python_type, nullable: bool = column_.nullable) -> Any:
+            if value is None or (value == '' and nullable):
+                return None
+            return value if isinstance(value, python_type) else python_type(value)
+
+        converters.append(convert)
+
+    return converters
+
+
+def read_records(path: Path) -> Iterator[dict[str, Any]]:
+    """
+    Rows of a CSV file with the header or of an NDJSON file, one by one
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.suffix in ('.ndjson', '.jsonl'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def read_chunks(
+    spec: ImportSpec,
+    records: Iterable[dict[str, Any]],
+    size: int = settings.IMPORT_CHUNK_SIZE,
+) -> Iterator[list[tuple[Any, ...]]]:
+    converters = _get_converters(spec)
+    rows = (
+        tuple(convert(record.get(name)) for name, convert in zip(spec.columns, converters))
+        for record in records
+    )
+
+    while chunk := list(itertools.islice(rows, size)):
+        yield chunk
+
+
+async def _create_stage(session: AsyncSession, spec: ImportSpec) -> None:
+    # `AS ... WITH NO DATA` copies the column types but not the constraints
+    await session.execute(text(
+        f'CREATE TEMPORARY TABLE {spec.stage_name} ON COMMIT DROP AS '
+        f'SELECT {", ".join(spec.columns)} FROM {spec.table.name} WITH NO DATA'
+    ))
+
+
+async def _copy(session: AsyncSession, spec: ImportSpec, rows: Sequence[tuple[Any, ...]]) -> None:
+    """
+    `COPY` by the asyncpg connection of the session, so it's a part of
+    the session transaction
+    """
+    connection = await (await session.connection()).get_raw_connection()
+    await connection.driver_connection.copy_records_to_table(
+        spec.stage_name, records=rows, columns=spec.columns,
+    )
+
+
+async def _merge(session: AsyncSession, spec: ImportSpec) -> None:
+    stage = table(spec.stage_name, *(column(name) for name in spec.columns))
+    key = [stage.c[name] for name in spec.key]
+
+    rows = (
+        select(*stage.c, *(literal(value).label(name) for name, value in spec.defaults))
+        .distinct(*key)
+        # The rows of the stage are stored in the copy order
+        .order_by(*key, text('ctid DESC'))
+    )
+    upsert = pg_insert(spec.table).from_select([*spec.columns, *(name for name, _ in spec.defaults)], rows)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=spec.key,
+        set_={name: upsert.excluded[name] for name in spec.columns if name not in spec.key},
+    )
+
+    await session.execute(upsert)
+
+
+async def _log_changes(session: AsyncSession, spec: ImportSpec) -> None:
+    """
+    The changed items are logged for the facet index, see `facets`
+    """
+    stage = table(spec.stage_name, *(column(name) for name in spec.columns))
+
+    if spec.table is ProductItem.__table__ or spec.table is ProductItemOptionValue.__table__:
+        skus = select(stage.c.sku).distinct()
+    elif spec.table is Product.__table__:
+        # The category of the items may have changed
+        skus = select(ProductItem.sku).where(ProductItem.product_id.in_(select(stage.c.id)))
+    else:
+        return
+
+    await session.execute(insert(ProductItemChange).from_select(['sku'], skus))
+
+
+async def _update_documents(session: AsyncSession, spec: ImportSpec) -> None:
+    """
+    The search documents of the merged products or of the products of
+    the merged manufacturers, the import bypasses the mapper events
+    """
+    stage = table(spec.stage_name, *(column(name) for name in spec.columns))
+    products = Product.__table__
+
+    if spec.table is Product.__table__:
+        condition = products.c.id.in_(select(stage.c.id))
+    elif spec.table is Manufacturer.__table__:
+        condition = products.c.manufacturer_id.in_(select(stage.c.id))
+    else:
+        return
+
+    await session.execute(
+        update(products)
+        .where(condition)
+        .values(search_vector=product_document(products.c.name, products.c.description, products.c.manufacturer_id))
+    )
+
+
+async def _sync_sequence(session: AsyncSession, spec: ImportSpec) -> None:
+    """
+    The ids are imported explicitly, so the serial sequence is moved past
+    them for the following inserts
+    """
+    if spec.key != ('id',):
+        return
+
+    await session.execute(select(func.setval(
+        func.pg_get_serial_sequence(spec.table.name, 'id'),
+        select(func.coalesce(func.max(spec.table.c.id), 0) + 1).scalar_subquery(),
+        False,
+    )))
+
+
+async def _apply_stage(session: AsyncSession, spec: ImportSpec) -> None:
+    await _log_changes(session, spec)
+    await _merge(session, spec)
+    await _update_documents(session, spec)
+    await session.execute(text(f'TRUNCATE {spec.stage_name}'))
+
+
+async def import_records(
+    session: AsyncSession,
+    kind: str,
+    records: Iterable[dict[str, Any]],
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Imports the records into the table of `kind`, returns their number.
+    `on_chunk` is called with the size of every copied chunk
+    """
+    spec = import_specs[kind]
+    total = 0
+
+    await _create_stage(session, spec)
+
+    for chunk in read_chunks(spec, records):
+        await _copy(session, spec, chunk)
+        if not spec.self_referencing:
+            await _apply_stage(session, spec)
+
+        total += len(chunk)
+        if on_chunk is not None:
+            on_chunk(len(chunk))
+
+    if spec.self_referencing:
+        await _apply_stage(session, spec)
+
+    await _sync_sequence(session, spec)
+
+    if spec.table is Category.__table__:
+        await tree.rebuild_tree(session)
+
+    return total
+
+
+async def import_file(
+    session: AsyncSession,
+    kind: str,
+    path: Path,
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> int:
+    return await import_records(session, kind, read_records(path), on_chunk)
@@ -0,0 +1,12 @@
+"""
+Instrumentation of the gRPC server: per-method latencies split into
+the stages, queue depths, query counts and slow RPC and SQL logs.
+Installed when `METRICS_ENABLED` is on, see `main`. `ConsistencyInterceptor`
+carries the write positions of the replica reads between the RPCs
+"""
+from .consistency import ConsistencyInterceptor
+from .exporter import serve_metrics
+from .interceptor import MetricsInterceptor
+from .metrics import queued, record_pool_wait, service_metrics
+from .sql import watch_queries
+
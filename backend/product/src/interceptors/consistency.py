@@ -0,0 +1,61 @@
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+import grpc
+from grpc import aio
+
+from ..db.routing import Consistency, current_consistency, format_lsn, parse_lsn
+
+
+logger = logging.getLogger(__name__)
+
+LSN_METADATA_KEY = 'x-commit-lsn'
+
+
+class ConsistencyInterceptor(aio.ServerInterceptor):
+    """
+    Reads the position of the last write the client has seen from
+    the invocation metadata and returns the one of the RPC writes in
+    the trailing metadata, see `db.routing`. Installed with the replicas
+    """
+
+    async def intercept_service(
+        self,
+        continuation: Callable[[grpc.HandlerCallDetails], Awaitable[Optional[grpc.RpcMethodHandler]]],
+        handler_call_details: grpc.HandlerCallDetails,
+    ) -> Optional[grpc.RpcMethodHandler]:
+        handler = await continuation(handler_call_details)
+
+        if handler is None or handler.unary_unary is None:
+            return handler
+
+        required = 0
+        for key, value in handler_call_details.invocation_metadata or ():
+            if key == LSN_METADATA_KEY:
+                try:
+                    required = parse_lsn(value)
+                except ValueError:
+                    # The reads are as consistent as without it
+                    logger.warning('Invalid %s metadata: %r', LSN_METADATA_KEY, value)
+
+        behavior = handler.unary_unary
+
+        async def consistent_behavior(request: Any, context: aio.ServicerContext) -> Any:
+            consistency = Consistency(required)
+            token = current_consistency.set(consistency)
+
+            try:
+                response = await behavior(request, context)
+            finally:
+                current_consistency.reset(token)
+
+            if consistency.written:
+                context.set_trailing_metadata(((LSN_METADATA_KEY, format_lsn(consistency.written)),))
+
+            return response
+
+        return grpc.unary_unary_rpc_method_handler(
+            consistent_behavior,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
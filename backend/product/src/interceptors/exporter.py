@@ -0,0 +1,38 @@
+import asyncio
+
+from .metrics import service_metrics
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    A minimal HTTP/1.0 answer, the scrapes don't need more
+    """
+    try:
+        request_line = await reader.readline()
+        # The headers are not used
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+
+        parts = request_line.split()
+        path = parts[1].split(b'?')[0] if len(parts) > 1 else b''
+
+        if path == b'/metrics':
+            status, body = '200 OK', service_metrics.render().encode()
+        else:
+            status, body = '404 Not Found', b''
+
+        writer.write(
+            f'HTTP/1.0 {status}\r\n'
+            f'Content-Type: text/plain; version=0.0.4\r\n'
+            f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve_metrics(host: str, port: int) -> asyncio.AbstractServer:
+    """
+    Serves `/metrics` in the Prometheus text format
+    """
+    return await asyncio.start_server(_handle, host, port)
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable, Optional
+
+import grpc
+from grpc import aio
+
+from .metrics import RpcCall, current_call, service_metrics
+from ..config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# `ServicerContext.code()` is the number of the code
+_status_names = {code.value[0]: code.name for code in grpc.StatusCode}
+
+
+class MetricsInterceptor(aio.ServerInterceptor):
+    """
+    Times the unary RPCs and counts their status codes. A sample of the RPCs
+    slower than `SLOW_RPC_THRESHOLD` is logged with their stages
+    """
+
+    async def intercept_service(
+        self,
+        continuation: Callable[[grpc.HandlerCallDetails], Awaitable[Optional[grpc.RpcMethodHandler]]],
+        handler_call_details: grpc.HandlerCallDetails,
+    ) -> Optional[grpc.RpcMethodHandler]:
+        handler = await continuation(handler_call_details)
+
+        if handler is None or handler.unary_unary is None:
+            return handler
+
+        method = service_metrics.method(handler_call_details.method)
+        behavior = handler.unary_unary
+
+        async def timed_behavior(request: Any, context: aio.ServicerContext) -> Any:
+            call = RpcCall(method)
+            token = current_call.set(call)
+            method.in_flight += 1
+            # Unless the RPC has failed, the code is the one of the context
+            code: Optional[str] = None
+
+            try:
+                return await behavior(request, context)
+            except asyncio.CancelledError:
+                code = 'CANCELLED'
+                raise
+            except aio.AbortError:
+                raise
+            except Exception:
+                code = 'UNKNOWN'
+                raise
+            finally:
+                method.in_flight -= 1
+                current_call.reset(token)
+                elapsed = call.finish()
+
+                if code is None:
+                    # Set by `context.abort()` or `context.set_code()`, OK if unset
+                    code = _status_names.get(context.code(), 'UNKNOWN')
+                method.count_status(code)
+
+                if elapsed >= settings.SLOW_RPC_THRESHOLD and random.random() < settings.SLOW_LOG_SAMPLE_RATE:
+                    logger.warning(
+                        'Slow RPC %s: %.1f ms, queue %.1f ms, pool wait %.1f ms, %d queries %.1f ms',
+                        method.name, elapsed * 1000, call.queue * 1000, call.pool_wait * 1000,
+                        call.queries, call.query_seconds * 1000,
+                    )
+
+        return grpc.unary_unary_rpc_method_handler(
+            timed_behavior,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
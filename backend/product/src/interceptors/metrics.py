@@ -0,0 +1,200 @@
+"""
+Per-method metrics of the RPCs in the Prometheus text format, the same
+as the ones of the gateway. The time of an RPC is split into the stages
+
+    queue      waiting for a slot of `limit_concurrency`
+    pool_wait  waiting for a connection of the engine pool
+    queries    executing the SQL, the sum over the RPC
+    total      the whole RPC
+
+what's left of `total` is spent in the ORM loading and the conversion
+into the messages.
+"""
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Iterator, Optional
+
+from ..db.metrics import statement_cache_stats
+
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+STAGES = ('queue', 'pool_wait', 'queries', 'total')
+
+
+class Histogram:
+    __slots__ = ['buckets', 'counts', 'sum', 'count']
+
+    def __init__(self, buckets: tuple[float, ...] = SECONDS_BUCKETS) -> None:
+        self.buckets = buckets
+        # Not cumulative, the last one is `+Inf`
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MethodMetrics:
+    __slots__ = ['name', 'stages', 'queries', 'in_flight', 'waiting', 'statuses']
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.stages = {stage: Histogram() for stage in STAGES}
+        # Queries per RPC
+        self.queries = Histogram(QUERIES_BUCKETS)
+        self.in_flight = 0
+        # The queue depth of `limit_concurrency`
+        self.waiting = 0
+        # gRPC status code names by count
+        self.statuses: dict[str, int] = {}
+
+    def count_status(self, code: str) -> None:
+        self.statuses[code] = self.statuses.get(code, 0) + 1
+
+
+class RpcCall:
+    """
+    The stages of an RPC being handled, accumulated by the code it runs
+    """
+    __slots__ = ['method', 'started', 'queue', 'pool_wait', 'queries', 'query_seconds']
+
+    def __init__(self, method: MethodMetrics) -> None:
+        self.method = method
+        self.started = time.perf_counter()
+        self.queue = 0.0
+        self.pool_wait = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def finish(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        stages = self.method.stages
+
+        stages['queue'].observe(self.queue)
+        stages['pool_wait'].observe(self.pool_wait)
+        stages['queries'].observe(self.query_seconds)
+        stages['total'].observe(elapsed)
+        self.method.queries.observe(self.queries)
+
+        return elapsed
+
+
+# Set by `MetricsInterceptor` for the task of the RPC. SQLAlchemy runs
+#   the engine events in a greenlet of the same context, so they see it too
+current_call: ContextVar[Optional[RpcCall]] = ContextVar('current_call', default=None)
+
+
+@contextmanager
+def queued() -> Iterator[None]:
+    """
+    Wraps the wait for a slot of the method
+    """
+    call = current_call.get()
+    if call is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    call.method.waiting += 1
+    try:
+        yield
+    finally:
+        call.method.waiting -= 1
+        call.queue += time.perf_counter() - started
+
+
+def record_pool_wait(seconds: float) -> None:
+    call = current_call.get()
+    if call is not None:
+        call.pool_wait += seconds
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels: str) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _render_histogram(name: str, labels: dict[str, str], histogram: Histogram) -> Iterable[str]:
+    cumulative = 0
+
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        yield f'{name}_bucket{_labels(**labels, le=repr(float(bound)))} {cumulative}'
+
+    yield f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}'
+    yield f'{name}_sum{_labels(**labels)} {histogram.sum!r}'
+    yield f'{name}_count{_labels(**labels)} {histogram.count}'
+
+
+class ServiceMetrics:
+    __slots__ = ['methods']
+
+    def __init__(self) -> None:
+        self.methods: dict[str, MethodMetrics] = {}
+
+    def method(self, name: str) -> MethodMetrics:
+        method = self.methods.get(name)
+
+        if method is None:
+            method = self.methods[name] = MethodMetrics(name)
+
+        return method
+
+    def render(self) -> str:
+        methods = list(self.methods.values())
+
+        lines = [
+            '# HELP product_rpc_stage_seconds Time spent in a stage of an RPC',
+            '# TYPE product_rpc_stage_seconds histogram',
+        ]
+        for method in methods:
+            for stage, histogram in method.stages.items():
+                labels = {'method': method.name, 'stage': stage}
+                lines += _render_histogram('product_rpc_stage_seconds', labels, histogram)
+
+        lines.append('# HELP product_rpc_queries SQL statements executed by an RPC')
+        lines.append('# TYPE product_rpc_queries histogram')
+        for method in methods:
+            lines += _render_histogram('product_rpc_queries', {'method': method.name}, method.queries)
+
+        lines.append('# HELP product_rpcs_in_flight RPCs being handled')
+        lines.append('# TYPE product_rpcs_in_flight gauge')
+        for method in methods:
+            lines.append(f'product_rpcs_in_flight{_labels(method=method.name)} {method.in_flight}')
+
+        lines.append('# HELP product_rpcs_waiting RPCs waiting for a concurrency slot')
+        lines.append('# TYPE product_rpcs_waiting gauge')
+        for method in methods:
+            lines.append(f'product_rpcs_waiting{_labels(method=method.name)} {method.waiting}')
+
+        lines.append('# HELP product_rpc_responses_total RPCs by the status code')
+        lines.append('# TYPE product_rpc_responses_total counter')
+        for method in methods:
+            for code, count in method.statuses.items():
+                lines.append(f'product_rpc_responses_total{_labels(method=method.name, code=code)} {count}')
+
+        lines.append('# HELP product_statement_cache_total Lookups of the statement caches, see `db.metrics`')
+        lines.append('# TYPE product_statement_cache_total counter')
+        for name, count in statement_cache_stats.as_dict().items():
+            # `compiled_hits` and the like
+            cache, result = name.split('_')
+            lines.append(f'product_statement_cache_total{_labels(cache=cache, result=result)} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+service_metrics = ServiceMetrics()
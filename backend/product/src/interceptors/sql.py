@@ -0,0 +1,58 @@
+"""
+Timing of the SQL statements by the engine events, counted for the RPC
+running them. A sample of the statements slower than `SLOW_QUERY_THRESHOLD`
+is logged, the background ones included
+"""
+import logging
+import random
+import time
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, ExecutionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .metrics import current_call
+from ..config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def _start_query(
+    connection: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Optional[ExecutionContext],
+    executemany: bool,
+) -> None:
+    # The statements of a connection run one by one
+    connection.info['query_started'] = time.perf_counter()
+
+
+def _finish_query(
+    connection: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Optional[ExecutionContext],
+    executemany: bool,
+) -> None:
+    elapsed = time.perf_counter() - connection.info.pop('query_started', time.perf_counter())
+    call = current_call.get()
+
+    if call is not None:
+        call.queries += 1
+        call.query_seconds += elapsed
+
+    if elapsed >= settings.SLOW_QUERY_THRESHOLD and random.random() < settings.SLOW_LOG_SAMPLE_RATE:
+        logger.warning(
+            'Slow query in %s: %.1f ms\n%s',
+            call.method.name if call is not None else 'background', elapsed * 1000, statement,
+        )
+
+
+def watch_queries(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, 'before_cursor_execute', _start_query)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _finish_query)
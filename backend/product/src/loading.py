@@ -0,0 +1,33 @@
+"""
+Loading profiles of the product aggregate. Its relationships raise on
+lazy loading (it doesn't work with `AsyncSession` anyway and turns
+a listing into a query per row otherwise), so each query states what
+its use case needs:
+
+    select(Product).options(*product_profiles['card'])
+
+Collections are loaded by `selectinload`, i.e. one extra `IN` query per
+collection whatever the number of products, many-to-one relationships are
+joined since they don't multiply the rows.
+"""
+from sqlalchemy.orm import joinedload, selectinload, undefer
+from sqlalchemy.orm.interfaces import ORMOption
+
+from .models import Product, ProductItem
+
+
+product_profiles: dict[str, tuple[ORMOption, ...]] = {
+    # Listings: no description and no item options
+    'card': (
+        joinedload(Product.manufacturer),
+        selectinload(Product.items),
+        selectinload(Product.images),
+    ),
+    # The product page
+    'detail': (
+        undefer(Product.description),
+        joinedload(Product.manufacturer),
+        selectinload(Product.items).selectinload(ProductItem.option_values),
+        selectinload(Product.images),
+    ),
+}
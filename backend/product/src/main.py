@@ -1,8 +1,69 @@
 import asyncio
+import signal
 
+from grpc import aio
 
-async def serve():
-    pass
+from .config import settings
+from .db.session import dispose_engines, router
+from .facets import facet_cache
+from .interceptors import ConsistencyInterceptor, MetricsInterceptor, serve_metrics
+from .proto import pb2_grpc
+from .reference import reference_cache
+from .reservations import ReservationReaper
+from .services import CatalogService
+
+
+async def serve() -> None:
+    # The service can't answer without the reference data and the index
+    await reference_cache.refresh()
+    await facet_cache.rebuild()
+    background = [
+        asyncio.create_task(reference_cache.run()),
+        asyncio.create_task(facet_cache.run()),
+        asyncio.create_task(ReservationReaper().run()),
+    ]
+    if router.replicas:
+        # The replicas are used after their first poll
+        await router.poll()
+        background.append(asyncio.create_task(router.run()))
+
+    metrics_server = None
+    if settings.METRICS_ENABLED:
+        metrics_server = await serve_metrics(settings.METRICS_HOST, settings.METRICS_PORT)
+
+    interceptors = []
+    if settings.METRICS_ENABLED:
+        interceptors.append(MetricsInterceptor())
+    if router.replicas:
+        interceptors.append(ConsistencyInterceptor())
+
+    server = aio.server(
+        interceptors=interceptors,
+        maximum_concurrent_rpcs=settings.GRPC_MAX_CONCURRENT_RPCS,
+    )
+    pb2_grpc.add_CatalogServicer_to_server(CatalogService(), server)
+    server.add_insecure_port(f'{settings.GRPC_HOST}:{settings.GRPC_PORT}')
+
+    await server.start()
+    print(f'gRPC server is started on {settings.GRPC_HOST}:{settings.GRPC_PORT}')
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    await stopping.wait()
+
+    # New RPCs are rejected at once, the running ones are given
+    #   the grace period to finish before they are cancelled
+    print('gRPC server is stopping')
+    await server.stop(settings.GRPC_SHUTDOWN_GRACE)
+    if metrics_server is not None:
+        metrics_server.close()
+    for task in background:
+        task.cancel()
+    await dispose_engines()
 
 
 if __name__ == '__main__':
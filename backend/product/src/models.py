@@ -1,12 +1,16 @@
 from __future__ import annotations
+from datetime import datetime
 from typing import Any, Optional
 
 from sqlalchemy import (
-    String, Text, ForeignKey, CheckConstraint, Dialect
+    BigInteger, DateTime, String, Text, ForeignKey, CheckConstraint, Dialect, Index,
+    Connection, ColumnElement, event, func, insert, inspect, literal_column, select, update
 )
-from sqlalchemy.orm import mapped_column, Mapped, relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import mapped_column, Mapped, Mapper, relationship, Session, UOWTransaction
 from sqlalchemy.types import TypeDecorator, String, TypeEngine
 
+from .config import settings
 from .db.base import Base
 
 
@@ -33,16 +37,23 @@ class Category(Base):
     __tablename__ = 'categories'
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
     image: Mapped[Optional[ImageType]] = mapped_column(ImageType)
-    # Adjacency list + nested set
+    # Adjacency list + nested set, see `tree`
     parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey('categories.id'))
     left: Mapped[int]
     right: Mapped[int]
+    depth: Mapped[int] = mapped_column(default=0)
 
-    parent: Mapped[Optional[Category]] = relationship(back_populates='children')
+    parent: Mapped[Optional[Category]] = relationship(back_populates='children', remote_side=[id])
     children: Mapped[list[Category]] = relationship(back_populates='parent')
+    products: Mapped[list[Product]] = relationship(back_populates='category')
     options: Mapped[list[ProductOption]] = relationship(back_populates='category')
 
+    __table_args__ = (
+        Index('ix_categories_left_right', 'left', 'right'),
+    )
+
 
 class Product(Base):
     __tablename__ = 'products'
@@ -51,10 +62,29 @@ class Product(Base):
     name: Mapped[str] = mapped_column(String(100))
     description: Mapped[Optional[str]] = mapped_column(Text, deferred=True)
     manufacturer_id: Mapped[int] = mapped_column(ForeignKey('manufacturers.id'))
+    category_id: Mapped[int] = mapped_column(ForeignKey('categories.id'))
+    # Maintained on flush, see `product_document`
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, deferred=True)
+
+    # The relationships of the aggregate are never loaded lazily,
+    #   queries pick a profile from `loading`
+
+    manufacturer: Mapped[Manufacturer] = relationship(back_populates='products', lazy='raise_on_sql')
+    category: Mapped[Category] = relationship(back_populates='products', lazy='raise_on_sql')
+    items: Mapped[list[ProductItem]] = relationship(back_populates='product', lazy='raise_on_sql')
+    images: Mapped[list[ProductImage]] = relationship(back_populates='product', lazy='raise_on_sql')
 
-    manufacturer: Mapped[Manufacturer] = relationship(back_populates='products')
-    items: Mapped[list[ProductItem]] = relationship(back_populates='product')
-    images: Mapped[list[ProductImage]] = relationship(back_populates='product')
+    __table_args__ = (
+        # Keyset pages of the category products
+        Index('ix_products_category_id_id', 'category_id', 'id'),
+        # Full-text and fuzzy search, see `search`
+        Index('ix_products_search_vector', 'search_vector', postgresql_using='gin'),
+        Index(
+            'ix_products_name_trgm', 'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        ),
+    )
 
 
 class ProductImage(Base):
@@ -64,7 +94,7 @@ class ProductImage(Base):
     product_id: Mapped[int] = mapped_column(ForeignKey('products.id'))
     image: Mapped[ImageType] = mapped_column(ImageType)
 
-    product: Mapped[Product] = relationship(back_populates='images')
+    product: Mapped[Product] = relationship(back_populates='images', lazy='raise_on_sql')
 
 
 class ProductItem(Base):
@@ -75,10 +105,14 @@ class ProductItem(Base):
     price: Mapped[int]
     quantity: Mapped[int] = mapped_column()
 
-    product: Mapped[Product] = relationship(back_populates='items')
+    product: Mapped[Product] = relationship(back_populates='items', lazy='raise_on_sql')
+    option_values: Mapped[list[ProductItemOptionValue]] = relationship(back_populates='item', lazy='raise_on_sql')
 
     __table_args__ = (
         CheckConstraint(quantity >= 0, name='check_quantity_non_negative'),
+        Index('ix_product_items_product_id', 'product_id'),
+        # Keyset pages of the items by price
+        Index('ix_product_items_price_sku', 'price', 'sku'),
     )
 
 
@@ -90,6 +124,8 @@ class ProductOption(Base):
     category_id: Mapped[int] = mapped_column(ForeignKey('categories.id'))
 
     category: Mapped[Category] = relationship(back_populates='options')
+    option_values: Mapped[list[ProductOptionValue]] = relationship(back_populates='option')
+    item_option_values: Mapped[list[ProductItemOptionValue]] = relationship(back_populates='option')
 
 
 class ProductOptionValue(Base):
@@ -100,6 +136,7 @@ class ProductOptionValue(Base):
     value: Mapped[str] = mapped_column(String(30))
 
     option: Mapped[ProductOption] = relationship(back_populates='option_values')
+    item_option_values: Mapped[list[ProductItemOptionValue]] = relationship(back_populates='option_value')
 
 
 class ProductItemOptionValue(Base):
@@ -110,10 +147,135 @@ class ProductItemOptionValue(Base):
         primary_key=True,
     )
     option_id: Mapped[int] = mapped_column(
-        ForeignKey('product_option_values.option_id'),
+        ForeignKey('product_options.id'),
         primary_key=True,
     )
     value_id: Mapped[int] = mapped_column(ForeignKey('product_option_values.id'))
 
+    item: Mapped[ProductItem] = relationship(back_populates='option_values', lazy='raise_on_sql')
     option: Mapped[ProductOption] = relationship(back_populates='item_option_values')
-    option_value: Mapped[ProductOptionValue] = relationship(back_populates='item_option_values')
+    option_value: Mapped[ProductOptionValue] = relationship(back_populates='item_option_values', lazy='raise_on_sql')
+
+
+class StockReservation(Base):
+    """
+    Stock taken from the items until it's confirmed or expires,
+    see `reservations`
+    """
+    __tablename__ = 'stock_reservations'
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+    items: Mapped[list[StockReservationItem]] = relationship(back_populates='reservation', lazy='raise_on_sql')
+
+
+class StockReservationItem(Base):
+    __tablename__ = 'stock_reservation_items'
+
+    reservation_id: Mapped[int] = mapped_column(
+        ForeignKey('stock_reservations.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    sku: Mapped[str] = mapped_column(ForeignKey('product_items.sku'), primary_key=True)
+    quantity: Mapped[int] = mapped_column()
+
+    reservation: Mapped[StockReservation] = relationship(back_populates='items', lazy='raise_on_sql')
+
+    __table_args__ = (
+        CheckConstraint(quantity > 0, name='check_reserved_quantity_positive'),
+    )
+
+
+class ProductItemChange(Base):
+    """
+    The log of the items whose facets may have changed, it's filled on
+    flush and is read by `facets` to refresh the index incrementally
+    """
+    __tablename__ = 'product_item_changes'
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    # Not a foreign key, deleted items are logged too
+    sku: Mapped[str] = mapped_column(String(12))
+    # Compared with `now()` of the database, which is aware
+    changed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def log_product_item_changes(session: Session, flush_context: UOWTransaction) -> None:
+    skus: set[str] = set()
+    product_ids: set[int] = set()
+
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (ProductItem, ProductItemOptionValue)):
+            skus.add(obj.sku)
+        elif isinstance(obj, Product) and inspect(obj).attrs.category_id.history.has_changes():
+            product_ids.add(obj.id)
+
+    # Core statements, the ORM can't be flushed again from the hook
+    connection = session.connection()
+
+    if skus:
+        connection.execute(insert(ProductItemChange.__table__), [{'sku': sku} for sku in skus])
+    if product_ids:
+        connection.execute(
+            insert(ProductItemChange.__table__).from_select(
+                ['sku'],
+                select(ProductItem.sku).where(ProductItem.product_id.in_(product_ids)),
+            )
+        )
+
+
+def product_document(name: Any, description: Any, manufacturer_id: Any) -> ColumnElement[Any]:
+    """
+    The search document of a product: its name, the name of the manufacturer
+    and the description, ranked in this order. The arguments are values or
+    columns of `products`
+    """
+    manufacturer = select(Manufacturer.name).where(Manufacturer.id == manufacturer_id).scalar_subquery()
+    document = None
+
+    for text, weight in ((name, 'A'), (manufacturer, 'B'), (description, 'C')):
+        vector = func.setweight(
+            func.to_tsvector(settings.SEARCH_TEXT_CONFIG, func.coalesce(text, '')),
+            # "char", a bound parameter would be cast to a string type
+            literal_column(f"'{weight}'"),
+        )
+        document = vector if document is None else document.op('||')(vector)
+
+    return document
+
+
+_document_attrs = ('name', 'description', 'manufacturer_id')
+
+
+@event.listens_for(Product, 'before_insert')
+def set_product_document(mapper: Mapper[Product], connection: Connection, target: Product) -> None:
+    target.search_vector = product_document(target.name, target.description, target.manufacturer_id)
+
+
+@event.listens_for(Product, 'before_update')
+def update_product_document(mapper: Mapper[Product], connection: Connection, target: Product) -> None:
+    state = inspect(target)
+
+    if not any(state.attrs[key].history.has_changes() for key in _document_attrs):
+        return
+
+    # The deferred description may be unloaded, its stored value is unchanged then
+    target.search_vector = product_document(*(
+        getattr(Product.__table__.c, key) if key in state.unloaded else getattr(target, key)
+        for key in _document_attrs
+    ))
+
+
+@event.listens_for(Manufacturer, 'after_update')
+def update_manufacturer_documents(mapper: Mapper[Manufacturer], connection: Connection, target: Manufacturer) -> None:
+    if not inspect(target).attrs.name.history.has_changes():
+        return
+
+    products = Product.__table__
+    connection.execute(
+        update(products)
+        .where(products.c.manufacturer_id == target.id)
+        .values(search_vector=product_document(products.c.name, products.c.description, products.c.manufacturer_id))
+    )
@@ -0,0 +1,162 @@
+"""
+Keyset pagination. A page is read as
+
+    WHERE (price, sku) > (:last_price, :last_sku) ORDER BY price, sku LIMIT :limit
+
+which is a range scan of the index on the key columns, so a deep page
+costs the same as the first one, unlike `OFFSET`. The cursor is an opaque
+token of the last key of the previous page.
+"""
+import base64
+import bisect
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, Generic, Optional, Sequence, TypeVar
+
+from sqlalchemy import Integer, Select, bindparam, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from .config import settings
+
+
+T = TypeVar('T')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidLimit(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Page(Generic[T]):
+    items: Sequence[T]
+    # Empty for the last page
+    next_cursor: str
+
+
+def get_limit(limit: int, default: Optional[int] = None, maximum: Optional[int] = None) -> int:
+    """
+    The page size requested by the client, `0` means the default. The
+    default and the maximum are the ones of the product pages unless given
+    """
+    if limit < 0:
+        raise InvalidLimit('Limit must not be negative')
+
+    default = default or settings.PRODUCTS_PAGE_SIZE
+    maximum = maximum or settings.PRODUCTS_MAX_PAGE_SIZE
+    return min(limit or default, maximum)
+
+
+def encode_cursor(order: str, values: Sequence[Any]) -> str:
+    data = json.dumps([order, *values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode_cursor(order: str, cursor: str, size: int) -> list[Any]:
+    """
+    The cursor carries the name of the ordering, so the one of another
+    listing is rejected instead of being misinterpreted
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise InvalidCursor('Cursor is malformed')
+
+    if not isinstance(data, list) or len(data) != size + 1 or data[0] != order:
+        raise InvalidCursor('Cursor does not belong to the listing')
+
+    return data[1:]
+
+
+def _check_cursor_values(values: Sequence[Any], types: Sequence[type]) -> None:
+    """
+    The values are bound to the key columns as they are, so a value of
+    another type would fail the query instead of the cursor. `bool` is
+    an `int` to `isinstance`, hence the exact types
+    """
+    if any(type(value) is not type_ for value, type_ in zip(values, types)):
+        raise InvalidCursor('Cursor does not belong to the listing')
+
+
+def _get_order(keys: Sequence[InstrumentedAttribute]) -> str:
+    return ','.join(f'{key.class_.__name__}.{key.key}' for key in keys)
+
+
+class KeysetQuery(Generic[T]):
+    """
+    The statements of the first and the following pages of `query` ordered
+    by the unique combination of `keys`. They are built once, the limit and
+    the last key are bound parameters, so the compiled and the prepared
+    forms are reused by every page
+    """
+    __slots__ = ['order', 'keys', 'types', 'first', 'after']
+
+    def __init__(self, query: Select[tuple[T]], keys: Sequence[InstrumentedAttribute]) -> None:
+        self.order = _get_order(keys)
+        self.keys = tuple(keys)
+        self.types = tuple(key.type.python_type for key in keys)
+
+        limit = bindparam('limit', type_=Integer)
+        last = [bindparam(f'last_{i}', type_=key.type) for i, key in enumerate(keys)]
+
+        if len(keys) == 1:
+            after = keys[0] > last[0]
+        else:
+            after = tuple_(*keys) > tuple_(*last)
+
+        self.first = query.order_by(*keys).limit(limit)
+        self.after = query.where(after).order_by(*keys).limit(limit)
+
+
+async def paginate(
+    session: AsyncSession,
+    query: KeysetQuery[T],
+    limit: int,
+    cursor: Optional[str] = None,
+    params: Optional[dict[str, Any]] = None,
+) -> Page[T]:
+    """
+    Reads the page, `params` are the ones of the query itself. An extra
+    row is read to know whether the next page exists
+    """
+    statement = query.first
+    params = {**(params or {}), 'limit': limit + 1}
+
+    if cursor:
+        values = decode_cursor(query.order, cursor, len(query.keys))
+        _check_cursor_values(values, query.types)
+        statement = query.after
+        params.update((f'last_{i}', value) for i, value in enumerate(values))
+
+    rows = (await session.scalars(statement, params)).all()
+
+    if len(rows) <= limit:
+        return Page(items=rows, next_cursor='')
+
+    last = rows[limit - 1]
+    return Page(
+        items=rows[:limit],
+        next_cursor=encode_cursor(query.order, [getattr(last, key.key) for key in query.keys]),
+    )
+
+
+def paginate_ids(ids: Sequence[int], order: str, limit: int, cursor: Optional[str] = None) -> Page[int]:
+    """
+    The same for the ascending ids computed in memory, e.g. by the facets
+    """
+    start = 0
+
+    if cursor:
+        last = decode_cursor(order, cursor, 1)[0]
+        _check_cursor_values([last], [int])
+        start = bisect.bisect_right(ids, last)
+
+    items = ids[start:start + limit]
+    next_cursor = encode_cursor(order, [items[-1]]) if start + limit < len(ids) else ''
+
+    return Page(items=items, next_cursor=next_cursor)
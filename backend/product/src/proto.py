@@ -0,0 +1,13 @@
+"""
+The modules generated from `proto/product.proto` by the entrypoint
+"""
+import sys
+
+from .config import settings
+
+# The generated `*_pb2_grpc` module imports `*_pb2` as a top-level module
+if str(settings.GRPC_TOOLS_DIR) not in sys.path:
+    sys.path.append(str(settings.GRPC_TOOLS_DIR))
+
+import product_pb2 as pb2  # noqa: E402
+import product_pb2_grpc as pb2_grpc  # noqa: E402
@@ -0,0 +1,120 @@
+"""
+The hot queries of the catalog. Their statements are built once at import
+with the per-call values as bound parameters, so an RPC neither builds
+a statement nor computes its cache key, the compiled form is taken from
+the cache of the engine and the server-side prepared statement from
+the cache of the connection. Lists are bound as arrays (`= ANY(:ids)`)
+instead of `IN` lists, whose SQL would differ by the number of values.
+"""
+from typing import Optional, Sequence
+
+from sqlalchemy import Integer, any_, bindparam, select, Select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from .loading import product_profiles
+from .models import Manufacturer, Product, ProductItem
+from .pagination import KeysetQuery, Page, paginate
+
+
+def select_products(profile: str) -> Select[tuple[Product]]:
+    return select(Product).options(*product_profiles[profile])
+
+
+def _in_ids(name: str):
+    return any_(bindparam(name, type_=ARRAY(Integer)))
+
+
+_product_by_id = {
+    profile: select_products(profile).where(Product.id == bindparam('id'))
+    for profile in product_profiles
+}
+
+_products_by_ids = {
+    profile: select_products(profile).where(Product.id == _in_ids('ids')).order_by(Product.id)
+    for profile in product_profiles
+}
+
+_products_pages = {
+    profile: KeysetQuery(select_products(profile), [Product.id])
+    for profile in product_profiles
+}
+
+_category_products_pages = {
+    profile: KeysetQuery(
+        select_products(profile).where(Product.category_id == _in_ids('category_ids')),
+        [Product.id],
+    )
+    for profile in product_profiles
+}
+
+_category_items_pages = KeysetQuery(
+    select(ProductItem).where(ProductItem.product_id.in_(
+        select(Product.id).where(Product.category_id == _in_ids('category_ids'))
+    )),
+    [ProductItem.price, ProductItem.sku],
+)
+
+_product_item = (
+    select(ProductItem)
+    .options(selectinload(ProductItem.option_values))
+    .where(ProductItem.sku == bindparam('sku'))
+)
+
+_manufacturers = select(Manufacturer).order_by(Manufacturer.name)
+
+
+async def get_product(session: AsyncSession, id: int, profile: str) -> Optional[Product]:
+    return await session.scalar(_product_by_id[profile], {'id': id})
+
+
+async def get_products(session: AsyncSession, ids: Sequence[int], profile: str) -> Sequence[Product]:
+    result = await session.scalars(_products_by_ids[profile], {'ids': list(ids)})
+    return result.all()
+
+
+async def list_products(
+    session: AsyncSession,
+    profile: str,
+    limit: int,
+    cursor: Optional[str],
+) -> Page[Product]:
+    return await paginate(session, _products_pages[profile], limit, cursor)
+
+
+async def list_category_products(
+    session: AsyncSession,
+    category_ids: Sequence[int],
+    profile: str,
+    limit: int,
+    cursor: Optional[str],
+) -> Page[Product]:
+    return await paginate(
+        session, _category_products_pages[profile], limit, cursor, {'category_ids': list(category_ids)},
+    )
+
+
+async def list_category_items(
+    session: AsyncSession,
+    category_ids: Sequence[int],
+    limit: int,
+    cursor: Optional[str],
+) -> Page[ProductItem]:
+    """
+    The cheapest items first
+    """
+    return await paginate(session, _category_items_pages, limit, cursor, {'category_ids': list(category_ids)})
+
+
+async def get_product_item(session: AsyncSession, sku: str) -> Optional[ProductItem]:
+    return await session.scalar(_product_item, {'sku': sku})
+
+
+async def get_manufacturer(session: AsyncSession, id: int) -> Optional[Manufacturer]:
+    return await session.get(Manufacturer, id)
+
+
+async def list_manufacturers(session: AsyncSession) -> Sequence[Manufacturer]:
+    result = await session.scalars(_manufacturers)
+    return result.all()
@@ -0,0 +1,228 @@
+"""
+The in-memory snapshot of the reference tables: categories, product options
+and their values. They are small and rarely changed, but are needed by
+almost every product query, so the service reads them from the snapshot
+instead of the database.
+
+The snapshot is immutable and is replaced as a whole by the background
+refresh when the content of the tables changes, so a reader always sees
+a consistent state:
+
+    snapshot = reference_cache.snapshot
+    ids = snapshot.subtree_ids(category_id)
+"""
+import asyncio
+import bisect
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db.session import get_session
+from .models import Category, ProductOption, ProductOptionValue
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CategoryEntry:
+    id: int
+    name: str
+    image: Optional[str]
+    parent_id: Optional[int]
+    left: int
+    right: int
+    depth: int
+
+
+@dataclass(frozen=True)
+class OptionEntry:
+    id: int
+    name: str
+    category_id: int
+
+
+@dataclass(frozen=True)
+class OptionValueEntry:
+    id: int
+    option_id: int
+    value: str
+
+
+class ReferenceSnapshot:
+    """
+    The indexed content of the reference tables at `version`
+    """
+    __slots__ = [
+        'version', 'categories', 'ordered', 'lefts', 'children',
+        'options', 'category_options', 'values', 'option_values',
+    ]
+
+    def __init__(
+        self,
+        version: str,
+        categories: Iterable[CategoryEntry],
+        options: Iterable[OptionEntry],
+        values: Iterable[OptionValueEntry],
+    ) -> None:
+        self.version = version
+
+        # Categories in the depth-first order, a subtree is a contiguous
+        #   slice of it found by the bisection of `left`
+        self.ordered = tuple(sorted(categories, key=lambda c: c.left))
+        self.lefts = tuple(c.left for c in self.ordered)
+        self.categories = MappingProxyType({c.id: c for c in self.ordered})
+
+        children: dict[Optional[int], list[CategoryEntry]] = {}
+        for category in self.ordered:
+            children.setdefault(category.parent_id, []).append(category)
+        self.children = MappingProxyType({k: tuple(v) for k, v in children.items()})
+
+        options = sorted(options, key=lambda o: o.id)
+        self.options = MappingProxyType({o.id: o for o in options})
+
+        category_options: dict[int, list[OptionEntry]] = {}
+        for option in options:
+            category_options.setdefault(option.category_id, []).append(option)
+        self.category_options = MappingProxyType({k: tuple(v) for k, v in category_options.items()})
+
+        values = sorted(values, key=lambda v: v.id)
+        self.values = MappingProxyType({v.id: v for v in values})
+
+        option_values: dict[int, list[OptionValueEntry]] = {}
+        for value in values:
+            option_values.setdefault(value.option_id, []).append(value)
+        self.option_values = MappingProxyType({k: tuple(v) for k, v in option_values.items()})
+
+    def subtree(self, id: int, depth: Optional[int] = None) -> tuple[CategoryEntry, ...]:
+        """
+        The category with its descendants down to `depth` levels below it,
+        empty if the category doesn't exist
+        """
+        root = self.categories.get(id)
+
+        if root is None:
+            return ()
+
+        start = bisect.bisect_left(self.lefts, root.left)
+        end = bisect.bisect_right(self.lefts, root.right)
+        subtree = self.ordered[start:end]
+
+        if depth is not None:
+            subtree = tuple(c for c in subtree if c.depth <= root.depth + depth)
+
+        return subtree
+
+    def subtree_ids(self, id: int) -> list[int]:
+        return [c.id for c in self.subtree(id)]
+
+    def ancestors(self, id: int) -> tuple[CategoryEntry, ...]:
+        """
+        The path from the root to the category inclusive
+        """
+        path = []
+        category = self.categories.get(id)
+
+        while category is not None:
+            path.append(category)
+            category = self.categories.get(category.parent_id)
+
+        return tuple(reversed(path))
+
+    def menu(self, depth: int) -> tuple[CategoryEntry, ...]:
+        return tuple(c for c in self.ordered if c.depth <= depth)
+
+    def options_of(self, category_id: int) -> tuple[OptionEntry, ...]:
+        """
+        The options of the category including the ones inherited from
+        its ancestors
+        """
+        return tuple(option
+                     for category in self.ancestors(category_id)
+                     for option in self.category_options.get(category.id, ()))
+
+    def values_of(self, option_id: int) -> tuple[OptionValueEntry, ...]:
+        return self.option_values.get(option_id, ())
+
+
+# The content hash of the tables. They are small, so hashing is cheaper
+#   than transferring and indexing the rows on every poll
+_version_query = text("""
+    SELECT concat_ws(':',
+        (SELECT md5(coalesce(string_agg(t::text, ',' ORDER BY t.id), '')) FROM categories t),
+        (SELECT md5(coalesce(string_agg(t::text, ',' ORDER BY t.id), '')) FROM product_options t),
+        (SELECT md5(coalesce(string_agg(t::text, ',' ORDER BY t.id), '')) FROM product_option_values t)
+    )
+""")
+
+
+class ReferenceCache:
+    """
+    Holds the current snapshot and replaces it when the version of
+    the tables changes. `run()` polls the version every `interval` seconds
+    """
+    __slots__ = ['interval', '_snapshot']
+
+    def __init__(self, interval: float = settings.REFERENCE_CACHE_REFRESH_INTERVAL) -> None:
+        self.interval = interval
+        self._snapshot: Optional[ReferenceSnapshot] = None
+
+    @property
+    def snapshot(self) -> ReferenceSnapshot:
+        assert self._snapshot is not None, 'The reference cache is not loaded'
+        return self._snapshot
+
+    async def _load(self, session: AsyncSession, version: str) -> ReferenceSnapshot:
+        categories = await session.execute(select(
+            Category.id, Category.name, Category.image, Category.parent_id,
+            Category.left, Category.right, Category.depth,
+        ))
+        options = await session.execute(select(
+            ProductOption.id, ProductOption.name, ProductOption.category_id,
+        ))
+        values = await session.execute(select(
+            ProductOptionValue.id, ProductOptionValue.option_id, ProductOptionValue.value,
+        ))
+
+        return ReferenceSnapshot(
+            version=version,
+            categories=[CategoryEntry(*row) for row in categories],
+            options=[OptionEntry(*row) for row in options],
+            values=[OptionValueEntry(*row) for row in values],
+        )
+
+    async def refresh(self) -> bool:
+        """
+        Returns whether the snapshot is replaced
+        """
+        async with get_session() as session:
+            version = await session.scalar(_version_query)
+
+            if self._snapshot is not None and self._snapshot.version == version:
+                return False
+
+            snapshot = await self._load(session, version)
+
+        # Readers hold the reference to the previous snapshot, so
+        #   the swap is atomic for them
+        self._snapshot = snapshot
+        return True
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+
+            try:
+                if await self.refresh():
+                    logger.info('Reference snapshot is refreshed to %s', self._snapshot.version)
+            except Exception:
+                # The previous snapshot is served until the next successful refresh
+                logger.exception('Reference snapshot refresh failed')
+
+
+reference_cache = ReferenceCache()
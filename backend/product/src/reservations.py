@@ -0,0 +1,275 @@
+"""
+Stock reservations. The rows of the requested items are locked in the
+order of the SKUs, then the stock of all of them is taken by a single
+conditional update
+
+    UPDATE product_items SET quantity = quantity - r.quantity
+    FROM (VALUES ...) AS r (sku, quantity)
+    WHERE product_items.sku = r.sku AND product_items.quantity >= r.quantity
+    RETURNING product_items.sku
+
+so there is no read-modify-write race and the row locks of hot items are
+held for two statements and the insert of the reservation only. The update
+alone would lock the rows in the order of its join plan, so the concurrent
+reservations of the same items could deadlock. If any item lacks the stock,
+the transaction is rolled back and nothing is reserved.
+
+Reservations expire after the TTL and their stock is returned in batches
+by `ReservationReaper` unless they are confirmed before.
+"""
+import asyncio
+import logging
+import random
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable, Sequence, TypeVar
+
+from sqlalchemy import Integer, String, any_, bindparam, column, delete, func, insert, select, update, values
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db.session import get_session
+from .models import ProductItem, StockReservation, StockReservationItem
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# serialization_failure, deadlock_detected
+RETRYABLE_SQLSTATES = ('40001', '40P01')
+
+
+class InsufficientStock(Exception):
+
+    def __init__(self, skus: Sequence[str]) -> None:
+        super().__init__(f'Insufficient stock of {", ".join(skus)}')
+        self.skus = skus
+
+
+class ReservationNotFound(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Reservation:
+    id: int
+    expires_at: datetime
+
+
+def _is_retryable(error: DBAPIError) -> bool:
+    return getattr(error.orig, 'sqlstate', None) in RETRYABLE_SQLSTATES
+
+
+async def with_retry(
+    transaction: Callable[[], Awaitable[T]],
+    attempts: int = settings.RESERVATION_ATTEMPTS,
+    delay: float = settings.RESERVATION_RETRY_DELAY,
+) -> T:
+    """
+    Runs the transaction again if it's aborted by a serialization failure
+    or a deadlock, with the exponential backoff and the jitter, so
+    the conflicting transactions don't collide again at once
+    """
+    for attempt in range(attempts):
+        try:
+            return await transaction()
+        except DBAPIError as e:
+            if attempt == attempts - 1 or not _is_retryable(e):
+                raise
+            await asyncio.sleep(delay * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    raise AssertionError('unreachable')
+
+
+def _sum(lines: Iterable[tuple[str, int]]) -> dict[str, int]:
+    amounts = Counter()
+    for sku, quantity in lines:
+        amounts[sku] += quantity
+
+    return amounts
+
+
+def _amounts(lines: Iterable[tuple[str, int]]):
+    """
+    The `VALUES` list of the summed quantities by SKU
+    """
+    return values(
+        column('sku', String),
+        column('quantity', Integer),
+        name='amounts',
+    ).data(sorted(_sum(lines).items()))
+
+
+_lock_items_statement = (
+    select(ProductItem.sku)
+    .where(ProductItem.sku == any_(bindparam('skus', type_=ARRAY(String))))
+    .order_by(ProductItem.sku)
+    .with_for_update()
+)
+
+
+async def _lock_items(session: AsyncSession, lines: Iterable[tuple[str, int]]) -> None:
+    """
+    Every transaction changing the stock locks the items in the same
+    order before, so they wait for each other instead of deadlocking
+    """
+    await session.execute(_lock_items_statement, {'skus': sorted({sku for sku, _ in lines})})
+
+
+async def _take_stock(session: AsyncSession, lines: Sequence[tuple[str, int]]) -> None:
+    await _lock_items(session, lines)
+    amounts = _amounts(lines)
+    taken = await session.scalars(
+        update(ProductItem)
+        .where(ProductItem.sku == amounts.c.sku, ProductItem.quantity >= amounts.c.quantity)
+        .values(quantity=ProductItem.quantity - amounts.c.quantity)
+        .returning(ProductItem.sku)
+        .execution_options(synchronize_session=False)
+    )
+    missing = {sku for sku, _ in lines} - set(taken.all())
+
+    if missing:
+        raise InsufficientStock(sorted(missing))
+
+
+async def _return_stock(session: AsyncSession, lines: Sequence[tuple[str, int]]) -> None:
+    await _lock_items(session, lines)
+    amounts = _amounts(lines)
+    await session.execute(
+        update(ProductItem)
+        .where(ProductItem.sku == amounts.c.sku)
+        .values(quantity=ProductItem.quantity + amounts.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def reserve(lines: Sequence[tuple[str, int]], ttl: float = settings.RESERVATION_TTL) -> Reservation:
+    """
+    Reserves the quantities of the SKUs all at once or raises
+    `InsufficientStock` with the SKUs lacking the stock
+    """
+    assert lines and all(quantity > 0 for _, quantity in lines)
+
+    async def transaction() -> Reservation:
+        async with get_session() as session:
+            await _take_stock(session, lines)
+
+            reservation = (await session.execute(
+                insert(StockReservation)
+                .values(expires_at=func.now() + timedelta(seconds=ttl))
+                .returning(StockReservation.id, StockReservation.expires_at)
+            )).one()
+            await session.execute(insert(StockReservationItem), [
+                {'reservation_id': reservation.id, 'sku': sku, 'quantity': quantity}
+                for sku, quantity in _sum(lines).items()
+            ])
+
+            return Reservation(*reservation)
+
+    return await with_retry(transaction)
+
+
+async def _delete_reservations(session: AsyncSession, ids: Sequence[int]) -> list[tuple[str, int]]:
+    """
+    Deletes the reservations, returns their lines
+    """
+    lines = await session.execute(
+        delete(StockReservationItem)
+        .where(StockReservationItem.reservation_id.in_(ids))
+        .returning(StockReservationItem.sku, StockReservationItem.quantity)
+    )
+    lines = [tuple(line) for line in lines]
+
+    await session.execute(delete(StockReservation).where(StockReservation.id.in_(ids)))
+
+    return lines
+
+
+async def _lock_reservation(session: AsyncSession, id: int) -> None:
+    locked = await session.scalar(
+        select(StockReservation.id)
+        .where(StockReservation.id == id)
+        .with_for_update()
+    )
+
+    if locked is None:
+        raise ReservationNotFound(f'Reservation {id} is not found')
+
+
+async def confirm(id: int) -> None:
+    """
+    The reserved stock is sold, the reservation is dropped
+    """
+    async def transaction() -> None:
+        async with get_session() as session:
+            await _lock_reservation(session, id)
+            await _delete_reservations(session, [id])
+
+    await with_retry(transaction)
+
+
+async def release(id: int) -> None:
+    """
+    The reserved stock is returned to the items
+    """
+    async def transaction() -> None:
+        async with get_session() as session:
+            await _lock_reservation(session, id)
+            await _return_stock(session, await _delete_reservations(session, [id]))
+
+    await with_retry(transaction)
+
+
+async def release_expired(batch: int = settings.RESERVATION_RELEASE_BATCH) -> int:
+    """
+    Returns the stock of a batch of the expired reservations, returns
+    their number. Locked reservations are skipped, so several processes
+    may release concurrently
+    """
+    async def transaction() -> int:
+        # Run by the reaper, no client is waiting for the writes
+        async with get_session(track=False) as session:
+            ids = (await session.scalars(
+                select(StockReservation.id)
+                .where(StockReservation.expires_at <= func.now())
+                .order_by(StockReservation.expires_at)
+                .limit(batch)
+                .with_for_update(skip_locked=True)
+            )).all()
+
+            if ids:
+                await _return_stock(session, await _delete_reservations(session, ids))
+
+            return len(ids)
+
+    return await with_retry(transaction)
+
+
+class ReservationReaper:
+    """
+    Releases the expired reservations every `interval` seconds
+    """
+    __slots__ = ['interval', 'batch']
+
+    def __init__(
+        self,
+        interval: float = settings.RESERVATION_RELEASE_INTERVAL,
+        batch: int = settings.RESERVATION_RELEASE_BATCH,
+    ) -> None:
+        self.interval = interval
+        self.batch = batch
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+
+            try:
+                # Full batches mean there may be more expired ones
+                while await release_expired(self.batch) == self.batch:
+                    pass
+            except Exception:
+                logger.exception('Expired reservations release failed')
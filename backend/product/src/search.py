@@ -0,0 +1,80 @@
+"""
+Product search by the full-text document (`Product.search_vector`, GIN)
+with the fallback to the trigram similarity of the name (`pg_trgm`, GIN),
+which matches the misspelled words:
+
+    WHERE search_vector @@ websearch_to_tsquery(:query) OR name %> :query
+    ORDER BY ts_rank_cd(search_vector, ...) + word_similarity(:query, name) DESC
+
+Both conditions are index scans combined by a bitmap OR, so the cost depends
+on the number of matches, not the size of the catalog.
+"""
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from sqlalchemy import Integer, Select, String, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .models import Product, ProductItem
+from .pagination import get_limit
+from .queries import select_products
+
+
+def get_search_limit(limit: int) -> int:
+    return get_limit(limit, settings.SEARCH_PAGE_SIZE, settings.SEARCH_MAX_PAGE_SIZE)
+
+
+@lru_cache(maxsize=None)
+def _search_statement(by_category: bool, by_min_price: bool, by_max_price: bool) -> Select[tuple[Product]]:
+    """
+    A statement per combination of the filters, built once like the ones
+    of `queries`. A filter of an optional value would hide it from the planner
+    """
+    query = bindparam('query', type_=String)
+    tsquery = func.websearch_to_tsquery(settings.SEARCH_TEXT_CONFIG, query)
+    score = func.ts_rank_cd(Product.search_vector, tsquery) + func.word_similarity(query, Product.name)
+
+    statement = select_products('card').where(
+        Product.search_vector.op('@@')(tsquery) | Product.name.op('%>')(query)
+    )
+
+    if by_category:
+        statement = statement.where(Product.category_id == any_(bindparam('category_ids', type_=ARRAY(Integer))))
+
+    if by_min_price or by_max_price:
+        # Products having an item in the range
+        items = select(ProductItem.product_id)
+        if by_min_price:
+            items = items.where(ProductItem.price >= bindparam('min_price', type_=Integer))
+        if by_max_price:
+            items = items.where(ProductItem.price <= bindparam('max_price', type_=Integer))
+        statement = statement.where(Product.id.in_(items))
+
+    return statement.order_by(score.desc(), Product.id).limit(bindparam('limit', type_=Integer))
+
+
+async def search_products(
+    session: AsyncSession,
+    query: str,
+    limit: int,
+    category_ids: Optional[Sequence[int]] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+) -> Sequence[Product]:
+    """
+    The best matches first
+    """
+    statement = _search_statement(category_ids is not None, min_price is not None, max_price is not None)
+    params = {'query': query, 'limit': limit}
+
+    if category_ids is not None:
+        params['category_ids'] = list(category_ids)
+    if min_price is not None:
+        params['min_price'] = min_price
+    if max_price is not None:
+        params['max_price'] = max_price
+
+    result = await session.scalars(statement, params)
+    return result.all()
@@ -0,0 +1,315 @@
+import grpc
+from grpc import aio
+
+from . import converters
+from .limits import limit_concurrency
+from .. import queries, reservations, search
+from ..config import settings
+from ..db.session import get_session
+from ..facets import facet_cache
+from ..pagination import InvalidCursor, InvalidLimit, get_limit, paginate_ids
+from ..proto import pb2, pb2_grpc
+from ..reference import reference_cache
+
+
+class CatalogService(pb2_grpc.CatalogServicer):
+    """
+    Read API of the catalog: products, their items, categories
+    and manufacturers, and the stock reservation of the orders
+    """
+
+    @limit_concurrency()
+    async def GetProduct(self, request: pb2.ProductRequest, context: aio.ServicerContext) -> pb2.Product:
+        async with get_session(readonly=True) as session:
+            product = await queries.get_product(session, request.id, 'detail')
+
+        if product is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f'Product {request.id} is not found')
+
+        return converters.product_to_message(product)
+
+    @limit_concurrency()
+    async def GetProducts(self, request: pb2.ProductsRequest, context: aio.ServicerContext) -> pb2.ProductsReply:
+        """
+        Missing products are skipped. It's the batch of `GetProduct`,
+        so the products are loaded the same way
+        """
+        async with get_session(readonly=True) as session:
+            products = await queries.get_products(session, request.ids, 'detail')
+
+        return pb2.ProductsReply(products=[converters.product_to_message(p) for p in products])
+
+    @limit_concurrency()
+    async def ListProducts(
+        self,
+        request: pb2.ListProductsRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.ProductsPage:
+        try:
+            async with get_session(readonly=True) as session:
+                page = await queries.list_products(session, 'card', get_limit(request.limit), request.cursor)
+        except (InvalidCursor, InvalidLimit) as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        return pb2.ProductsPage(
+            products=[converters.product_to_message(p) for p in page.items],
+            next_cursor=page.next_cursor,
+        )
+
+    @limit_concurrency()
+    async def ListCategoryProducts(
+        self,
+        request: pb2.CategoryProductsRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.ProductsPage:
+        category_ids = reference_cache.snapshot.subtree_ids(request.category_id)
+
+        if not category_ids:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f'Category {request.category_id} is not found')
+
+        try:
+            async with get_session(readonly=True) as session:
+                page = await queries.list_category_products(
+                    session, category_ids, 'card', get_limit(request.limit), request.cursor,
+                )
+        except (InvalidCursor, InvalidLimit) as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        return pb2.ProductsPage(
+            products=[converters.product_to_message(p) for p in page.items],
+            next_cursor=page.next_cursor,
+        )
+
+    @limit_concurrency()
+    async def ListCategoryItems(
+        self,
+        request: pb2.CategoryItemsRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.ProductItemsPage:
+        category_ids = reference_cache.snapshot.subtree_ids(request.category_id)
+
+        if not category_ids:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f'Category {request.category_id} is not found')
+
+        try:
+            async with get_session(readonly=True) as session:
+                page = await queries.list_category_items(
+                    session, category_ids, get_limit(request.limit), request.cursor,
+                )
+        except (InvalidCursor, InvalidLimit) as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        return pb2.ProductItemsPage(
+            items=[converters.product_item_to_message(i) for i in page.items],
+            next_cursor=page.next_cursor,
+        )
+
+    @limit_concurrency()
+    async def FilterProducts(
+        self,
+        request: pb2.FilterProductsRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.FilterProductsReply:
+        snapshot = reference_cache.snapshot
+
+        if request.category_id not in snapshot.categories:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f'Category {request.category_id} is not found')
+
+        try:
+            result = facet_cache.index.search(snapshot, request.category_id, request.value_ids)
+            page = paginate_ids(result.product_ids, 'Product.id', get_limit(request.limit), request.cursor)
+        except ValueError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        if page.items:
+            async with get_session(readonly=True) as session:
+                products = await queries.get_products(session, page.items, 'card')
+        else:
+            products = []
+
+        facets = []
+        for value_id, count in result.counts.items():
+            value = snapshot.values[value_id]
+            facets.append(converters.facet_to_message(snapshot.options[value.option_id], value, count))
+
+        return pb2.FilterProductsReply(
+            products=[converters.product_to_message(p) for p in products],
+            facets=facets,
+            total=len(result.product_ids),
+            next_cursor=page.next_cursor,
+        )
+
+    @limit_concurrency()
+    async def SearchProducts(
+        self,
+        request: pb2.SearchProductsRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.SearchProductsReply:
+        query = request.query.strip()
+
+        if not query:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'Query is empty')
+
+        category_ids = None
+        if request.category_id:
+            category_ids = reference_cache.snapshot.subtree_ids(request.category_id)
+            if not category_ids:
+                await context.abort(grpc.StatusCode.NOT_FOUND, f'Category {request.category_id} is not found')
+
+        try:
+            limit = search.get_search_limit(request.limit)
+        except InvalidLimit as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        async with get_session(readonly=True) as session:
+            products = await search.search_products(
+                session,
+                query,
+                limit,
+                category_ids=category_ids,
+                min_price=request.min_price or None,
+                max_price=request.max_price or None,
+            )
+
+        return pb2.SearchProductsReply(products=[converters.product_to_message(p) for p in products])
+
+    @limit_concurrency()
+    async def GetProductItem(
+        self,
+        request: pb2.ProductItemRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.ProductItem:
+        async with get_session(readonly=True) as session:
+            item = await queries.get_product_item(session, request.sku)
+
+        if item is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f'Product item {request.sku} is not found')
+
+        return converters.product_item_to_message(item)
+
+    # The categories are read from the reference snapshot
+
+    async def GetCategory(self, request: pb2.CategoryRequest, context: aio.ServicerContext) -> pb2.Category:
+        category = reference_cache.snapshot.categories.get(request.id)
+
+        if category is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f'Category {request.id} is not found')
+
+        return converters.category_to_message(category)
+
+    async def ListCategories(
+        self,
+        request: pb2.CategoriesRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.CategoriesReply:
+        categories = reference_cache.snapshot.ordered
+        return pb2.CategoriesReply(categories=[converters.category_to_message(c) for c in categories])
+
+    async def ListCategorySubtree(
+        self,
+        request: pb2.CategorySubtreeRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.CategoriesReply:
+        categories = reference_cache.snapshot.subtree(request.id, request.depth)
+
+        if not categories:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f'Category {request.id} is not found')
+
+        return pb2.CategoriesReply(categories=[converters.category_to_message(c) for c in categories])
+
+    async def ListCategoryAncestors(
+        self,
+        request: pb2.CategoryRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.CategoriesReply:
+        categories = reference_cache.snapshot.ancestors(request.id)
+
+        if not categories:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f'Category {request.id} is not found')
+
+        return pb2.CategoriesReply(categories=[converters.category_to_message(c) for c in categories])
+
+    async def ListCategoryMenu(
+        self,
+        request: pb2.CategoryMenuRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.CategoriesReply:
+        categories = reference_cache.snapshot.menu(request.depth)
+        return pb2.CategoriesReply(categories=[converters.category_to_message(c) for c in categories])
+
+    @limit_concurrency()
+    async def GetManufacturer(
+        self,
+        request: pb2.ManufacturerRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.Manufacturer:
+        async with get_session(readonly=True) as session:
+            manufacturer = await queries.get_manufacturer(session, request.id)
+
+        if manufacturer is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f'Manufacturer {request.id} is not found')
+
+        return converters.manufacturer_to_message(manufacturer)
+
+    @limit_concurrency()
+    async def ListManufacturers(
+        self,
+        request: pb2.ManufacturersRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.ManufacturersReply:
+        async with get_session(readonly=True) as session:
+            manufacturers = await queries.list_manufacturers(session)
+
+        return pb2.ManufacturersReply(
+            manufacturers=[converters.manufacturer_to_message(m) for m in manufacturers],
+        )
+
+    # Stock reservations, see `reservations`
+
+    @limit_concurrency()
+    async def ReserveStock(
+        self,
+        request: pb2.ReserveStockRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.Reservation:
+        lines = [(line.sku, line.quantity) for line in request.lines]
+
+        if not lines or any(quantity <= 0 for _, quantity in lines):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'Lines must have positive quantities')
+        if request.ttl < 0:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'TTL must not be negative')
+
+        ttl = min(request.ttl or settings.RESERVATION_TTL, settings.RESERVATION_MAX_TTL)
+
+        try:
+            reservation = await reservations.reserve(lines, ttl)
+        except reservations.InsufficientStock as e:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(e))
+
+        return pb2.Reservation(id=reservation.id, expires_at=int(reservation.expires_at.timestamp()))
+
+    @limit_concurrency()
+    async def ConfirmReservation(
+        self,
+        request: pb2.ReservationRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.ReservationReply:
+        try:
+            await reservations.confirm(request.id)
+        except reservations.ReservationNotFound as e:
+            await context.abort(grpc.StatusCode.NOT_FOUND, str(e))
+
+        return pb2.ReservationReply()
+
+    @limit_concurrency()
+    async def ReleaseReservation(
+        self,
+        request: pb2.ReservationRequest,
+        context: aio.ServicerContext,
+    ) -> pb2.ReservationReply:
+        try:
+            await reservations.release(request.id)
+        except reservations.ReservationNotFound as e:
+            await context.abort(grpc.StatusCode.NOT_FOUND, str(e))
+
+        return pb2.ReservationReply()
@@ -0,0 +1,89 @@
+from sqlalchemy import inspect
+
+from ..models import Manufacturer, Product, ProductImage, ProductItem, ProductItemOptionValue
+from ..proto import pb2
+from ..reference import CategoryEntry, OptionEntry, OptionValueEntry, reference_cache
+
+
+def manufacturer_to_message(manufacturer: Manufacturer) -> pb2.Manufacturer:
+    return pb2.Manufacturer(
+        id=manufacturer.id,
+        name=manufacturer.name,
+        image=manufacturer.image or '',
+    )
+
+
+def category_to_message(category: CategoryEntry) -> pb2.Category:
+    return pb2.Category(
+        id=category.id,
+        name=category.name,
+        image=category.image or '',
+        parent_id=category.parent_id or 0,
+        depth=category.depth,
+    )
+
+
+def product_image_to_message(image: ProductImage) -> pb2.ProductImage:
+    return pb2.ProductImage(id=image.id, image=image.image)
+
+
+def item_option_to_message(value: ProductItemOptionValue) -> pb2.ItemOption:
+    # The names come from the reference snapshot instead of joins. The
+    #   ones added after it are named once it's refreshed
+    snapshot = reference_cache.snapshot
+    option = snapshot.options.get(value.option_id)
+    option_value = snapshot.values.get(value.value_id)
+
+    return pb2.ItemOption(
+        option_id=value.option_id,
+        option=option.name if option is not None else '',
+        value_id=value.value_id,
+        value=option_value.value if option_value is not None else '',
+    )
+
+
+def product_item_to_message(item: ProductItem) -> pb2.ProductItem:
+    message = pb2.ProductItem(
+        sku=item.sku,
+        product_id=item.product_id,
+        price=item.price,
+        quantity=item.quantity,
+    )
+
+    if 'option_values' not in inspect(item).unloaded:
+        message.options.extend(item_option_to_message(value) for value in item.option_values)
+
+    return message
+
+
+def product_to_message(product: Product) -> pb2.Product:
+    """
+    Only the attributes loaded by the profile of the query are converted
+    """
+    unloaded = inspect(product).unloaded
+    message = pb2.Product(
+        id=product.id,
+        name=product.name,
+        category_id=product.category_id,
+    )
+
+    if 'description' not in unloaded:
+        message.description = product.description or ''
+    if 'manufacturer' not in unloaded:
+        message.manufacturer.CopyFrom(manufacturer_to_message(product.manufacturer))
+    if 'items' not in unloaded:
+        message.items.extend(product_item_to_message(item) for item in product.items)
+    if 'images' not in unloaded:
+        message.images.extend(product_image_to_message(image) for image in product.images)
+
+    return message
+
+
+def facet_to_message(option: OptionEntry, value: OptionValueEntry, count: int) -> pb2.Facet:
+    return pb2.Facet(
+        option_id=option.id,
+        option=option.name,
+        value_id=value.id,
+        value=value.value,
+        count=count,
+    )
@@ -0,0 +1,40 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from ..config import settings
+from ..interceptors import queued
+
+
+MethodType = TypeVar('MethodType', bound=Callable[..., Awaitable[Any]])
+
+
+def limit_concurrency(limit: int = settings.GRPC_RPC_CONCURRENCY) -> Callable[[MethodType], MethodType]:
+    """
+    Bounds the number of concurrent calls of the RPC method. The calls above
+    the limit wait for a free slot, so one heavy method can't take all the
+    connections of the database pool from the others
+    """
+    def decorator(method: MethodType) -> MethodType:
+        # The semaphore is created on the first call to be bound to the
+        #   running loop
+        semaphore: Optional[asyncio.Semaphore] = None
+
+        @functools.wraps(method)
+        async def wrapper(self: Any, request: Any, context: Any) -> Any:
+            nonlocal semaphore
+
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(limit)
+
+            with queued():
+                await semaphore.acquire()
+
+            try:
+                return await method(self, request, context)
+            finally:
+                semaphore.release()
+
+        return wrapper
+
+    return decorator
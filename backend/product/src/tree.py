@@ -0,0 +1,203 @@
+"""
+The category tree. Categories keep both the adjacency list (`parent_id`)
+and the nested set intervals (`left`, `right`) with the `depth` of the node:
+
+    Bikes (1, 8)
+    ├── Road (2, 3)
+    └── Mountain (4, 7)
+        └── Enduro (5, 6)
+
+A node is a descendant of another one if its interval lies inside
+the interval of the other one. The tree is read from the snapshot of
+`reference`, which slices the subtrees by the intervals in memory, so
+only the writes (inserts, moves and rebuilds) are here. They renumber the intervals by a few bulk
+updates and expect to be run in one transaction, e.g. inside `get_session()`.
+"""
+from collections import defaultdict
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import Row, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Category
+
+
+async def _lock_tree(session: AsyncSession) -> None:
+    """
+    Serializes the writers of the tree until the end of the transaction,
+    the readers aren't blocked
+    """
+    await session.execute(text('LOCK TABLE categories IN EXCLUSIVE MODE'))
+
+
+async def _get_bounds(session: AsyncSession, id: int) -> Row[tuple[int, int, int]]:
+    bounds = (await session.execute(
+        select(Category.left, Category.right, Category.depth).where(Category.id == id)
+    )).one_or_none()
+
+    if bounds is None:
+        raise ValueError(f'Category {id} does not exist')
+
+    return bounds
+
+
+async def _get_end(session: AsyncSession) -> int:
+    """
+    The position after the last root
+    """
+    return (await session.scalar(select(func.max(Category.right))) or 0) + 1
+
+
+async def _open_gap(session: AsyncSession, position: int, width: int) -> None:
+    await session.execute(
+        update(Category)
+        .where(Category.right >= position)
+        .values(right=Category.right + width)
+    )
+    await session.execute(
+        update(Category)
+        .where(Category.left >= position)
+        .values(left=Category.left + width)
+    )
+
+
+async def _close_gap(session: AsyncSession, position: int, width: int) -> None:
+    await session.execute(
+        update(Category)
+        .where(Category.right > position)
+        .values(right=Category.right - width)
+    )
+    await session.execute(
+        update(Category)
+        .where(Category.left > position)
+        .values(left=Category.left - width)
+    )
+
+
+async def insert_category(
+    session: AsyncSession,
+    name: str,
+    parent_id: Optional[int] = None,
+    **values: Any,
+) -> Category:
+    """
+    Adds the category as the last child of the parent or as the last root
+    """
+    await _lock_tree(session)
+
+    if parent_id is None:
+        position, depth = await _get_end(session), 0
+    else:
+        parent = await _get_bounds(session, parent_id)
+        position, depth = parent.right, parent.depth + 1
+        await _open_gap(session, position, 2)
+
+    category = Category(
+        name=name,
+        parent_id=parent_id,
+        left=position,
+        right=position + 1,
+        depth=depth,
+        **values,
+    )
+    session.add(category)
+    await session.flush()
+
+    return category
+
+
+async def move_category(session: AsyncSession, id: int, parent_id: Optional[int]) -> None:
+    """
+    Moves the category with its subtree to the end of the children of
+    the parent or to the end of the roots
+    """
+    await _lock_tree(session)
+
+    node = await _get_bounds(session, id)
+    width = node.right - node.left + 1
+
+    if parent_id is not None:
+        parent = await _get_bounds(session, parent_id)
+        if node.left <= parent.left <= node.right:
+            raise ValueError(f'Category {id} can not be moved into its own subtree')
+
+    # The subtree is taken out of the tree by negating its intervals,
+    #   so the gaps are closed and opened without touching it
+    await session.execute(
+        update(Category)
+        .where(Category.left.between(node.left, node.right))
+        .values(left=-Category.left, right=-Category.right)
+    )
+    await _close_gap(session, node.right, width)
+
+    if parent_id is None:
+        position, depth = await _get_end(session), 0
+    else:
+        # The bounds of the parent may have been shifted by the closed gap
+        parent = await _get_bounds(session, parent_id)
+        position, depth = parent.right, parent.depth + 1
+        await _open_gap(session, position, width)
+
+    offset = position - node.left
+    await session.execute(
+        update(Category)
+        .where(Category.left < 0)
+        .values(
+            left=-Category.left + offset,
+            right=-Category.right + offset,
+            depth=Category.depth + (depth - node.depth),
+        )
+    )
+    await session.execute(
+        update(Category)
+        .where(Category.id == id)
+        .values(parent_id=parent_id)
+    )
+
+
+def _number(rows: Sequence[Row[tuple[int, Optional[int]]]]) -> list[dict[str, int]]:
+    children: dict[Optional[int], list[int]] = defaultdict(list)
+
+    for id, parent_id in rows:
+        children[parent_id].append(id)
+
+    bounds: list[dict[str, int]] = []
+    lefts: dict[int, int] = {}
+    counter = 0
+    # Iterative depth-first walk, the tree may be deeper than
+    #   the recursion limit
+    stack = [(id, 0, False) for id in reversed(children[None])]
+
+    while stack:
+        id, depth, is_visited = stack.pop()
+        counter += 1
+
+        if is_visited:
+            bounds.append({'id': id, 'left': lefts[id], 'right': counter, 'depth': depth})
+            continue
+
+        lefts[id] = counter
+        stack.append((id, depth, True))
+        stack.extend((child, depth + 1, False) for child in reversed(children[id]))
+
+    return bounds
+
+
+async def rebuild_tree(session: AsyncSession) -> tuple[int, int]:
+    """
+    Regenerates the intervals from `parent_id`. The current order of
+    the siblings is kept. Returns the numbers of the renumbered and of all
+    the categories, they differ if `parent_id` has cycles
+    """
+    await _lock_tree(session)
+
+    rows = (await session.execute(
+        select(Category.id, Category.parent_id).order_by(Category.left, Category.id)
+    )).all()
+    bounds = _number(rows)
+
+    if bounds:
+        # Bulk UPDATE by primary key, executed as a single `executemany`
+        await session.execute(update(Category), bounds)
+
+    return len(bounds), len(rows)
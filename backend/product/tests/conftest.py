@@ -0,0 +1,63 @@
+"""
+The tests run against a throwaway Postgres database given by
+`TEST_DATABASE_URL`, its tables are dropped and created again for every
+test using the `database` fixture. Those tests are skipped without it:
+
+    TEST_DATABASE_URL=postgresql+asyncpg://... python -m pytest tests
+
+Coroutine tests are run in a loop of their own, the engines are disposed
+at the end of it since their connections are bound to the loop
+"""
+import asyncio
+import inspect
+import os
+from typing import Any, Coroutine
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+# The settings are read on import, the database of the service is never used
+os.environ['DATABASE_URL'] = TEST_DATABASE_URL or 'postgresql+asyncpg://test@localhost/test'
+os.environ['DATABASE_REPLICA_URLS'] = '[]'
+
+from sqlalchemy import text  # noqa: E402
+
+from src.db import Base  # noqa: E402
+from src.db.session import dispose_engines, engine  # noqa: E402
+
+
+def run(coroutine: Coroutine[Any, Any, Any]) -> Any:
+    async def main() -> Any:
+        try:
+            return await coroutine
+        finally:
+            await dispose_engines()
+
+    return asyncio.run(main())
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem: pytest.Function) -> Any:
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+
+    arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    run(pyfuncitem.obj(**arguments))
+    return True
+
+
+async def _reset_schema() -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        # The trigram operator class of the product search index
+        await connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        await connection.run_sync(Base.metadata.create_all)
+
+
+@pytest.fixture
+def database() -> None:
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL is not set')
+
+    run(_reset_schema())
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from src import tree
+from src.config import settings
+from src.db.session import get_session
+from src.facets import FacetIndexCache
+from src.models import (
+    Manufacturer, Product, ProductItem, ProductItemChange, ProductItemOptionValue,
+    ProductOption, ProductOptionValue,
+)
+
+
+async def create_item() -> tuple[int, int]:
+    """
+    A red item `S1`, returns the ids of the red and the blue values
+    """
+    async with get_session() as session:
+        category = await tree.insert_category(session, 'Bikes')
+        manufacturer = Manufacturer(name='Merida')
+        option = ProductOption(name='Color', category_id=category.id)
+        session.add_all([manufacturer, option])
+        await session.flush()
+
+        red = ProductOptionValue(option_id=option.id, value='Red')
+        blue = ProductOptionValue(option_id=option.id, value='Blue')
+        product = Product(name='Big Nine', manufacturer_id=manufacturer.id, category_id=category.id)
+        session.add_all([red, blue, product])
+        await session.flush()
+
+        session.add(ProductItem(sku='S1', product_id=product.id, price=100, quantity=1))
+        await session.flush()
+        session.add(ProductItemOptionValue(sku='S1', option_id=option.id, value_id=red.id))
+
+    return red.id, blue.id
+
+
+async def test_refresh_patches_changed_items(database: None) -> None:
+    red_id, blue_id = await create_item()
+    cache = FacetIndexCache()
+    await cache.rebuild()
+    assert cache.index.value_items[red_id] == 1 << cache.index.positions['S1']
+
+    async with get_session() as session:
+        value = await session.scalar(select(ProductItemOptionValue).where(ProductItemOptionValue.sku == 'S1'))
+        value.value_id = blue_id
+
+    assert await cache.refresh() == 1
+    # The patched item is moved to a new position
+    assert red_id not in cache.index.value_items
+    assert cache.index.value_items[blue_id] == 1 << cache.index.positions['S1']
+
+
+async def test_refresh_trims_change_log(database: None) -> None:
+    await create_item()
+    expired_at = datetime.now(timezone.utc) - timedelta(seconds=settings.FACET_CHANGES_RETENTION + 60)
+
+    async with get_session() as session:
+        session.add(ProductItemChange(sku='S0', changed_at=expired_at))
+
+    cache = FacetIndexCache()
+    await cache.rebuild()
+    await cache.refresh()
+
+    async with get_session() as session:
+        skus = (await session.scalars(select(ProductItemChange.sku))).all()
+
+    assert 'S0' not in skus
+    assert 'S1' in skus
@@ -0,0 +1,42 @@
+import functools
+import json
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from src import imports
+from src.db.session import get_session
+from src.models import Category
+
+
+async def test_categories_before_their_parents(
+    database: None,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    # A chunk per row, the children come in the chunks before their parents
+    monkeypatch.setattr(imports, 'read_chunks', functools.partial(imports.read_chunks, size=1))
+    records = [
+        {'id': 3, 'name': 'Enduro', 'parent_id': 2},
+        {'id': 2, 'name': 'Mountain', 'parent_id': 1},
+        {'id': 1, 'name': 'Bikes', 'parent_id': None},
+        {'id': 2, 'name': 'MTB', 'parent_id': 1},
+    ]
+    path = tmp_path / 'categories.ndjson'
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+
+    async with get_session() as session:
+        assert await imports.import_file(session, 'categories', path) == 4
+
+    async with get_session() as session:
+        categories = (await session.execute(
+            select(Category.id, Category.name, Category.left, Category.right, Category.depth).order_by(Category.id)
+        )).all()
+
+    # The last row of a key wins, the intervals are rebuilt
+    assert [tuple(c) for c in categories] == [
+        (1, 'Bikes', 1, 6, 0),
+        (2, 'MTB', 2, 5, 1),
+        (3, 'Enduro', 3, 4, 2),
+    ]
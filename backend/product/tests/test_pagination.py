@@ -0,0 +1,51 @@
+import pytest
+
+from src import queries
+from src.config import settings
+from src.db.session import get_session
+from src.pagination import InvalidCursor, InvalidLimit, encode_cursor, get_limit, paginate, paginate_ids
+from src.search import get_search_limit
+
+
+def test_paginate_ids_continues_after_cursor() -> None:
+    ids = [2, 3, 5, 7, 11, 13, 17]
+
+    first = paginate_ids(ids, 'Product.id', 3)
+    second = paginate_ids(ids, 'Product.id', 3, first.next_cursor)
+    last = paginate_ids(ids, 'Product.id', 3, second.next_cursor)
+
+    assert (first.items, second.items, last.items) == ([2, 3, 5], [7, 11, 13], [17])
+    assert last.next_cursor == ''
+
+
+def test_paginate_ids_skips_removed_last_id() -> None:
+    # The last id of the previous page has been filtered out since
+    page = paginate_ids([2, 3, 7], 'Product.id', 2, encode_cursor('Product.id', [5]))
+
+    assert page.items == [7]
+
+
+@pytest.mark.parametrize('value', ['5', 5.5, None, True])
+def test_paginate_ids_rejects_non_int_cursor(value: object) -> None:
+    with pytest.raises(InvalidCursor):
+        paginate_ids([1, 2, 3], 'Product.id', 2, encode_cursor('Product.id', [value]))
+
+
+def test_get_limit_rejects_negative_limit() -> None:
+    assert get_limit(0) == settings.PRODUCTS_PAGE_SIZE
+    assert get_limit(settings.PRODUCTS_MAX_PAGE_SIZE + 1) == settings.PRODUCTS_MAX_PAGE_SIZE
+    assert get_search_limit(0) == settings.SEARCH_PAGE_SIZE
+
+    with pytest.raises(InvalidLimit):
+        get_limit(-3)
+    with pytest.raises(InvalidLimit):
+        get_search_limit(-3)
+
+
+@pytest.mark.parametrize('values', [['100', 'SKU-1'], [100, 1], [True, 'SKU-1'], [None, None]])
+async def test_paginate_rejects_cursor_of_other_types(database: None, values: list[object]) -> None:
+    query = queries._category_items_pages
+
+    async with get_session(readonly=True) as session:
+        with pytest.raises(InvalidCursor):
+            await paginate(session, query, 2, encode_cursor(query.order, values), {'category_ids': [1]})
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import event
+
+from src import queries, tree
+from src.db.session import engine, get_session
+from src.models import (
+    Manufacturer, Product, ProductImage, ProductItem, ProductItemOptionValue,
+    ProductOption, ProductOptionValue,
+)
+
+
+@contextmanager
+def count_statements() -> Iterator[list[str]]:
+    statements: list[str] = []
+
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+
+
+async def create_products(count: int = 3, items_per_product: int = 2) -> None:
+    """
+    Every product with its items, images and item options, so every
+    relationship of the profiles has rows to load
+    """
+    async with get_session() as session:
+        category = await tree.insert_category(session, 'Bikes')
+        manufacturer = Manufacturer(name='Merida')
+        option = ProductOption(name='Color', category_id=category.id)
+        session.add_all([manufacturer, option])
+        await session.flush()
+
+        value = ProductOptionValue(option_id=option.id, value='Red')
+        products = [
+            Product(name=f'Bike {i}', description='Aluminium frame', manufacturer_id=manufacturer.id,
+                    category_id=category.id)
+            for i in range(count)
+        ]
+        session.add_all([value, *products])
+        await session.flush()
+
+        for product in products:
+            session.add(ProductImage(product_id=product.id, image=f'products/{product.id}.png'))
+
+            for i in range(items_per_product):
+                sku = f'S{product.id:03}{i}'
+                session.add(ProductItem(sku=sku, product_id=product.id, price=100, quantity=1))
+                await session.flush()
+                session.add(ProductItemOptionValue(sku=sku, option_id=option.id, value_id=value.id))
+
+
+async def test_card_listing_statements(database: None) -> None:
+    await create_products()
+
+    async with get_session(readonly=True) as session:
+        with count_statements() as statements:
+            page = await queries.list_products(session, 'card', 10, None)
+
+    # The products with the manufacturers, the items, the images
+    assert len(page.items) == 3
+    assert len(statements) == 3
+
+
+async def test_detail_statements(database: None) -> None:
+    await create_products()
+
+    async with get_session(readonly=True) as session:
+        id = (await queries.list_products(session, 'card', 1, None)).items[0].id
+
+        with count_statements() as statements:
+            product = await queries.get_product(session, id, 'detail')
+
+    # The product with the manufacturer, the items, their options, the images
+    assert len(product.items) == 2
+    assert all(item.option_values for item in product.items)
+    assert len(statements) == 4
+
+
+async def test_get_product_item_statements(database: None) -> None:
+    await create_products()
+
+    async with get_session(readonly=True) as session:
+        with count_statements() as statements:
+            item = await queries.get_product_item(session, 'S0010')
+
+    # The item, its options
+    assert item.option_values
+    assert len(statements) == 2
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+from sqlalchemy import select
+
+from src import reservations, tree
+from src.db.session import get_session
+from src.models import Manufacturer, Product, ProductItem
+
+
+async def create_items(quantity: int = 5) -> None:
+    async with get_session() as session:
+        category = await tree.insert_category(session, 'Bikes')
+        manufacturer = Manufacturer(name='Merida')
+        session.add(manufacturer)
+        await session.flush()
+
+        product = Product(name='Big Nine', manufacturer_id=manufacturer.id, category_id=category.id)
+        session.add(product)
+        await session.flush()
+
+        session.add_all([
+            ProductItem(sku=sku, product_id=product.id, price=100, quantity=quantity)
+            for sku in ('S1', 'S2')
+        ])
+
+
+async def get_quantities() -> dict[str, int]:
+    async with get_session() as session:
+        return dict((await session.execute(select(ProductItem.sku, ProductItem.quantity))).all())
+
+
+async def test_reserve_and_release(database: None) -> None:
+    await create_items()
+
+    reservation = await reservations.reserve([('S2', 2), ('S1', 1), ('S2', 1)], ttl=60)
+
+    # Aware, so the epoch of the message doesn't depend on the local timezone
+    assert reservation.expires_at.tzinfo is not None
+    assert abs(reservation.expires_at.timestamp() - (time.time() + 60)) < 5
+    assert await get_quantities() == {'S1': 4, 'S2': 2}
+
+    await reservations.release(reservation.id)
+
+    assert await get_quantities() == {'S1': 5, 'S2': 5}
+
+
+async def test_reserve_takes_nothing_if_any_item_lacks_stock(database: None) -> None:
+    await create_items()
+
+    with pytest.raises(reservations.InsufficientStock) as error:
+        await reservations.reserve([('S1', 1), ('S2', 6)])
+
+    assert error.value.skus == ['S2']
+    assert await get_quantities() == {'S1': 5, 'S2': 5}
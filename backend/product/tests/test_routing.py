@@ -0,0 +1,116 @@
+from typing import Any, Optional
+
+import grpc
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.db.routing import Consistency, ReplicaRouter, ReplicaState, current_consistency, format_lsn, parse_lsn
+from src.db.session import get_session, router as session_router
+from src.interceptors import ConsistencyInterceptor
+from src.interceptors.consistency import LSN_METADATA_KEY
+from src.models import Manufacturer
+
+
+def create_router(*replayed_lsns: int) -> ReplicaRouter:
+    primary = create_async_engine('postgresql+asyncpg://test@primary/test')
+    replicas = [create_async_engine(f'postgresql+asyncpg://test@replica{i}/test') for i in range(len(replayed_lsns))]
+    router = ReplicaRouter(primary, replicas)
+
+    for replica, lsn in zip(router.replicas, replayed_lsns):
+        replica.replayed_lsn = lsn
+        replica.available = True
+
+    return router
+
+
+def test_lsn_round_trip() -> None:
+    assert parse_lsn('16/B374D848') == 0x16 << 32 | 0xB374D848
+    assert format_lsn(parse_lsn('16/B374D848')) == '16/B374D848'
+
+
+def test_reader_has_replayed_required_lsn() -> None:
+    router = create_router(10, 20)
+
+    assert {router.get_reader().url.host for _ in range(2)} == {'replica0', 'replica1'}
+    assert {router.get_reader(15).url.host for _ in range(2)} == {'replica1'}
+    assert router.get_reader(30).url.host == 'primary'
+
+
+class ServicerContext:
+    def __init__(self) -> None:
+        self.trailing_metadata: Optional[tuple[tuple[str, str], ...]] = None
+
+    def set_trailing_metadata(self, metadata: tuple[tuple[str, str], ...]) -> None:
+        self.trailing_metadata = metadata
+
+
+class HandlerCallDetails:
+    def __init__(self, metadata: tuple[tuple[str, str], ...]) -> None:
+        self.method = '/product.Catalog/ReserveStock'
+        self.invocation_metadata = metadata
+
+
+async def call(behavior: Any, metadata: tuple[tuple[str, str], ...]) -> ServicerContext:
+    async def continuation(details: HandlerCallDetails) -> grpc.RpcMethodHandler:
+        return grpc.unary_unary_rpc_method_handler(behavior)
+
+    handler = await ConsistencyInterceptor().intercept_service(continuation, HandlerCallDetails(metadata))
+    context = ServicerContext()
+    await handler.unary_unary(None, context)
+    return context
+
+
+async def test_interceptor_passes_lsns() -> None:
+    seen = []
+
+    async def write(request: Any, context: Any) -> None:
+        consistency = current_consistency.get()
+        seen.append(consistency.required)
+        consistency.track_write('1/10')
+
+    context = await call(write, ((LSN_METADATA_KEY, '1/8'),))
+
+    assert seen == [0x1_00000008]
+    assert context.trailing_metadata == ((LSN_METADATA_KEY, '1/10'),)
+    assert current_consistency.get() is None
+
+
+async def test_interceptor_ignores_invalid_lsn() -> None:
+    seen = []
+
+    async def read(request: Any, context: Any) -> None:
+        seen.append(current_consistency.get().required)
+
+    context = await call(read, ((LSN_METADATA_KEY, 'latest'),))
+
+    assert seen == [0]
+    assert context.trailing_metadata is None
+
+
+@pytest.fixture
+def replicas(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Never polled, so the reads stay on the primary
+    replica = ReplicaState(create_async_engine('postgresql+asyncpg://test@replica/test'))
+    monkeypatch.setattr(session_router, 'replicas', [replica])
+
+
+async def test_session_tracks_writes_of_rpc(database: None, replicas: None) -> None:
+    consistency = Consistency()
+    token = current_consistency.set(consistency)
+
+    try:
+        async with get_session(track=False) as session:
+            session.add(Manufacturer(name='Merida'))
+
+        assert consistency.written == 0
+
+        async with get_session() as session:
+            session.add(Manufacturer(name='Cube'))
+
+        async with get_session() as session:
+            current = parse_lsn(await session.scalar(text('SELECT pg_current_wal_lsn()::text')))
+    finally:
+        current_consistency.reset(token)
+
+    assert 0 < consistency.written <= current
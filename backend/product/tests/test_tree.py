@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import select
+
+from src import tree
+from src.db.session import get_session
+from src.models import Category
+
+
+async def create_tree() -> dict[str, int]:
+    """
+    Bikes
+    ├── Road
+    │   └── Gravel
+    └── Mountain
+        └── Enduro
+    """
+    async with get_session() as session:
+        bikes = await tree.insert_category(session, 'Bikes')
+        road = await tree.insert_category(session, 'Road', bikes.id)
+        gravel = await tree.insert_category(session, 'Gravel', road.id)
+        mountain = await tree.insert_category(session, 'Mountain', bikes.id)
+        enduro = await tree.insert_category(session, 'Enduro', mountain.id)
+
+    return {c.name: c.id for c in (bikes, road, gravel, mountain, enduro)}
+
+
+async def get_tree() -> dict[str, tuple[int, int, int]]:
+    async with get_session(readonly=True) as session:
+        categories = (await session.scalars(select(Category))).all()
+
+    return {c.name: (c.left, c.right, c.depth) for c in categories}
+
+
+async def test_move_into_sibling_subtree(database: None) -> None:
+    ids = await create_tree()
+
+    async with get_session() as session:
+        await tree.move_category(session, ids['Road'], ids['Enduro'])
+
+    assert await get_tree() == {
+        'Bikes': (1, 10, 0),
+        'Mountain': (2, 9, 1),
+        'Enduro': (3, 8, 2),
+        'Road': (4, 7, 3),
+        'Gravel': (5, 6, 4),
+    }
+
+
+async def test_move_into_own_subtree_is_rejected(database: None) -> None:
+    ids = await create_tree()
+    before = await get_tree()
+
+    with pytest.raises(ValueError):
+        async with get_session() as session:
+            await tree.move_category(session, ids['Road'], ids['Gravel'])
+
+    assert await get_tree() == before